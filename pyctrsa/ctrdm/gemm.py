@@ -0,0 +1,136 @@
+# -*- coding: utf-8
+
+"""
+@File       :   gemm.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for calculating Cross-Temporal RDMs from standardized time-windows by batched matrix products '
+
+import numpy as np
+
+np.seterr(divide='ignore', invalid='ignore')
+
+
+' a function for calculating Cross-Temporal RDMs from standardized time-windows '
+
+def ctrdms_gemm_cal(zwindows, rows=None):
+
+    """
+    Calculate the CTRDMs from standardized time-windows by one batched matrix product
+
+    Parameters
+    ----------
+    zwindows : array [..., n_conditions, nts, n_features]
+        The standardized time-windows (see pyctrsa.util.windows.zscore_windows). nts, n_features represent the number
+        of time-windows and the number of values in each time-window. Any leading axes (e.g. subjects, channels) are
+        batch axes.
+    rows : None or slice. Default is None.
+        Only calculate the CTRDMs for the time-windows t1 in rows (against all time-windows t2) or not.
+        If rows=None, calculate all time pairs.
+
+    Returns
+    -------
+    CTRDMs : array [..., nts, nts, n_conditions, n_conditions]
+        Cross-Temporal RDMs, CTRDMs[..., t1, t2, con1, con2] = 1 - r(con1 at t1, con2 at t2).
+        If rows is not None, the shape is [..., n_rows, nts, n_conditions, n_conditions].
+        The values on the diagonal of each RDM (con1 == con2) are 0.
+    """
+
+    zwindows = np.asarray(zwindows)
+
+    batch = zwindows.shape[:-3]
+    n_cons, nts, n_features = zwindows.shape[-3:]
+    nb = len(batch)
+
+    flat = np.reshape(zwindows, batch + (n_cons * nts, n_features))
+
+    if rows is None:
+        flat1 = flat
+        n_rows = nts
+    else:
+        n_rows = len(range(nts)[rows])
+        flat1 = np.reshape(zwindows[..., rows, :], batch + (n_cons * n_rows, n_features))
+
+    # r[..., con1*n_rows+t1, con2*nts+t2]
+    r = np.matmul(flat1, np.swapaxes(flat, -1, -2))
+    r = np.reshape(r, batch + (n_cons, n_rows, n_cons, nts))
+    r = np.transpose(r, tuple(range(nb)) + (nb + 1, nb + 3, nb, nb + 2))
+
+    ctrdms = np.ascontiguousarray(1 - np.clip(r, -1, 1))
+
+    cons = np.arange(n_cons)
+    ctrdms[..., cons, cons] = 0
+
+    return ctrdms
+
+
+' a function for calculating Cross-Temporal RDMs for selected time pairs from standardized time-windows '
+
+def pairs_ctrdms_gemm_cal(zwindows, t1, t2):
+
+    """
+    Calculate the CTRDMs for selected time pairs only
+
+    The time pairs are grouped by t1 and each group is calculated by one matrix product of the time-window t1 against
+    its time-windows t2, so the cost scales with the number of pairs instead of nts*nts. If each t1 occurs only once
+    (e.g. the diagonal t1 == t2), all time pairs are calculated by one batched matrix product.
+
+    Parameters
+    ----------
+    zwindows : array [..., n_conditions, nts, n_features]
+        The standardized time-windows (see pyctrsa.util.windows.zscore_windows). Any leading axes are batch axes.
+    t1 : array [n_pairs]
+    t2 : array [n_pairs]
+        The time pairs (see pyctrsa.util.pairs.time_pairs_cal).
+
+    Returns
+    -------
+    CTRDMs : array [..., n_pairs, n_conditions, n_conditions]
+        Cross-Temporal RDMs, CTRDMs[..., i, con1, con2] = 1 - r(con1 at t1[i], con2 at t2[i]).
+        The values on the diagonal of each RDM (con1 == con2) are 0.
+    """
+
+    zwindows = np.asarray(zwindows)
+
+    t1 = np.asarray(t1, dtype=np.intp)
+    t2 = np.asarray(t2, dtype=np.intp)
+
+    batch = zwindows.shape[:-3]
+    n_cons, nts, n_features = zwindows.shape[-3:]
+
+    ctrdms = np.zeros(batch + (len(t1), n_cons, n_cons), dtype=zwindows.dtype)
+
+    # the runs of time pairs sharing t1
+    starts = np.flatnonzero(np.diff(t1, prepend=-1) != 0)
+    ends = np.append(starts[1:], len(t1))
+
+    # each t1 only once (e.g. the diagonal): one batched matrix product for all time pairs
+    if len(starts) == len(t1):
+
+        a = np.moveaxis(zwindows[..., t1, :], -2, -3)
+        b = np.moveaxis(zwindows[..., t2, :], -2, -3)
+        ctrdms[...] = np.matmul(a, np.swapaxes(b, -1, -2))
+
+        starts = ends = []
+
+    for start, end in zip(starts, ends):
+
+        m = end - start
+
+        # r[..., con1, con2*m+i]
+        a = zwindows[..., t1[start], :]
+        b = np.reshape(zwindows[..., t2[start:end], :], batch + (n_cons * m, n_features))
+        r = np.matmul(a, np.swapaxes(b, -1, -2))
+        r = np.reshape(r, batch + (n_cons, n_cons, m))
+
+        ctrdms[..., start:end, :, :] = np.moveaxis(r, -1, -3)
+
+    ctrdms = 1 - np.clip(ctrdms, -1, 1)
+
+    cons = np.arange(n_cons)
+    ctrdms[..., cons, cons] = 0
+
+    return ctrdms
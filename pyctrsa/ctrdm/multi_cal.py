@@ -10,16 +10,23 @@
 ' a module for calculating Cross-Temporal RDMs for multi-channels data '
 
 import numpy as np
-from pyctrsa.util.progressbar import show_progressbar
-from pyctrsa.ctrdm import single_cal
-from scipy.stats import pearsonr
+from pyctrsa.util.windows import nts_cal, window_view, zscore_windows
+from pyctrsa.util.parallel import parallel_imap
+from pyctrsa.util.store import create_store, close_store
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.util.running import RunningStats
+from pyctrsa.util.pairs import diagonal_pairs_cal, time_pairs_cal, TimePairArray
+from pyctrsa.ctrdm.gemm import ctrdms_gemm_cal, pairs_ctrdms_gemm_cal
+from pyctrsa.ctrdm.symmetric import SymmetricCTRDMs, upper_ctrdms_gemm_cal
+from pyctrsa.ctrdm.prefix import ctrdms_prefix_cal, ctrdms_prefix_sweep_cal
 
 np.seterr(divide='ignore', invalid='ignore')
 
 
 ' A function to calculate Cross-Temporal RDMs for multi-channels '
 
-def ctrdms_cal(data, sub_opt=1, chl_opt=1, time_win=10, time_step=5):
+def ctrdms_cal(data, sub_opt=1, chl_opt=1, time_win=10, time_step=5, symmetric=False, n_jobs=1, out=None, dtype=None,
+               return_var=False, engine='gemm', time_pairs=None, diagonal_only=False):
 
     """
     a function to calculate CTRDMs for multi-channels
@@ -44,6 +51,45 @@ def ctrdms_cal(data, sub_opt=1, chl_opt=1, time_win=10, time_step=5):
         If time_win=10, that means each calculation process based on 10 time-points.
     time_step : int. Default is 5.
         The time step size for each time of calculating.
+    symmetric : bool True or False. Default is False.
+        Only calculate the CTRDMs for t1 <= t2 or not.
+        If symmetric=True, return a pyctrsa.ctrdm.symmetric.SymmetricCTRDMs, which only stores the upper half of the
+        time-by-time grid and rebuilds the lower half (CTRDMs[t2, t1] = CTRDMs[t1, t2].T) when indexing.
+    n_jobs : int or None. Default is 1.
+        The number of worker processes.
+        If n_jobs=1, calculate all subjects and channels in the current process. Otherwise, the work is sharded by
+        subject (and channel if chl_opt=1) across a process pool reading the data from shared memory. If n_jobs=None or
+        n_jobs<0, use all CPUs. The results are identical whatever the number of workers is.
+    out : None or string or array. Default is None.
+        Where to write the CTRDMs.
+        If out=None, return the CTRDMs as an in-RAM array. Otherwise, the CTRDMs are calculated block by block (one
+        subject, or one subject & one channel if chl_opt=1) and each block is written to out as soon as it is ready, so
+        the peak RAM does not depend on the number of subjects and channels. out can be a file path (see
+        pyctrsa.util.store.create_store, '.h5'/'.hdf5' for a chunked HDF5 dataset, otherwise a np.memmap) or an
+        existing array of the output shape (e.g. a np.memmap or a h5py.Dataset). A HDF5 file created from a path is
+        closed when all blocks are written and returned as a read-only pyctrsa.util.store.H5Array.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of the standardized windows and of the CTRDMs. The window means and norms and the average among
+        subjects are always accumulated in float64. If dtype=None, float32 is used for float32 data or when the CTRDMs
+        of all subjects have at least 2**24 values, otherwise float64 (see pyctrsa.util.precision.dtype_cal).
+    return_var : bool True or False. Default is False.
+        Only when sub_opt=0 and out=None, it works. Otherwise, return_var=True raises a ValueError.
+        If return_var=True, also return the variance (ddof=1) of the CTRDMs among subjects.
+    engine : string 'gemm' or 'prefix'. Default is 'gemm'.
+        How to calculate the correlations of the time-windows.
+        If engine='gemm', compare the standardized time-windows by matrix products. If engine='prefix', derive the
+        correlations from prefix sums of the data subject by subject (see pyctrsa.ctrdm.prefix.ctrdms_prefix_cal),
+        which is faster when time_win is large compared with time_step, especially if chl_opt=0 with many channels.
+        The results agree to about 1e-10.
+    time_pairs : None or tuple. Default is None.
+        Only calculate the CTRDMs for a selection of time pairs: ('band', k), ('rectangle', rows, cols) or (t1, t2)
+        (see pyctrsa.util.pairs.time_pairs_cal). If time_pairs is given, the time-by-time axes [nts, nts] are replaced
+        by one axis of the selected time pairs and a pyctrsa.util.pairs.TimePairArray is returned. It only works with
+        symmetric=False and engine='gemm'.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
 
     Returns
     -------
@@ -53,75 +99,520 @@ def ctrdms_cal(data, sub_opt=1, chl_opt=1, time_win=10, time_step=5):
         int((n_ts-time_win)/time_step)+1, n_cons, n_cons]
         if chl_opt=0, the shape of CTRDMs is [n_subs, int((n_ts-time_win)/time_step)+1,
         int((n_ts-time_win)/time_step)+1, n_cons, n_cons]
+        If out is not None, the disk-backed array is returned.
+        If sub_opt=0, the CTRDMs of each subject are added to a running mean as soon as they are calculated, so only the
+        CTRDMs of one subject are kept in memory.
+    CTRDMs_var : array
+        Only when sub_opt=0 and return_var=True. The variance of the CTRDMs among subjects, of the same shape as CTRDMs.
     """
 
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
+
     n_cons, n_subs, n_chls, n_ts = np.shape(data)
 
-    nts = int((n_ts - time_win) / time_step) + 1
+    nts = nts_cal(n_ts, time_win, time_step)
 
-    # chl_opt=0
-    if chl_opt == 0:
+    if engine != 'gemm' and engine != 'prefix':
+        raise ValueError("engine should be 'gemm' or 'prefix'.")
+
+    if time_pairs is not None:
 
-        data_for_cal = np.zeros([n_cons, n_subs, nts, n_chls, time_win], dtype=np.float)
+        if symmetric or engine != 'gemm':
+            raise ValueError("time_pairs only works with symmetric=False and engine='gemm'.")
 
-        for con in range(n_cons):
-            for sub in range(n_subs):
-                for t in range(nts):
-                    for chl in range(n_chls):
-                        data_for_cal[con, sub, t, chl] = data[con, sub, chl, t * time_step:t * time_step + time_win]
+        t1, t2 = time_pairs_cal(time_pairs, nts)
+        time_pairs = (t1, t2)
+        n_pairs = len(t1)
 
-        data_for_cal = np.reshape(data_for_cal, [n_cons, n_subs, nts, n_chls*time_win])
+    else:
+        n_pairs = nts*nts
 
-        ctrdms = np.zeros([n_subs, nts, nts, n_cons, n_cons], dtype=np.float)
+    dtype = dtype_cal(dtype, size=n_subs*n_chls**chl_opt*n_pairs*n_cons*n_cons, like=np.asarray(data).dtype)
 
-        total = n_subs * nts * nts
+    if return_var and sub_opt != 0:
+        raise ValueError("return_var=True only works with sub_opt=0.")
 
-        for sub in range(n_subs):
-            for t1 in range(nts):
-                for t2 in range(nts):
-                    percent = (sub * nts * nts + t1 * nts + t2) / total * 100
-                    show_progressbar("Calculating", percent)
+    if out is not None:
 
-                    for con1 in range(n_cons):
-                        for con2 in range(n_cons):
+        if return_var:
+            raise ValueError("return_var=True is not supported with out.")
 
-                            if con1 != con2:
-                                r = pearsonr(data_for_cal[con1, sub, t1], data_for_cal[con2, sub, t2])[0]
-                                ctrdms[sub, t1, t2, con1, con2] = 1 - r
-                            if con1 == con2:
-                                ctrdms[sub, t1, t2, con1, con2] = 0
+        return ctrdms_store_cal(data, out, sub_opt=sub_opt, chl_opt=chl_opt, time_win=time_win, time_step=time_step,
+                                symmetric=symmetric, n_jobs=n_jobs, dtype=dtype, engine=engine, time_pairs=time_pairs)
 
-        # chl_opt=0 & sub_opt=0
-        if sub_opt == 0:
+    if sub_opt == 0:
+
+        return ctrdms_avg_cal(data, chl_opt=chl_opt, time_win=time_win, time_step=time_step, symmetric=symmetric,
+                              n_jobs=n_jobs, dtype=dtype, return_var=return_var, engine=engine,
+                              time_pairs=time_pairs)
+
+    if n_jobs == 1 and engine == 'prefix':
+
+        ctrdms = np.stack([ctrdms_unit_cal([data], (sub,), chl_opt=chl_opt, time_win=time_win, time_step=time_step,
+                                           symmetric=symmetric, dtype=dtype, engine=engine) for sub in range(n_subs)])
+
+    elif n_jobs == 1:
+
+        # all time-windows as one strided view: [n_cons, n_subs, n_chls, nts, time_win]
+        windows = window_view(data, time_win=time_win, time_step=time_step)
+
+        # chl_opt=0: [n_subs, n_cons, nts, n_chls*time_win]
+        if chl_opt == 0:
+            data_for_cal = np.reshape(np.transpose(windows, (1, 0, 3, 2, 4)), [n_subs, n_cons, nts, n_chls*time_win])
 
-            return np.average(ctrdms, axis=0)
+        # chl_opt=1: [n_subs, n_chls, n_cons, nts, time_win]
+        else:
+            data_for_cal = np.transpose(windows, (1, 2, 0, 3, 4))
+
+        if symmetric:
+            ctrdms = upper_ctrdms_gemm_cal(zscore_windows(data_for_cal, dtype=dtype)).upper
+        elif time_pairs is not None:
+            ctrdms = pairs_ctrdms_gemm_cal(zscore_windows(data_for_cal, dtype=dtype), t1, t2)
+        else:
+            ctrdms = ctrdms_gemm_cal(zscore_windows(data_for_cal, dtype=dtype))
 
-        # chl_opt=0 & sub_opt=1
+    else:
+
+        if chl_opt == 0:
+            units = [(sub,) for sub in range(n_subs)]
         else:
+            units = [(sub, chl) for sub in range(n_subs) for chl in range(n_chls)]
+
+        ctrdms = None
+
+        # each result is written into the output as it arrives, so the results are never all held at once
+        for unit, result in parallel_imap(ctrdms_unit_cal, [data], units, n_jobs=n_jobs, chl_opt=chl_opt,
+                                          time_win=time_win, time_step=time_step, symmetric=symmetric, dtype=dtype,
+                                          engine=engine, time_pairs=time_pairs):
+
+            if ctrdms is None:
+                ctrdms = np.zeros([n_subs, n_chls][:len(unit)] + list(np.shape(result)), dtype=dtype)
+
+            ctrdms[unit] = result
+
+    if symmetric:
+        return SymmetricCTRDMs(ctrdms, nts)
+
+    if time_pairs is not None:
+        return TimePairArray(ctrdms, t1, t2, nts, n_tail=2)
+
+    return ctrdms
 
-            return ctrdms
 
-    # chl_opt=1
+' a function to calculate the average Cross-Temporal RDMs among subjects subject by subject '
+
+def ctrdms_avg_cal(data, chl_opt=1, time_win=10, time_step=5, symmetric=False, n_jobs=1, dtype=None, return_var=False,
+                   engine='gemm', time_pairs=None):
+
+    """
+    a function to calculate the avg CTRDMs among all subjects by a running mean
+
+    The CTRDMs of each subject are added to a running mean (and variance) as soon as they are calculated, so the peak
+    memory is that of the CTRDMs of one subject, not of all subjects.
+
+    Parameters
+    ----------
+    data, chl_opt, time_win, time_step, symmetric, n_jobs, dtype, return_var, engine, time_pairs :
+        The same as ctrdms_cal().
+
+    Returns
+    -------
+    CTRDMs : array
+        The avg CTRDMs among all subjects, the same as ctrdms_cal(data, sub_opt=0, ...).
+    CTRDMs_var : array
+        Only when return_var=True. The variance (ddof=1) of the CTRDMs among subjects.
+    """
+
+    n_cons, n_subs, n_chls, n_ts = np.shape(data)
+
+    nts = nts_cal(n_ts, time_win, time_step)
+
+    if time_pairs is not None:
+        t1, t2 = time_pairs_cal(time_pairs, nts)
+        time_pairs = (t1, t2)
+        n_pairs = len(t1)
     else:
+        n_pairs = nts*nts
+
+    dtype = dtype_cal(dtype, size=n_chls**chl_opt*n_pairs*n_cons*n_cons, like=np.asarray(data).dtype)
+
+    kwargs = {'chl_opt': chl_opt, 'time_win': time_win, 'time_step': time_step, 'symmetric': symmetric,
+              'dtype': dtype, 'engine': engine, 'time_pairs': time_pairs}
 
-        ctrdms = np.zeros([n_subs, n_chls, nts, nts, n_cons, n_cons], dtype=np.float)
+    stats = RunningStats(var=return_var)
 
+    if n_jobs == 1:
+
+        # all channels of a subject are calculated together
         for sub in range(n_subs):
-            for chl in range(n_chls):
+            stats.add(ctrdms_unit_cal([data], (sub,), **kwargs))
+
+    else:
+
+        if chl_opt == 0:
+            units = [(sub,) for sub in range(n_subs)]
+        else:
+            units = [(sub, chl) for sub in range(n_subs) for chl in range(n_chls)]
+
+        block = None
 
-                print("\nSubject "+str(sub+1)+" Channel "+str(chl+1)+":")
+        for unit, result in parallel_imap(ctrdms_unit_cal, [data], units, n_jobs=n_jobs, **kwargs):
 
-                ctrdms[sub, chl] = single_cal.ctrdm_cal(data[:, sub, chl], time_win=time_win, time_step=time_step)
+            if chl_opt == 0:
+                stats.add(result)
+                continue
+
+            # collect the channels of a subject
+            if block is None:
+                block = np.zeros([n_chls] + list(np.shape(result)), dtype=dtype)
+
+            block[unit[1]] = result
+
+            if unit[1] == n_chls - 1:
+                stats.add(block)
+
+    ctrdms = stats.mean.astype(dtype, copy=False)
+
+    if symmetric:
+        ctrdms = SymmetricCTRDMs(ctrdms, nts)
+    elif time_pairs is not None:
+        ctrdms = TimePairArray(ctrdms, t1, t2, nts, n_tail=2)
+
+    if not return_var:
+        return ctrdms
+
+    var = stats.var().astype(dtype, copy=False)
+
+    if symmetric:
+        var = SymmetricCTRDMs(var, nts)
+    elif time_pairs is not None:
+        var = TimePairArray(var, t1, t2, nts, n_tail=2)
+
+    return ctrdms, var
+
+
+' a function to calculate Cross-Temporal RDMs block by block into a disk-backed array '
+
+def ctrdms_store_cal(data, out, sub_opt=1, chl_opt=1, time_win=10, time_step=5, symmetric=False, n_jobs=1,
+                     dtype=None, engine='gemm', time_pairs=None):
+
+    """
+    a function to calculate CTRDMs for multi-channels block by block and write them to a (disk-backed) array
+
+    Parameters
+    ----------
+    data, sub_opt, chl_opt, time_win, time_step, symmetric, n_jobs, dtype, engine, time_pairs :
+        The same as ctrdms_cal().
+    out : string or array
+        A file path (see pyctrsa.util.store.create_store) or an existing array of the output shape.
+
+    Returns
+    -------
+    CTRDMs : array
+        The array the CTRDMs are written to. If out is a '.h5'/'.hdf5' path, the file is closed and a read-only
+        pyctrsa.util.store.H5Array is returned. If symmetric=True, a SymmetricCTRDMs backed by it. If time_pairs is
+        given, a TimePairArray backed by it.
+    """
+
+    n_cons, n_subs, n_chls, n_ts = np.shape(data)
+
+    nts = nts_cal(n_ts, time_win, time_step)
+
+    if symmetric:
+        block_shape = [nts*(nts+1)//2, n_cons, n_cons]
+    elif time_pairs is not None:
+        t1, t2 = time_pairs_cal(time_pairs, nts)
+        time_pairs = (t1, t2)
+        block_shape = [len(t1), n_cons, n_cons]
+    else:
+        block_shape = [nts, nts, n_cons, n_cons]
+
+    # subjects in the inner loop, so the blocks of a channel can be averaged as soon as they are ready
+    if chl_opt == 0:
+        units = [(sub,) for sub in range(n_subs)]
+        out_shape = [n_subs] + block_shape
+    else:
+        units = [(sub, chl) for chl in range(n_chls) for sub in range(n_subs)]
+        out_shape = [n_subs, n_chls] + block_shape
+
+    if sub_opt == 0:
+        out_shape = out_shape[1:]
+
+    dtype = dtype_cal(dtype, size=int(np.prod(out_shape)), like=np.asarray(data).dtype)
+
+    # the stores created here are closed when all blocks are written, the others are only flushed
+    created = isinstance(out, str)
+
+    if created:
+        out = create_store(out, out_shape, dtype=dtype, block_ndim=len(block_shape))
+    elif tuple(np.shape(out)) != tuple(out_shape):
+        raise ValueError("The shape of out should be " + str(tuple(out_shape)) + ".")
+
+    kwargs = {'chl_opt': chl_opt, 'time_win': time_win, 'time_step': time_step, 'symmetric': symmetric,
+              'dtype': dtype, 'engine': engine, 'time_pairs': time_pairs}
+
+    if n_jobs == 1:
+        results = ((unit, ctrdms_unit_cal([data], unit, **kwargs)) for unit in units)
+    else:
+        results = parallel_imap(ctrdms_unit_cal, [data], units, n_jobs=n_jobs, **kwargs)
+
+    total = 0
+    count = 0
+
+    for unit, result in results:
 
-        # chl_opt=1 & sub_opt=0
         if sub_opt == 0:
 
-            return np.average(ctrdms, axis=0)
+            total = total + result.astype(np.float64)
+            count = count + 1
+
+            if count == n_subs:
+                out[unit[1:]] = total / n_subs
+                total = 0
+                count = 0
+
+        else:
+
+            out[unit] = result
+
+    if created:
+        out = close_store(out)
+    elif hasattr(out, 'flush'):
+        out.flush()
+
+    if symmetric:
+        return SymmetricCTRDMs(out, nts)
+
+    if time_pairs is not None:
+        return TimePairArray(out, t1, t2, nts, n_tail=2)
+
+    return out
+
 
-        # chl_opt=1 & sub_opt=1
+' a function to calculate Cross-Temporal RDMs for several time-window settings at once '
+
+def ctrdms_sweep_cal(data, configs, sub_opt=1, chl_opt=1, symmetric=False, n_jobs=1, dtype=None):
+
+    """
+    a function to calculate CTRDMs for multi-channels for several (time_win, time_step) settings sharing the work
+
+    The data of each subject (and channel) is read once and its prefix sums (see pyctrsa.ctrdm.prefix.
+    ctrdms_prefix_sweep_cal) are shared by all settings, so a sweep costs much less than calling ctrdms_cal() once per
+    setting.
+
+    Parameters
+    ----------
+    data : array
+        EEG/MEG data of shape [n_conditions, n_subs, n_channels, n_ts].
+    configs : list of tuples (time_win, time_step)
+        The time-window settings.
+    sub_opt, chl_opt, symmetric, n_jobs, dtype :
+        The same as ctrdms_cal(). The dtype is chosen for each setting.
+
+    Returns
+    -------
+    CTRDMs : list of arrays
+        The CTRDMs of each setting, the same as ctrdms_cal(data, sub_opt, chl_opt, time_win, time_step, symmetric,
+        engine='prefix') up to rounding errors (about 1e-10).
+
+    Notes
+    -----
+    The prefix sums take about (n_ts/g)**2*n_cons**2 float64 values for each subject (and channel), with g the gcd of
+    all time_win and time_step.
+    """
+
+    n_cons, n_subs, n_chls, n_ts = np.shape(data)
+
+    configs = [(int(time_win), int(time_step)) for time_win, time_step in configs]
+
+    nts_list = [nts_cal(n_ts, time_win, time_step) for time_win, time_step in configs]
+
+    dtypes = [dtype_cal(dtype, size=n_subs**sub_opt*n_chls**chl_opt*nts*nts*n_cons*n_cons, like=np.asarray(data).dtype)
+              for nts in nts_list]
+
+    if chl_opt == 0:
+        units = [(sub,) for sub in range(n_subs)]
+    else:
+        units = [(sub, chl) for sub in range(n_subs) for chl in range(n_chls)]
+
+    kwargs = {'configs': configs, 'chl_opt': chl_opt, 'symmetric': symmetric}
+
+    if n_jobs == 1:
+        results = ((unit, ctrdms_sweep_unit_cal([data], unit, **kwargs)) for unit in units)
+    else:
+        results = parallel_imap(ctrdms_sweep_unit_cal, [data], units, n_jobs=n_jobs, **kwargs)
+
+    # sub_opt=0: a running mean of each setting (and channel)
+    if sub_opt == 0:
+
+        stats = [[RunningStats() for chl in range(n_chls**chl_opt)] for config in configs]
+
+        for unit, result in results:
+            for i in range(len(configs)):
+                stats[i][unit[1] if chl_opt else 0].add(result[i])
+
+        ctrdms_list = [np.stack([chl_stats.mean for chl_stats in config_stats]) for config_stats in stats]
+
+        if chl_opt == 0:
+            ctrdms_list = [ctrdms[0] for ctrdms in ctrdms_list]
+
+        ctrdms_list = [ctrdms.astype(dtypes[i], copy=False) for i, ctrdms in enumerate(ctrdms_list)]
+
+    else:
+
+        ctrdms_list = [None] * len(configs)
+
+        for unit, result in results:
+            for i in range(len(configs)):
+
+                if ctrdms_list[i] is None:
+                    ctrdms_list[i] = np.zeros([n_subs, n_chls][:len(unit)] + list(np.shape(result[i])),
+                                              dtype=dtypes[i])
+
+                ctrdms_list[i][unit] = result[i]
+
+    if symmetric:
+        return [SymmetricCTRDMs(ctrdms, nts) for ctrdms, nts in zip(ctrdms_list, nts_list)]
+
+    return ctrdms_list
+
+
+' a function to calculate the Cross-Temporal RDMs for one subject (and one channel) '
+
+def ctrdms_unit_cal(arrays, unit, chl_opt=1, time_win=10, time_step=5, symmetric=False, dtype=np.float64,
+                    engine='gemm', time_pairs=None):
+
+    """
+    a function to calculate the CTRDMs of one work unit, used by the process pool in ctrdms_cal()
+
+    Parameters
+    ----------
+    arrays : list [data]
+        data is the EEG/MEG data of shape [n_conditions, n_subs, n_channels, n_ts].
+    unit : tuple (sub,) or (sub, chl)
+        The subject (and the channel) to calculate. If chl_opt=0, unit=(sub,). If chl_opt=1, unit=(sub, chl), or
+        unit=(sub,) for all channels of the subject.
+    chl_opt, time_win, time_step, symmetric, dtype, engine, time_pairs :
+        The same as ctrdms_cal().
+
+    Returns
+    -------
+    CTRDMs : array
+        The CTRDMs of shape [nts, nts, n_cons, n_cons], or the upper half of shape [nts*(nts+1)/2, n_cons, n_cons] if
+        symmetric=True, or the selected time pairs of shape [n_pairs, n_cons, n_cons] if time_pairs is given. If
+        chl_opt=1 and unit=(sub,), there is a leading channel axis.
+    """
+
+    if engine == 'prefix':
+
+        data = arrays[0]
+
+        # chl_opt=0: [n_cons, n_chls, n_ts], the channels form one feature vector
+        if chl_opt == 0:
+            ctrdms = ctrdms_prefix_cal(data[:, unit[0]], time_win=time_win, time_step=time_step, sum_axis=-2,
+                                       symmetric=symmetric)
+
+        # chl_opt=1 & all channels: [n_chls, n_cons, n_ts]
+        elif len(unit) == 1:
+            ctrdms = ctrdms_prefix_cal(np.swapaxes(data[:, unit[0]], 0, 1), time_win=time_win, time_step=time_step,
+                                       symmetric=symmetric)
+
+        # chl_opt=1: [n_cons, n_ts]
         else:
+            ctrdms = ctrdms_prefix_cal(data[:, unit[0], unit[1]], time_win=time_win, time_step=time_step,
+                                       symmetric=symmetric)
+
+        return ctrdms.astype(dtype, copy=False)
+
+    zwindows = zwindows_cal(arrays[0], unit, chl_opt=chl_opt, time_win=time_win, time_step=time_step, dtype=dtype)
+
+    if symmetric:
+        return upper_ctrdms_gemm_cal(zwindows).upper
+
+    if time_pairs is not None:
+        t1, t2 = time_pairs_cal(time_pairs, np.shape(zwindows)[-2])
+        return pairs_ctrdms_gemm_cal(zwindows, t1, t2)
+
+    return ctrdms_gemm_cal(zwindows)
+
+
+' a function to calculate the Cross-Temporal RDMs of several time-window settings for one subject (and one channel) '
+
+def ctrdms_sweep_unit_cal(arrays, unit, configs, chl_opt=1, symmetric=False):
+
+    """
+    a function to calculate the CTRDMs of several time-window settings for one work unit, used by ctrdms_sweep_cal()
+
+    Parameters
+    ----------
+    arrays : list [data]
+        data is the EEG/MEG data of shape [n_conditions, n_subs, n_channels, n_ts].
+    unit : tuple (sub,) or (sub, chl)
+        The subject (and the channel) to calculate. If chl_opt=0, unit=(sub,). If chl_opt=1, unit=(sub, chl).
+    configs, chl_opt, symmetric :
+        The same as ctrdms_sweep_cal().
+
+    Returns
+    -------
+    CTRDMs : list of arrays
+        The CTRDMs (float64) of each setting, of shape [nts, nts, n_cons, n_cons], or the upper half of shape
+        [nts*(nts+1)/2, n_cons, n_cons] if symmetric=True.
+    """
+
+    data = arrays[0]
+
+    # chl_opt=0: [n_cons, n_chls, n_ts], the channels form one feature vector
+    if chl_opt == 0:
+        ctrdms_list = ctrdms_prefix_sweep_cal(data[:, unit[0]], configs, sum_axis=-2, symmetric=symmetric)
+
+    # chl_opt=1: [n_cons, n_ts]
+    else:
+        ctrdms_list = ctrdms_prefix_sweep_cal(data[:, unit[0], unit[1]], configs, symmetric=symmetric)
+
+    return ctrdms_list
+
+
+' a function to get the standardized time-windows of one subject (and one channel) '
+
+def zwindows_cal(data, unit, chl_opt=1, time_win=10, time_step=5, dtype=np.float64):
+
+    """
+    a function to get the standardized time-windows of one subject (and one channel)
+
+    Parameters
+    ----------
+    data : array
+        EEG/MEG data of shape [n_conditions, n_subs, n_channels, n_ts].
+    unit : tuple (sub,) or (sub, chl)
+        The subject (and the channel). If chl_opt=0, unit=(sub,). If chl_opt=1, unit=(sub, chl), or unit=(sub,) for
+        all channels of the subject.
+    chl_opt, time_win, time_step, dtype :
+        The same as ctrdms_cal().
+
+    Returns
+    -------
+    zwindows : array
+        The standardized time-windows (see pyctrsa.util.windows.zscore_windows).
+        If chl_opt=0, the shape is [n_cons, nts, n_chls*time_win].
+        If chl_opt=1 and unit=(sub,), the shape is [n_chls, n_cons, nts, time_win].
+        If chl_opt=1 and unit=(sub, chl), the shape is [n_cons, nts, time_win].
+    """
+
+    # chl_opt=0: [n_cons, nts, n_chls*time_win]
+    if chl_opt == 0:
+        windows = window_view(data[:, unit[0]], time_win=time_win, time_step=time_step)
+        n_cons, n_chls, nts = np.shape(windows)[:3]
+        data_for_cal = np.reshape(np.transpose(windows, (0, 2, 1, 3)), [n_cons, nts, n_chls*time_win])
+
+    # chl_opt=1 & all channels: [n_chls, n_cons, nts, time_win]
+    elif len(unit) == 1:
+        data_for_cal = np.transpose(window_view(data[:, unit[0]], time_win=time_win, time_step=time_step), (1, 0, 2, 3))
+
+    # chl_opt=1: [n_cons, nts, time_win]
+    else:
+        data_for_cal = window_view(data[:, unit[0], unit[1]], time_win=time_win, time_step=time_step)
 
-            return ctrdms
+    return zscore_windows(data_for_cal, dtype=dtype)
 
 # test
 #data = np.random.rand(16, 40, 5, 50)
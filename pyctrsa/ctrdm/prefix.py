@@ -0,0 +1,108 @@
+# -*- coding: utf-8
+
+"""
+@File       :   prefix.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for calculating Cross-Temporal RDMs from prefix sums of the data '
+
+import numpy as np
+from math import gcd
+from functools import reduce
+from pyctrsa.util.prefix import PrefixSums
+
+
+' a function for calculating Cross-Temporal RDMs from prefix sums of the data '
+
+def ctrdms_prefix_cal(data, time_win=10, time_step=5, sum_axis=None, symmetric=False):
+
+    """
+    Calculate the CTRDMs from the cumulative sums (of the values, squares and lagged cross-products) of the data
+
+    The cross-products of all pairs of time-windows are derived from 2-D prefix sums of the lagged cross-products of
+    blocks of gcd(time_win, time_step) time-points (see pyctrsa.util.prefix.cross_sums), so the matrix product has an
+    inner size of gcd(time_win, time_step) instead of time_win. It is faster than pyctrsa.ctrdm.gemm.ctrdms_gemm_cal()
+    when time_win is large compared with time_step.
+
+    Parameters
+    ----------
+    data : array [..., n_conditions, n_ts] or [..., n_conditions, n_channels, n_ts]
+        The data. Any leading axes (e.g. subjects, channels) are batch axes.
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+    sum_axis : None or -2. Default is None.
+        If sum_axis=-2, the data is [..., n_conditions, n_channels, n_ts] and the windows of all channels form one
+        feature vector (chl_opt=0).
+    symmetric : bool True or False. Default is False.
+        Only calculate the CTRDMs for t1 <= t2 or not.
+
+    Returns
+    -------
+    CTRDMs : array [..., nts, nts, n_conditions, n_conditions]
+        Cross-Temporal RDMs, the same as pyctrsa.ctrdm.gemm.ctrdms_gemm_cal() of the standardized windows up to rounding
+        errors (about 1e-10). If symmetric=True, the upper half of shape [..., nts*(nts+1)/2, n_conditions,
+        n_conditions] (see pyctrsa.ctrdm.symmetric.SymmetricCTRDMs).
+    """
+
+    return ctrdms_prefix_sweep_cal(data, [(time_win, time_step)], sum_axis=sum_axis, symmetric=symmetric)[0]
+
+
+' a function for calculating Cross-Temporal RDMs of several time-window settings from shared prefix sums '
+
+def ctrdms_prefix_sweep_cal(data, configs, sum_axis=None, symmetric=False):
+
+    """
+    Calculate the CTRDMs of several (time_win, time_step) settings from one set of prefix sums of the data
+
+    The cumulative sums and the 2-D prefix sums of the cross-products (see pyctrsa.util.prefix.PrefixSums) are
+    calculated once, with blocks of the gcd of all time_win and time_step, and each setting only derives its
+    correlations from them.
+
+    Parameters
+    ----------
+    data : array [..., n_conditions, n_ts] or [..., n_conditions, n_channels, n_ts]
+        The data. Any leading axes (e.g. subjects, channels) are batch axes.
+    configs : list of tuples (time_win, time_step)
+        The time-window settings.
+    sum_axis : None or -2. Default is None.
+        If sum_axis=-2, the data is [..., n_conditions, n_channels, n_ts] and the windows of all channels form one
+        feature vector (chl_opt=0).
+    symmetric : bool True or False. Default is False.
+        Only calculate the CTRDMs for t1 <= t2 or not.
+
+    Returns
+    -------
+    CTRDMs : list of arrays [..., nts, nts, n_conditions, n_conditions]
+        The CTRDMs of each setting, the same as ctrdms_prefix_cal(data, time_win, time_step, sum_axis, symmetric).
+    """
+
+    data = np.asarray(data)
+
+    # [..., n_conditions, K, n_ts], the windows of the K channels form one feature vector
+    if sum_axis is None:
+        data = data[..., np.newaxis, :]
+
+    block = reduce(gcd, [value for config in configs for value in config])
+
+    sums = PrefixSums(data, data, block=block, center=True)
+
+    ctrdms_list = []
+
+    for time_win, time_step in configs:
+
+        # [..., nts, nts, n_conditions, n_conditions] or [..., nts*(nts+1)/2, n_conditions, n_conditions]
+        ctrdms = sums.similarities(time_win=time_win, time_step=time_step, method='pearson', upper=symmetric)
+
+        np.subtract(1, ctrdms, out=ctrdms)
+
+        cons = np.arange(np.shape(ctrdms)[-1])
+        ctrdms[..., cons, cons] = 0
+
+        ctrdms_list.append(ctrdms)
+
+    return ctrdms_list
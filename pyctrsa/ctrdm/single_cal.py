@@ -10,15 +10,20 @@
 ' a module for calculating Cross-Temporal RDMs for a single channel & a single subject '
 
 import numpy as np
-from pyctrsa.util.progressbar import show_progressbar
-from scipy.stats import pearsonr
+from pyctrsa.util.windows import window_view, zscore_windows
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.ctrdm.gemm import ctrdms_gemm_cal, pairs_ctrdms_gemm_cal
+from pyctrsa.ctrdm.symmetric import SymmetricCTRDMs, upper_ctrdms_gemm_cal
+from pyctrsa.ctrdm.prefix import ctrdms_prefix_cal
+from pyctrsa.util.pairs import diagonal_pairs_cal, time_pairs_cal, TimePairArray
 
 np.seterr(divide='ignore', invalid='ignore')
 
 
 ' A function to calculate Cross-Temporal RDMs for a single channel & a single subject '
 
-def ctrdm_cal(data, time_win=10, time_step=5):
+def ctrdm_cal(data, time_win=10, time_step=5, symmetric=False, dtype=None, engine='gemm', time_pairs=None,
+              diagonal_only=False):
 
     """
     a function to calculate CTRDMs for a single channel & a single subject
@@ -34,41 +39,80 @@ def ctrdm_cal(data, time_win=10, time_step=5):
         If time_win=10, that means each calculation process based on 10 time-points.
     time_step : int. Default is 5.
         The time step size for each time of calculating.
+    symmetric : bool True or False. Default is False.
+        Only calculate the CTRDMs for t1 <= t2 or not.
+        If symmetric=True, return a pyctrsa.ctrdm.symmetric.SymmetricCTRDMs, which only stores the upper half of the
+        time-by-time grid and rebuilds the lower half (CTRDMs[t2, t1] = CTRDMs[t1, t2].T) when indexing.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of the standardized windows and of the CTRDMs. The window means and norms are always accumulated
+        in float64. If dtype=None, float32 is used for float32 data or when the CTRDMs have at least 2**24 values,
+        otherwise float64 (see pyctrsa.util.precision.dtype_cal).
+    engine : string 'gemm' or 'prefix'. Default is 'gemm'.
+        How to calculate the correlations of the time-windows.
+        If engine='gemm', compare the standardized time-windows by matrix products. If engine='prefix', derive the
+        correlations from prefix sums of the data (see pyctrsa.ctrdm.prefix.ctrdms_prefix_cal), which is faster when
+        time_win is large compared with time_step. The results agree to about 1e-10.
+    time_pairs : None or tuple. Default is None.
+        Only calculate the CTRDMs for a selection of time pairs: ('band', k) for |t1-t2| <= k, ('rectangle', rows, cols)
+        for the time-windows rows against the time-windows cols, or (t1, t2) for explicit lists of time pairs (see
+        pyctrsa.util.pairs.time_pairs_cal). If time_pairs is given, return a pyctrsa.util.pairs.TimePairArray, which
+        only stores the CTRDMs of the selected time pairs.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
 
     Returns
     -------
     CTRDMs : array [int((n_ts-time_win)/time_step)+1, int((n_ts-time_win)/time_step)+1, n_conditions, n_conditions]
         Cross-Temporal RDMs.
+        If symmetric=True, a pyctrsa.ctrdm.symmetric.SymmetricCTRDMs of the same shape, which only stores the CTRDMs for
+        t1 <= t2.
+        If time_pairs is given (or diagonal_only=True), a pyctrsa.util.pairs.TimePairArray of the same shape, which only
+        stores the CTRDMs of the selected time pairs: its values have the shape [n_pairs, n_conditions, n_conditions]
+        ([nts, n_conditions, n_conditions] if diagonal_only=True).
     """
 
-    n_cons, n_ts = np.shape(data)
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
 
-    nts = int((n_ts - time_win) / time_step) + 1
+    # all time-windows as one strided view: [n_cons, nts, time_win]
+    windows = window_view(data, time_win=time_win, time_step=time_step)
 
-    data_for_cal = np.zeros([n_cons, nts, time_win], dtype=np.float)
+    n_cons, nts = np.shape(windows)[:2]
 
-    for con in range(n_cons):
-        for t in range(nts):
-            data_for_cal[con, t] = data[con, t*time_step:t*time_step+time_win]
+    if time_pairs is not None:
 
-    ctrdms = np.zeros([nts, nts, n_cons, n_cons], dtype=np.float)
+        if symmetric or engine != 'gemm':
+            raise ValueError("time_pairs only works with symmetric=False and engine='gemm'.")
 
-    total = nts*nts
+        t1, t2 = time_pairs_cal(time_pairs, nts)
 
-    for t1 in range(nts):
-        for t2 in range(nts):
+        dtype = dtype_cal(dtype, size=len(t1)*n_cons*n_cons, like=windows.dtype)
 
-            percent = (t1*nts + t2)/total*100
-            show_progressbar("Calculating", percent)
+        ctrdms = pairs_ctrdms_gemm_cal(zscore_windows(windows, dtype=dtype), t1, t2)
 
-            for con1 in range(n_cons):
-                for con2 in range(n_cons):
+        return TimePairArray(ctrdms, t1, t2, nts, n_tail=2)
 
-                    if con1 != con2:
-                        r = pearsonr(data_for_cal[con1, t1], data_for_cal[con2, t2])[0]
-                        ctrdms[t1, t2, con1, con2] = 1-r
-                    if con1 == con2:
-                        ctrdms[t1, t2, con1, con2] = 0
+    dtype = dtype_cal(dtype, size=nts*nts*n_cons*n_cons, like=windows.dtype)
+
+    if engine == 'prefix':
+
+        ctrdms = ctrdms_prefix_cal(data, time_win=time_win, time_step=time_step,
+                                   symmetric=symmetric).astype(dtype, copy=False)
+
+        if symmetric:
+            return SymmetricCTRDMs(ctrdms, nts)
+
+        return ctrdms
+
+    if engine != 'gemm':
+        raise ValueError("engine should be 'gemm' or 'prefix'.")
+
+    if symmetric:
+
+        return upper_ctrdms_gemm_cal(zscore_windows(windows, dtype=dtype))
+
+    ctrdms = ctrdms_gemm_cal(zscore_windows(windows, dtype=dtype))
 
     return ctrdms
 
@@ -0,0 +1,209 @@
+# -*- coding: utf-8
+
+"""
+@File       :   streaming.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for updating Cross-Temporal RDMs incrementally as new samples arrive '
+
+import numpy as np
+from pyctrsa.util.windows import nts_cal, window_view, zscore_windows
+
+
+' a class for updating Cross-Temporal RDMs incrementally as new samples arrive '
+
+class StreamingCTRDMs(object):
+
+    """
+    Cross-Temporal RDMs of a data stream, updated as new samples arrive
+
+    The incoming samples are cut into time-windows as soon as enough samples have arrived. Each new time-window is
+    standardized once and compared with the stored time-windows by one matrix product, which gives the new row of the
+    time-by-time grid; the new column is its transpose (CTRDMs[t2, t1] = CTRDMs[t1, t2].T). The stored time-windows
+    and the grid are ring buffers of max_windows time-windows, so the memory and the cost of an update do not grow
+    with the length of the stream.
+
+    Parameters
+    ----------
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+    max_windows : int. Default is 100.
+        The number of the latest time-windows kept in the history.
+    chl_opt : int 0 or 1. Default is 1.
+        Only for samples of shape [n_conditions, n_channels, n_new].
+        If chl_opt=1, calculate the CTRDMs for each channel. If chl_opt=0, the windows of all channels form one feature
+        vector.
+    dtype : numpy floating dtype. Default is np.float64.
+        The precision of the stored time-windows and of the CTRDMs.
+
+    Notes
+    -----
+    After feeding the data of shape [n_conditions, n_ts] (in any number of updates), ctrdms() is the same as
+    pyctrsa.ctrdm.single_cal.ctrdm_cal(data, time_win, time_step) for the last max_windows time-windows.
+    """
+
+    def __init__(self, time_win=10, time_step=5, max_windows=100, chl_opt=1, dtype=np.float64):
+
+        if max_windows < 1:
+            raise ValueError("max_windows should be >= 1.")
+
+        self.time_win = time_win
+        self.time_step = time_step
+        self.max_windows = max_windows
+        self.chl_opt = chl_opt
+        self.dtype = np.dtype(dtype)
+
+        # the samples not yet used by a time-window, starting at the time-point offset of the stream
+        self.samples = None
+        self.offset = 0
+
+        # the number of time-windows so far, the stored standardized time-windows & the grid (ring buffers)
+        self.n_windows = 0
+        self.zwindows = None
+        self.grid = None
+
+    @property
+    def n_stored(self):
+
+        """
+        The number of time-windows in the history
+        """
+
+        return min(self.n_windows, self.max_windows)
+
+    @property
+    def window_indices(self):
+
+        """
+        The indices (in the whole stream) of the time-windows in the history, from the oldest to the latest
+        """
+
+        return np.arange(self.n_windows - self.n_stored, self.n_windows)
+
+    def update(self, samples):
+
+        """
+        Add new samples
+
+        Parameters
+        ----------
+        samples : array [n_conditions, n_new] or [n_conditions, n_channels, n_new]
+            The new samples of each condition (and channel).
+
+        Returns
+        -------
+        CTRDMs : array [..., n_new_windows, n_stored, n_conditions, n_conditions]
+            The CTRDMs between each new time-window (t1) and each time-window in the history (t2, from the oldest to the
+            latest). If chl_opt=1 and samples have a channel axis, there is a leading n_channels axis. If there are more
+            than max_windows new time-windows, only the latest max_windows ones are returned. None if no new time-window
+            is complete.
+        """
+
+        samples = np.asarray(samples)
+
+        if self.samples is None:
+            self.samples = samples[..., :0]
+
+        self.samples = np.concatenate([self.samples, samples], axis=-1)
+
+        # the new time-windows which are complete
+        start = self.n_windows * self.time_step - self.offset
+        n_new = 0
+
+        if np.shape(self.samples)[-1] - start >= self.time_win:
+            n_new = nts_cal(np.shape(self.samples)[-1] - start, self.time_win, self.time_step)
+
+        if n_new > 0:
+
+            windows = window_view(self.samples[..., start:start+(n_new-1)*self.time_step+self.time_win],
+                                  time_win=self.time_win, time_step=self.time_step)
+
+            # [..., n_cons, n_new, n_features]
+            if np.ndim(self.samples) == 3:
+                if self.chl_opt == 0:
+                    n_cons, n_chls = np.shape(windows)[:2]
+                    windows = np.reshape(np.transpose(windows, (0, 2, 1, 3)), [n_cons, n_new, n_chls*self.time_win])
+                else:
+                    windows = np.transpose(windows, (1, 0, 2, 3))
+
+            zwindows = zscore_windows(windows, dtype=self.dtype)
+
+            if self.zwindows is None:
+                batch = np.shape(zwindows)[:-3]
+                n_cons, n_features = np.shape(zwindows)[-3], np.shape(zwindows)[-1]
+                self.zwindows = np.zeros(batch + (n_cons, self.max_windows, n_features), dtype=self.dtype)
+                self.grid = np.zeros(batch + (self.max_windows, self.max_windows, n_cons, n_cons), dtype=self.dtype)
+
+            # the time-windows which would leave the history within this update are skipped
+            skip = max(0, n_new - self.max_windows)
+            self.n_windows = self.n_windows + skip
+
+            for i in range(skip, n_new):
+                self.add_window(zwindows[..., i, :])
+
+        # drop the samples which no later time-window needs
+        drop = min(self.n_windows * self.time_step - self.offset, np.shape(self.samples)[-1])
+        self.samples = self.samples[..., drop:]
+        self.offset = self.offset + drop
+
+        if n_new == 0:
+            return None
+
+        slots = self.window_indices % self.max_windows
+
+        return self.grid[..., slots[-min(n_new, self.n_stored):, np.newaxis], slots, :, :]
+
+    def add_window(self, zwindow):
+
+        """
+        Add one standardized time-window and calculate its row and column of the grid
+
+        Parameters
+        ----------
+        zwindow : array [..., n_conditions, n_features]
+            The standardized time-window (see pyctrsa.util.windows.zscore_windows).
+        """
+
+        slot = self.n_windows % self.max_windows
+
+        self.zwindows[..., slot, :] = zwindow
+        self.n_windows = self.n_windows + 1
+
+        # the stored time-windows are the slots [0, n_stored) whatever their order in the stream
+        m = self.n_stored
+        n_cons = np.shape(self.zwindows)[-3]
+
+        # r[..., con2, con1, slot] between the new time-window and the stored time-windows, without copying them
+        r = np.matmul(zwindow[..., np.newaxis, :, :], np.swapaxes(self.zwindows[..., :m, :], -1, -2))
+        r = np.moveaxis(r, -1, -3)
+
+        row = 1 - np.clip(np.swapaxes(r, -1, -2), -1, 1)
+
+        cons = np.arange(n_cons)
+        row[..., cons, cons] = 0
+
+        self.grid[..., slot, :m, :, :] = row
+        self.grid[..., :m, slot, :, :] = np.swapaxes(row, -1, -2)
+
+    def ctrdms(self):
+
+        """
+        Get the CTRDMs of the time-windows in the history
+
+        Returns
+        -------
+        CTRDMs : array [..., n_stored, n_stored, n_conditions, n_conditions]
+            Cross-Temporal RDMs, from the oldest to the latest time-window.
+        """
+
+        if self.grid is None:
+            raise ValueError("No samples have been added.")
+
+        slots = self.window_indices % self.max_windows
+
+        return self.grid[..., slots[:, np.newaxis], slots, :, :]
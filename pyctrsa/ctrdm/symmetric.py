@@ -0,0 +1,183 @@
+# -*- coding: utf-8
+
+"""
+@File       :   symmetric.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for storing Cross-Temporal RDMs by only the upper half of the time-by-time grid '
+
+import numpy as np
+
+
+' a class for storing symmetric Cross-Temporal RDMs '
+
+class SymmetricCTRDMs(object):
+
+    """
+    Cross-Temporal RDMs stored by the t1 <= t2 half only
+
+    A Pearson-based CTRDM satisfies CTRDMs[t1, t2] == CTRDMs[t2, t1].T, so only the upper half (including the diagonal)
+    of the time-by-time grid is stored and the lower half is rebuilt lazily when indexing.
+
+    Parameters
+    ----------
+    upper : array [..., n_pairs, n_conditions, n_conditions]
+        The CTRDMs for the time pairs t1 <= t2, in the order of np.triu_indices(nts). It can also be a disk-backed
+        array (np.memmap or h5py.Dataset), which is only read when indexing.
+        n_pairs = nts*(nts+1)/2.
+    nts : int
+        The number of time-windows.
+
+    Notes
+    -----
+    Indexing works like indexing the dense array of shape [..., nts, nts, n_conditions, n_conditions] and returns
+    a numpy array. np.asarray(CTRDMs) or CTRDMs.to_dense() gives the whole dense array.
+    """
+
+    def __init__(self, upper, nts):
+
+        # keep disk-backed arrays (np.memmap, h5py.Dataset) as they are
+        if not hasattr(upper, 'shape'):
+            upper = np.asarray(upper)
+
+        if np.shape(upper)[-3] != nts * (nts + 1) // 2:
+            raise ValueError("The upper half of CTRDMs should have nts*(nts+1)/2 time pairs.")
+
+        self.upper = upper
+        self.nts = nts
+
+        rows, cols = np.triu_indices(nts)
+        pairs = np.zeros([nts, nts], dtype=np.intp)
+        pairs[rows, cols] = np.arange(len(rows))
+        pairs[cols, rows] = np.arange(len(rows))
+
+        # the index of (t1, t2) in upper & whether the stored RDM needs to be transposed
+        self.pairs = pairs
+        self.flipped = np.tril(np.ones([nts, nts], dtype=bool), -1)
+
+    @property
+    def shape(self):
+        return self.upper.shape[:-3] + (self.nts, self.nts) + self.upper.shape[-2:]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        return self.upper.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        if dtype is not None:
+            dense = dense.astype(dtype)
+        return dense
+
+    def __getitem__(self, key):
+
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if any(k is None for k in key):
+            raise IndexError("np.newaxis is not supported when indexing SymmetricCTRDMs.")
+
+        # expand the Ellipsis & pad the key to the full number of dimensions
+        n_ellipsis = sum(1 for k in key if k is Ellipsis)
+        if n_ellipsis > 1:
+            raise IndexError("an index can only have a single ellipsis ('...')")
+        if n_ellipsis == 1:
+            i = [k is Ellipsis for k in key].index(True)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i+1:]
+        if len(key) > self.ndim:
+            raise IndexError("too many indices for SymmetricCTRDMs")
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        nb = self.ndim - 4
+        batch_key = key[:nb]
+        t1_key, t2_key = key[nb:nb+2]
+        cons_key = key[nb+2:]
+
+        # the time indices as (broadcastable) integer arrays
+        t1 = np.arange(self.nts)[t1_key]
+        t2 = np.arange(self.nts)[t2_key]
+        if isinstance(t1_key, slice) and isinstance(t2_key, slice):
+            t1 = t1[:, None]
+        elif isinstance(t1_key, slice) and np.ndim(t2) > 0:
+            t1 = np.reshape(t1, np.shape(t1) + (1,) * np.ndim(t2))
+        elif isinstance(t2_key, slice) and np.ndim(t1) > 0:
+            t1 = np.reshape(t1, np.shape(t1) + (1,) * np.ndim(t2))
+
+        pairs = self.pairs[t1, t2]
+        flipped = self.flipped[t1, t2]
+
+        values = self.upper[batch_key]
+        values = values[..., pairs, :, :]
+        values = np.where(flipped[..., None, None], np.swapaxes(values, -1, -2), values)
+
+        return values[(Ellipsis,) + cons_key]
+
+    def to_dense(self):
+
+        """
+        Get the dense CTRDMs
+
+        Returns
+        -------
+        CTRDMs : array [..., nts, nts, n_conditions, n_conditions]
+            The dense Cross-Temporal RDMs.
+        """
+
+        return self[...]
+
+
+' a function for calculating the upper half of CTRDMs from standardized time-windows '
+
+def upper_ctrdms_gemm_cal(zwindows):
+
+    """
+    Calculate the CTRDMs for the time pairs t1 <= t2 only
+
+    Parameters
+    ----------
+    zwindows : array [..., n_conditions, nts, n_features]
+        The standardized time-windows (see pyctrsa.util.windows.zscore_windows). Any leading axes are batch axes.
+
+    Returns
+    -------
+    CTRDMs : SymmetricCTRDMs [..., nts, nts, n_conditions, n_conditions]
+        Cross-Temporal RDMs. Only the upper half of the time-by-time grid is calculated and stored.
+    """
+
+    zwindows = np.asarray(zwindows)
+
+    batch = zwindows.shape[:-3]
+    n_cons, nts, n_features = zwindows.shape[-3:]
+
+    upper = np.zeros(batch + (nts * (nts + 1) // 2, n_cons, n_cons), dtype=zwindows.dtype)
+
+    index = 0
+    for t1 in range(nts):
+
+        m = nts - t1
+
+        # r[..., con1, con2*m+(t2-t1)]
+        a = zwindows[..., t1, :]
+        b = np.reshape(zwindows[..., t1:, :], batch + (n_cons * m, n_features))
+        r = np.matmul(a, np.swapaxes(b, -1, -2))
+        r = np.reshape(r, batch + (n_cons, n_cons, m))
+
+        upper[..., index:index+m, :, :] = np.moveaxis(r, -1, -3)
+        index = index + m
+
+    upper = 1 - np.clip(upper, -1, 1)
+
+    cons = np.arange(n_cons)
+    upper[..., cons, cons] = 0
+
+    return SymmetricCTRDMs(upper, nts)
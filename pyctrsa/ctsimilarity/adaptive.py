@@ -0,0 +1,221 @@
+# -*- coding: utf-8
+
+"""
+@File       :   adaptive.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for calculating coarse-to-fine Cross-Temporal Similarities between neural data and Coding Model RDMs '
+
+import numpy as np
+from pyctrsa.util.windows import nts_cal
+from pyctrsa.ctsimilarity.fitdata import ctsimilarities_cal
+
+
+' a function for calculating Cross-Temporal Similarities coarse-to-fine '
+
+def adaptive_ctsimilarities_cal(data, Model_RDMs, sub_opt=1, chl_opt=1, time_win=10, time_step=5, coarse_step=None,
+                                threshold=None, change=None, method='spearman', block_size=None, dtype=None):
+
+    """
+    Calculate the Cross-Temporal Similarities between the CTRDMs of neural data and Coding Model RDMs coarse-to-fine
+
+    The map is first calculated with the time-windows every coarse_step time-points (see
+    pyctrsa.ctsimilarity.fitdata.ctsimilarities_cal). The coarse cells whose similarity exceeds threshold, or which
+    differ from a neighbouring coarse cell by more than change, are then refined: all time pairs of the fine grid
+    (time-windows every time_step time-points) in these cells are calculated. The other cells keep their coarse value.
+
+    Parameters
+    ----------
+    data : array
+        EEG/MEG data of shape [n_conditions, n_subs, n_channels, n_ts].
+    Model_RDMs : array [n_conditions, n_conditions] or [n_models, n_conditions, n_conditions].
+        The Coding Model RDM(s).
+    sub_opt, chl_opt, time_win, method, block_size, dtype :
+        The same as pyctrsa.ctsimilarity.fitdata.ctsimilarities_cal().
+    time_step : int. Default is 5.
+        The time step size of the fine grid.
+    coarse_step : None or int. Default is None.
+        The time step size of the coarse grid. It should be a multiple of time_step. If coarse_step=None, it is
+        4*time_step.
+    threshold : None or float. Default is None.
+        Refine the coarse cells whose similarity (the r-value, averaged over all subjects, channels and Model RDMs) is
+        larger than threshold.
+    change : None or float. Default is None.
+        Refine the coarse cells whose similarity (averaged in the same way) differs from one of its four neighbouring
+        coarse cells by more than change.
+        At least one of threshold and change should be given.
+
+    Returns
+    -------
+    CTSimilarities : AdaptiveCTSimilarities
+        The multi-resolution map. np.asarray(CTSimilarities) or CTSimilarities.to_dense() resamples it onto the fine
+        grid, of the same shape as pyctrsa.ctsimilarity.fitdata.ctsimilarities_cal(data, Model_RDMs, ...,
+        time_step=time_step).
+    """
+
+    if threshold is None and change is None:
+        raise ValueError("At least one of threshold and change should be given.")
+
+    if coarse_step is None:
+        coarse_step = 4 * time_step
+
+    if coarse_step % time_step != 0:
+        raise ValueError("coarse_step should be a multiple of time_step.")
+
+    factor = coarse_step // time_step
+
+    n_ts = np.shape(data)[-1]
+
+    nts = nts_cal(n_ts, time_win, time_step)
+
+    kwargs = {'sub_opt': sub_opt, 'chl_opt': chl_opt, 'time_win': time_win, 'method': method,
+              'block_size': block_size, 'dtype': dtype}
+
+    # [..., n_coarse, n_coarse(, 2)]
+    coarse = ctsimilarities_cal(data, Model_RDMs, time_step=coarse_step, **kwargs)
+
+    n_tail = int(method != 'similarity' and method != 'distance')
+
+    # the coarse map averaged over all leading axes: [n_coarse, n_coarse]
+    values = coarse[..., 0] if n_tail else coarse
+    values = np.reshape(values, (-1,) + np.shape(values)[-2:]).mean(axis=0)
+
+    refine = np.zeros(np.shape(values), dtype=bool)
+
+    if threshold is not None:
+        refine |= values > threshold
+
+    if change is not None:
+
+        # the largest difference to the neighbouring cells along t1 and along t2
+        d1 = np.abs(np.diff(values, axis=0)) > change
+        d2 = np.abs(np.diff(values, axis=1)) > change
+
+        refine[1:] |= d1
+        refine[:-1] |= d1
+        refine[:, 1:] |= d2
+        refine[:, :-1] |= d2
+
+    # the fine time pairs in the refined coarse cells
+    cells = coarse_index_cal(nts, factor, len(values))
+    grid = refine[cells[:, np.newaxis], cells[np.newaxis, :]]
+    t1, t2 = np.nonzero(grid)
+
+    fine = ctsimilarities_cal(data, Model_RDMs, time_step=time_step, time_pairs=(t1, t2), **kwargs)
+
+    return AdaptiveCTSimilarities(coarse, fine, factor, nts, refine=refine)
+
+
+' a function for getting the coarse cell of each time-window of the fine grid '
+
+def coarse_index_cal(nts, factor, n_coarse):
+
+    """
+    Get the nearest time-window of the coarse grid for each time-window of the fine grid
+
+    Parameters
+    ----------
+    nts : int
+        The number of time-windows of the fine grid.
+    factor : int
+        coarse_step / time_step. The coarse time-window i is the fine time-window i*factor.
+    n_coarse : int
+        The number of time-windows of the coarse grid.
+
+    Returns
+    -------
+    index : array [nts]
+        The coarse time-window of each fine time-window.
+    """
+
+    return np.minimum((np.arange(nts) + factor // 2) // factor, n_coarse - 1)
+
+
+' a class for storing a coarse-to-fine map of Cross-Temporal Similarities '
+
+class AdaptiveCTSimilarities(object):
+
+    """
+    Cross-Temporal Similarities stored on a coarse grid, with the refined regions stored on the fine grid
+
+    Parameters
+    ----------
+    coarse : array [..., n_coarse, n_coarse, ...]
+        The similarities on the coarse grid.
+    fine : TimePairArray [..., nts, nts, ...]
+        The similarities of the refined time pairs of the fine grid.
+    factor : int
+        coarse_step / time_step. The coarse time-window i is the fine time-window i*factor.
+    nts : int
+        The number of time-windows of the fine grid.
+    refine : None or array [n_coarse, n_coarse]. Default is None.
+        The coarse cells which are refined.
+
+    Notes
+    -----
+    np.asarray() or to_dense() gives the map on the fine grid [..., nts, nts, ...]: each time pair takes its fine value
+    if it is refined, otherwise the value of the nearest coarse time pair.
+    """
+
+    def __init__(self, coarse, fine, factor, nts, refine=None):
+
+        self.coarse = coarse
+        self.fine = fine
+        self.factor = factor
+        self.nts = nts
+        self.n_tail = fine.n_tail
+        self.refine = refine
+
+    @property
+    def shape(self):
+        return self.fine.shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        return self.fine.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        if dtype is not None:
+            dense = dense.astype(dtype)
+        return dense
+
+    @property
+    def fraction(self):
+
+        """
+        The fraction of the time pairs of the fine grid which are refined
+        """
+
+        return len(self.fine.t1) / (self.nts * self.nts)
+
+    def to_dense(self):
+
+        """
+        Resample the map onto the fine grid
+
+        Returns
+        -------
+        dense : array [..., nts, nts, ...]
+            The refined time pairs take their fine values, the others the value of the nearest coarse time pair.
+        """
+
+        n_coarse = np.shape(self.coarse)[len(np.shape(self.coarse)) - self.n_tail - 1]
+
+        cells = coarse_index_cal(self.nts, self.factor, n_coarse)
+        tail = (slice(None),) * self.n_tail
+
+        dense = np.array(self.coarse[(Ellipsis, cells[:, np.newaxis], cells[np.newaxis, :]) + tail])
+        dense[(Ellipsis, self.fine.t1, self.fine.t2) + tail] = self.fine.values
+
+        return dense
@@ -10,13 +10,20 @@
 ' a module for calculating Cross-Temporal Similarities between CTRDMs and a Coding Model RDM '
 
 import numpy as np
-from pyctrsa.util.progressbar import show_progressbar
 from pyctrsa.similarity import spearmanrp, pearsonrp, kendallrp, cosinesimilarity, euclideandistance
+from pyctrsa.ctrdm.symmetric import SymmetricCTRDMs
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.util.pairs import diagonal_pairs_cal, pair_values_cal, TimePairArray
 
 
-' a function for calculating Cross-Temporal Similarities between CTRDMs and a Coding Model RDM '
+# the number of CTRDMs vectorized at a time
+CHUNK_SIZE = 2 ** 14
 
-def ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman'):
+
+' a function for calculating Cross-Temporal Similarities between CTRDMs and Coding Model RDMs '
+
+def ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman', symmetric=False, dtype=None, time_pairs=None,
+                       diagonal_only=False):
 
     """
     Calculate the Cross-Temporal Similarities between CTRDMs and a Coding Model RDM
@@ -29,13 +36,32 @@ def ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman'):
         or [n_channels, n_ts, n_ts, n_conditions, n_conditionss] or [n_subs, n_channels, n_ts, n_ts, n_conditions,
         n_conditions]. n_ts, n_conditions, n_subs, n_channels represent the number of time-points, the number of
         conditions, the number of subjects and the number of channels, respectively.
-    Model_RDM : array [n_conditions, n_conditions].
-        The Coding Model RDM.
+    Model_RDM : array [n_conditions, n_conditions] or [n_models, n_conditions, n_conditions].
+        The Coding Model RDM, or a stack of Coding Model RDMs. All Model RDMs of a stack are fitted in one pass over the
+        CTRDMs.
     method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
         The method to calculate the similarities.
         If method='spearman', calculate the Spearman Correlations. If method='pearson', calculate the Pearson
         Correlations. If methd='kendall', calculate the Kendall tau Correlations. If method='similarity', calculate the
         Cosine Similarities. If method='distance', calculate the Euclidean Distances.
+    symmetric : bool True or False. Default is False.
+        Only fit the CTRDMs for t1 <= t2 or not.
+        If symmetric=True, the CTRDMs are assumed to satisfy CTRDMs[t2, t1] = CTRDMs[t1, t2].T and the similarities
+        for t1 > t2 are derived from the CTRDMs for t1 < t2. It is always used if CTRDMs is a
+        pyctrsa.ctrdm.symmetric.SymmetricCTRDMs.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of CTSimilarities. The similarities are always calculated in float64. If dtype=None, float32 is
+        used for float32 CTRDMs or when the CTRDMs have at least 2**24 values, otherwise float64 (see
+        pyctrsa.util.precision.dtype_cal).
+    time_pairs : None or tuple. Default is None.
+        Only fit the CTRDMs for a selection of time pairs: ('band', k), ('rectangle', rows, cols) or (t1, t2) (see
+        pyctrsa.util.pairs.time_pairs_cal). Only the CTRDMs of the selected time pairs are read and a
+        pyctrsa.util.pairs.TimePairArray is returned. If CTRDMs is a TimePairArray, its time pairs are used unless
+        time_pairs selects some of them.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
 
     Returns
     -------
@@ -59,6 +85,9 @@ def ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman'):
             will be [n_channels, n_ts, n_ts].
             If the shape of CTRDMs is [n_subs, n_channels, n_ts, n_ts, n_conditions, n_conditions], the shape of
             CTSimilarities will be [n_subs, n_channels, n_ts, n_ts].
+        If Model_RDM is a stack of n_models Model RDMs, there is an n_models axis before the n_ts axes, e.g. the shape
+        of CTSimilarities will be [n_subs, n_models, n_ts, n_ts, 2] for CTRDMs of shape [n_subs, n_ts, n_ts,
+        n_conditions, n_conditions].
 
     Notes
     -----
@@ -66,108 +95,259 @@ def ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman'):
     (zitonglu1996.github.io/pyctrsa/)
     """
 
-    n = len(np.shape(CTRDMs))
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
+
+    if time_pairs is not None or isinstance(CTRDMs, TimePairArray):
+
+        return pairs_ctsimilarities_cal(CTRDMs, Model_RDM, method=method, dtype=dtype, time_pairs=time_pairs)
+
+    dtype = dtype_cal(dtype, size=int(np.prod(np.shape(CTRDMs))), like=getattr(CTRDMs, 'dtype', None))
+
+    if symmetric or isinstance(CTRDMs, SymmetricCTRDMs):
+
+        return symmetric_ctsimilarities_cal(CTRDMs, Model_RDM, method=method, dtype=dtype)
+
+    CTSimilarities = stack_ctsimilarities_cal(CTRDMs, Model_RDM, method=method).astype(dtype, copy=False)
+
+    # [..., n_ts, n_ts, n_models, 2] -> [..., n_models, n_ts, n_ts, 2]
+    if np.ndim(Model_RDM) == 3:
+        CTSimilarities = np.moveaxis(CTSimilarities, -2, -4)
+
+    if method == 'similarity' or method == 'distance':
+
+        return CTSimilarities[..., 0]
+
+    return CTSimilarities
+
+
+' a function for calculating the similarity between a CTRDM and a Coding Model RDM '
+
+def ctsimilarity_cal(CTRDM, Model_RDM, method='spearman'):
+
+    """
+    Calculate the Similarity between a CTRDM and a Coding Model RDM
+
+    Parameters
+    ----------
+    CTRDM : array [n_conditions, n_conditions]
+        The Cross-Temporal RDM.
+    Model_RDM : array [n_conditions, n_conditions].
+        The Coding Model RDM.
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarity.
+
+    Returns
+    -------
+    rp : array [2]
+        If method='spearman' or 'pearson' or 'kendall', a r-value and a p-value.
+        If method='similarity' or 'distance', the similarity (or distance) and 0.
+    """
+
+    rp = np.zeros([2], dtype=np.float64)
+
+    if method == 'spearman':
+        rp[:] = spearmanrp.spearmanrp_cal(CTRDM, Model_RDM)
+    if method == 'pearson':
+        rp[:] = pearsonrp.pearsonrp_cal(CTRDM, Model_RDM)
+    if method == 'kendall':
+        rp[:] = kendallrp.kendallrp_cal(CTRDM, Model_RDM)
+    if method == 'similarity':
+        rp[0] = cosinesimilarity.cosinesimilarity_cal(CTRDM, Model_RDM)
+    if method == 'distance':
+        rp[0] = euclideandistance.euclideandistance_cal(CTRDM, Model_RDM)
+
+    return rp
+
+
+' a function for calculating the similarities between a stack of CTRDMs and Coding Model RDMs '
+
+def stack_ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman'):
+
+    """
+    Calculate the Similarities between each CTRDM in a stack and a Coding Model RDM (or each of a stack of Model RDMs)
+
+    The stack is passed to the stack-aware functions of pyctrsa.similarity a chunk of CTRDMs at a time, so the
+    vectorized off-diagonal values never take much more memory than the CTRDMs themselves. With a stack of Model RDMs,
+    each chunk is vectorized (and ranked) once and correlated with all Model RDMs by one matrix product.
+
+    Parameters
+    ----------
+    CTRDMs : array [..., n_conditions, n_conditions]
+        A stack of CTRDMs of any leading shape.
+    Model_RDM : array [n_conditions, n_conditions] or [n_models, n_conditions, n_conditions].
+        The Coding Model RDM(s).
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarities.
+
+    Returns
+    -------
+    rp : array [..., 2] or [..., n_models, 2]
+        If method='spearman' or 'pearson' or 'kendall', the r-values and the p-values.
+        If method='similarity' or 'distance', the similarities (or distances) and 0.
+        There is an n_models axis if Model_RDM is a stack of Model RDMs.
+    """
+
+    CTRDMs = np.asarray(CTRDMs)
+
+    batch = np.shape(CTRDMs)[:-2]
+    n_cons = np.shape(CTRDMs)[-1]
+
+    Model_RDMs = np.asarray(Model_RDM)
+
+    single = Model_RDMs.ndim == 2
+
+    if single:
+        Model_RDMs = Model_RDMs[np.newaxis]
+
+    n_models = len(Model_RDMs)
+
+    flat = np.reshape(CTRDMs, (-1, n_cons, n_cons))
 
-    if n == 4:
+    rp = np.zeros([len(flat), n_models, 2], dtype=np.float64)
 
-        n_ts, n_cons = np.shape(CTRDMs)[1:3]
+    for start in range(0, len(flat), CHUNK_SIZE):
 
-        CTSimilarities = np.zeros([n_ts, n_ts, 2], dtype=np.float)
+        # [n_chunk, 1, n_conditions, n_conditions] against [n_models, n_conditions, n_conditions]
+        chunk = flat[start:start+CHUNK_SIZE, np.newaxis]
+        end = start + len(chunk)
 
-        total = n_ts * n_ts
+        if method == 'spearman':
+            rp[start:end] = spearmanrp.spearmanrp_cal(chunk, Model_RDMs)
+        if method == 'pearson':
+            rp[start:end] = pearsonrp.pearsonrp_cal(chunk, Model_RDMs)
+        if method == 'similarity':
+            rp[start:end, :, 0] = cosinesimilarity.cosinesimilarity_cal(chunk, Model_RDMs)
 
-        for t1 in range(n_ts):
-            for t2 in range(n_ts):
+        for m in range(n_models):
+            if method == 'kendall':
+                rp[start:end, m] = kendallrp.kendallrp_cal(chunk[:, 0], Model_RDMs[m])
+            if method == 'distance':
+                rp[start:end, m, 0] = euclideandistance.euclideandistance_cal(chunk[:, 0], Model_RDMs[m])
 
-                percent = (t1 * n_ts + t2) / total * 100
-                show_progressbar("Calculating", percent)
+    if single:
+        return np.reshape(rp, batch + (2,))
 
-                if method == 'spearman':
-                    CTSimilarities[t1, t2] = spearmanrp.spearmanrp_cal(CTRDMs[t1, t2], Model_RDM)
-                if method == 'pearson':
-                    CTSimilarities[t1, t2] = pearsonrp.pearsonrp_cal(CTRDMs[t1, t2], Model_RDM)
-                if method == 'kendall':
-                    CTSimilarities[t1, t2] = kendallrp.kendallrp_cal(CTRDMs[t1, t2], Model_RDM)
-                if method == 'similarity':
-                    CTSimilarities[t1, t2, 0] = cosinesimilarity.cosinesimilarity_cal(CTRDMs[t1, t2], Model_RDM)
-                if method == 'distance':
-                    CTSimilarities[t1, t2, 0] = euclideandistance.euclideandistance_cal(CTRDMs[t1, t2], Model_RDM)
+    return np.reshape(rp, batch + (n_models, 2))
 
-        if method == 'spearman' or method == 'pearson' or method == 'kendall':
 
-            return CTSimilarities
+' a function for calculating Cross-Temporal Similarities only based on the CTRDMs for t1 <= t2 '
 
-        if method == 'similarity' or method == 'distance':
+def symmetric_ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman', dtype=np.float64):
 
-            return CTSimilarities[:, :, 0]
+    """
+    Calculate the Cross-Temporal Similarities between symmetric CTRDMs and a Coding Model RDM
 
-    if n == 5:
+    Only the CTRDMs for t1 <= t2 are read. As CTRDMs[t2, t1] = CTRDMs[t1, t2].T, the similarity for (t2, t1) equals the
+    similarity between CTRDMs[t1, t2] and Model_RDM.T, so it is copied from (t1, t2) if the Model RDM is symmetric.
 
-        n1 = np.shape(CTRDMs)[0]
-        n_ts, n_cons = np.shape(CTRDMs)[2:4]
+    Parameters
+    ----------
+    CTRDMs : array or SymmetricCTRDMs
+        The Cross-Temporal Representational Dissimilarity Matrices.
+        The shape should be [..., n_ts, n_ts, n_conditions, n_conditions].
+    Model_RDM : array [n_conditions, n_conditions] or [n_models, n_conditions, n_conditions].
+        The Coding Model RDM(s).
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarities.
+    dtype : numpy floating dtype. Default is np.float64.
+        The precision of CTSimilarities.
+
+    Returns
+    -------
+    CTSimilarities : array
+        Cross-temporal similarities, the same as pyctrsa.ctsimilarity.fitctrdm.ctsimilarities_cal().
+    """
 
-        CTSimilarities = np.zeros([n1, n_ts, n_ts, 2], dtype=np.float)
+    if isinstance(CTRDMs, SymmetricCTRDMs):
+        n_ts = CTRDMs.nts
+        upper = CTRDMs.upper
+    else:
+        n_ts = np.shape(CTRDMs)[-3]
+        rows, cols = np.triu_indices(n_ts)
+        upper = np.asarray(CTRDMs)[..., rows, cols, :, :]
 
-        total = n1 * n_ts * n_ts
+    rows, cols = np.triu_indices(n_ts)
 
-        for i in range(n1):
-            for t1 in range(n_ts):
-                for t2 in range(n_ts):
+    Model_RDMs = np.asarray(Model_RDM)
 
-                    percent = (i * n_ts * n_ts + t1 * n_ts + t2) / total * 100
-                    show_progressbar("Calculating", percent)
+    single = Model_RDMs.ndim == 2
 
-                    if method == 'spearman':
-                        CTSimilarities[i, t1, t2] = spearmanrp.spearmanrp_cal(CTRDMs[i, t1, t2], Model_RDM)
-                        #print(CTSimilarities[i, t1, t2])
-                    if method == 'pearson':
-                        CTSimilarities[i, t1, t2] = pearsonrp.pearsonrp_cal(CTRDMs[i, t1, t2], Model_RDM)
-                    if method == 'kendall':
-                        CTSimilarities[i, t1, t2] = kendallrp.kendallrp_cal(CTRDMs[i, t1, t2], Model_RDM)
-                    if method == 'similarity':
-                        CTSimilarities[i, t1, t2, 0] = cosinesimilarity.cosinesimilarity_cal(CTRDMs[i, t1, t2], Model_RDM)
-                    if method == 'distance':
-                        CTSimilarities[i, t1, t2, 0] = euclideandistance.euclideandistance_cal(CTRDMs[i, t1, t2], Model_RDM)
+    if single:
+        Model_RDMs = Model_RDMs[np.newaxis]
 
-        if method == 'spearman' or method == 'pearson' or method == 'kendall':
-            return CTSimilarities
+    batch = np.shape(upper)[:-3]
 
-        if method == 'similarity' or method == 'distance':
-            return CTSimilarities[:, :, :, 0]
+    CTSimilarities = np.zeros(batch + (len(Model_RDMs), n_ts, n_ts, 2), dtype=dtype)
 
-    if n == 6:
+    # [..., n_pairs, n_models, 2] -> [..., n_models, n_pairs, 2]
+    CTSimilarities[..., rows, cols, :] = np.moveaxis(stack_ctsimilarities_cal(upper, Model_RDMs, method=method), -2, -3)
 
-        n1, n2 = np.shape(CTRDMs)[:2]
-        n_ts, n_cons = np.shape(CTRDMs)[3:5]
+    # (t2, t1): CTRDMs[t1, t2].T against Model_RDM, i.e. CTRDMs[t1, t2] against Model_RDM.T
+    lower = rows != cols
+
+    CTSimilarities[..., cols[lower], rows[lower], :] = CTSimilarities[..., rows[lower], cols[lower], :]
+
+    for m in range(len(Model_RDMs)):
+        if not np.array_equal(Model_RDMs[m], Model_RDMs[m].T):
+            CTSimilarities[..., m, cols[lower], rows[lower], :] = stack_ctsimilarities_cal(upper[..., lower, :, :],
+                                                                                          Model_RDMs[m].T,
+                                                                                          method=method)
+
+    if single:
+        CTSimilarities = CTSimilarities[..., 0, :, :, :]
+
+    if method == 'similarity' or method == 'distance':
+
+        return CTSimilarities[..., 0]
+
+    return CTSimilarities
+
+
+' a function for calculating Cross-Temporal Similarities only for selected time pairs '
+
+def pairs_ctsimilarities_cal(CTRDMs, Model_RDM, method='spearman', dtype=None, time_pairs=None):
+
+    """
+    Calculate the Cross-Temporal Similarities between the CTRDMs of selected time pairs and a Coding Model RDM
+
+    Parameters
+    ----------
+    CTRDMs : array or SymmetricCTRDMs or TimePairArray
+        The Cross-Temporal Representational Dissimilarity Matrices.
+        The shape should be [..., n_ts, n_ts, n_conditions, n_conditions].
+    Model_RDM : array [n_conditions, n_conditions] or [n_models, n_conditions, n_conditions].
+        The Coding Model RDM(s).
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarities.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of CTSimilarities.
+    time_pairs : None or tuple. Default is None.
+        The selection of time pairs (see pyctrsa.util.pairs.time_pairs_cal). It can only be None if CTRDMs is a
+        TimePairArray.
+
+    Returns
+    -------
+    CTSimilarities : TimePairArray
+        Cross-temporal similarities of the selected time pairs, the same as the values of
+        pyctrsa.ctsimilarity.fitctrdm.ctsimilarities_cal() for these time pairs.
+    """
 
-        CTSimilarities = np.zeros([n1, n2, n_ts, n_ts, 2], dtype=np.float)
+    # [..., n_pairs, n_conditions, n_conditions], only the CTRDMs of the selected time pairs are read
+    values, t1, t2, n_ts = pair_values_cal(CTRDMs, time_pairs)
 
-        total = n1 * n2 * n_ts * n_ts
+    dtype = dtype_cal(dtype, size=int(np.prod(np.shape(values))), like=getattr(values, 'dtype', None))
 
-        for i in range(n1):
-            for j in range(n2):
-                for t1 in range(n_ts):
-                    for t2 in range(n_ts):
+    CTSimilarities = stack_ctsimilarities_cal(values, Model_RDM, method=method).astype(dtype, copy=False)
 
-                        percent = (i * n2 * n_ts * n_ts + j * n_ts * n_ts + t1 * n_ts + t2) / total * 100
-                        show_progressbar("Calculating", percent)
+    # [..., n_pairs, n_models, 2] -> [..., n_models, n_pairs, 2]
+    if np.ndim(Model_RDM) == 3:
+        CTSimilarities = np.moveaxis(CTSimilarities, -2, -3)
 
-                        if method == 'spearman':
-                            CTSimilarities[i, j, t1, t2] = spearmanrp.spearmanrp_cal(CTRDMs[i, j, t1, t2], Model_RDM)
-                        if method == 'pearson':
-                            CTSimilarities[i, j, t1, t2] = pearsonrp.pearsonrp_cal(CTRDMs[i, j, t1, t2], Model_RDM)
-                        if method == 'kendall':
-                            CTSimilarities[i, j, t1, t2] = kendallrp.kendallrp_cal(CTRDMs[i, j, t1, t2], Model_RDM)
-                        if method == 'similarity':
-                            CTSimilarities[i, j, t1, t2, 0] = cosinesimilarity.cosinesimilarity_cal(CTRDMs[i, j, t1, t2], Model_RDM)
-                        if method == 'distance':
-                            CTSimilarities[i, j, t1, t2, 0] = euclideandistance.euclideandistance_cal(CTRDMs[i, j, t1, t2], Model_RDM)
+    if method == 'similarity' or method == 'distance':
 
-        if method == 'spearman' or method == 'pearson' or method == 'kendall':
-            return CTSimilarities
+        return TimePairArray(CTSimilarities[..., 0], t1, t2, n_ts)
 
-        if method == 'similarity' or method == 'distance':
-            return CTSimilarities[:, :, :, :, 0]
+    return TimePairArray(CTSimilarities, t1, t2, n_ts, n_tail=1)
 
 # test codes
 #a = np.random.rand(100, 100, 6, 6)
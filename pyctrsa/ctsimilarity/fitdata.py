@@ -0,0 +1,176 @@
+# -*- coding: utf-8
+
+"""
+@File       :   fitdata.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for calculating Cross-Temporal Similarities between the CTRDMs of neural data and Coding Model RDMs '
+
+import numpy as np
+from pyctrsa.util.windows import nts_cal
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.util.running import RunningStats
+from pyctrsa.util.pairs import diagonal_pairs_cal, time_pairs_cal, TimePairArray
+from pyctrsa.ctrdm.gemm import ctrdms_gemm_cal, pairs_ctrdms_gemm_cal
+from pyctrsa.ctrdm.multi_cal import zwindows_cal
+from pyctrsa.ctsimilarity.fitctrdm import stack_ctsimilarities_cal
+
+
+# the number of CTRDM values calculated in one time block by default
+BLOCK_SIZE = 2 ** 22
+
+
+' a function for calculating Cross-Temporal Similarities between the CTRDMs of neural data and Coding Model RDMs '
+
+def ctsimilarities_cal(data, Model_RDMs, sub_opt=1, chl_opt=1, time_win=10, time_step=5, method='spearman',
+                       block_size=None, dtype=None, time_pairs=None, diagonal_only=False):
+
+    """
+    Calculate the Cross-Temporal Similarities between the CTRDMs of neural data and Coding Model RDMs
+
+    It gives the same results as pyctrsa.ctrdm.multi_cal.ctrdms_cal() followed by
+    pyctrsa.ctsimilarity.fitctrdm.ctsimilarities_cal(), but the CTRDMs are calculated and fitted one time block (a few
+    rows t1 of the time-by-time grid) at a time, so the whole CTRDM tensor never exists in memory.
+
+    Parameters
+    ----------
+    data : array
+        EEG/MEG data from a time-window.
+        The shape of data should be [n_conditions, n_subs, n_channels, n_ts]. n_conditions, n_subs, n_channels, n_ts
+        represent the number of conditions, the number of subjects, the number of channels and the number of time-points
+        respectively.
+    Model_RDMs : array [n_conditions, n_conditions] or [n_models, n_conditions, n_conditions].
+        The Coding Model RDM(s).
+    sub_opt : int 0 or 1. Default is 1.
+        Caculate the CTSimilarities for each subject or not.
+        If sub_opt=1, return the CTSimilarities for each subjects.
+        If sub_opt=0, return the CTSimilarities of the avg CTRDMs among all subjects.
+    chl_opt : int 0 or 1. Default is 1.
+        Caculate the CTSimilarities for each channel or not.
+        If chl_opt=1, calculate the CTSimilarities for each channel.
+        If chl_opt=0, calculate the CTSimilarities after averaging the channels.
+    time_win : int. Default is 10.
+        Set a time-window for calculating the CTRDM for different time-points.
+        If time_win=10, that means each calculation process based on 10 time-points.
+    time_step : int. Default is 5.
+        The time step size for each time of calculating.
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarities.
+        If method='spearman', calculate the Spearman Correlations. If method='pearson', calculate the Pearson
+        Correlations. If methd='kendall', calculate the Kendall tau Correlations. If method='similarity', calculate the
+        Cosine Similarities. If method='distance', calculate the Euclidean Distances.
+    block_size : None or int. Default is None.
+        The number of time-windows t1 in one time block.
+        If block_size=None, it is chosen so that the CTRDMs of one block have about 2**22 values.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of the CTRDMs and of CTSimilarities. The same as pyctrsa.ctrdm.multi_cal.ctrdms_cal().
+    time_pairs : None or tuple. Default is None.
+        Only calculate and fit the CTRDMs for a selection of time pairs: ('band', k), ('rectangle', rows, cols) or
+        (t1, t2) (see pyctrsa.util.pairs.time_pairs_cal). If time_pairs is given, the time-by-time axes [nts, nts] are
+        replaced by one axis of the selected time pairs and a pyctrsa.util.pairs.TimePairArray is returned. A time
+        block is then the selected time pairs of block_size time-windows t1.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
+
+    Returns
+    -------
+    CTSimilarities : array
+        Cross-temporal similarities.
+        If method='spearman' or 'pearson' or 'kendall', the shape of CTSimilarities will be [n_subs, n_channels,
+        n_models, nts, nts, 2], including a r-value and a p-value, with nts = int((n_ts-time_win)/time_step)+1.
+        If method='similarity' or 'distance', the shape of CTSimilarities will be [n_subs, n_channels, n_models, nts,
+        nts].
+        There is no n_subs axis if sub_opt=0, no n_channels axis if chl_opt=0 and no n_models axis if Model_RDMs is a
+        single Model RDM of shape [n_conditions, n_conditions].
+    """
+
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
+
+    n_cons, n_subs, n_chls, n_ts = np.shape(data)
+
+    nts = nts_cal(n_ts, time_win, time_step)
+
+    Model_RDMs = np.asarray(Model_RDMs)
+
+    single = Model_RDMs.ndim == 2
+
+    if single:
+        Model_RDMs = Model_RDMs[np.newaxis]
+
+    n_models = len(Model_RDMs)
+
+    # chl_opt=1: the CTRDMs of a block are [n_chls, n_rows, nts, n_cons, n_cons]
+    lead = [n_chls] * chl_opt
+
+    # the time-by-time grid [nts, nts], or the axis of the selected time pairs [n_pairs]
+    if time_pairs is not None:
+        t1, t2 = time_pairs_cal(time_pairs, nts)
+        grid = [len(t1)]
+    else:
+        grid = [nts, nts]
+
+    dtype = dtype_cal(dtype, size=n_subs*n_chls**chl_opt*int(np.prod(grid))*n_cons*n_cons,
+                      like=np.asarray(data).dtype)
+
+    if block_size is None:
+        block_size = max(1, BLOCK_SIZE // (n_chls**chl_opt * nts * n_cons * n_cons))
+
+    if sub_opt == 0:
+        CTSimilarities = np.zeros(lead + [n_models] + grid + [2], dtype=dtype)
+    else:
+        CTSimilarities = np.zeros([n_subs] + lead + [n_models] + grid + [2], dtype=dtype)
+
+    # the CTRDMs of a time block and where their similarities go
+    def block_cal(zwindows, rows):
+        if time_pairs is None:
+            return ctrdms_gemm_cal(zwindows, rows=rows)
+        return pairs_ctrdms_gemm_cal(zwindows, t1[rows], t2[rows])
+
+    # standardize the time-windows once for each subject
+    zwindows = [zwindows_cal(data, (sub,), chl_opt=chl_opt, time_win=time_win, time_step=time_step, dtype=dtype)
+                for sub in range(n_subs)]
+
+    for t_start in range(0, nts, block_size):
+
+        rows = slice(t_start, min(t_start + block_size, nts))
+
+        # the selected time pairs of the time-windows t1 in rows
+        if time_pairs is not None:
+            rows = slice(np.searchsorted(t1, rows.start), np.searchsorted(t1, rows.stop))
+
+        if sub_opt == 0:
+
+            stats = RunningStats()
+
+            for sub in range(n_subs):
+                stats.add(block_cal(zwindows[sub], rows))
+
+            blocks = [((), stats.mean.astype(dtype, copy=False))]
+
+        else:
+
+            blocks = (((sub,), block_cal(zwindows[sub], rows)) for sub in range(n_subs))
+
+        # all Model RDMs are fitted to the vectorized (and ranked) CTRDMs of a block at once
+        for index, ctrdms in blocks:
+            CTSimilarities[index + (Ellipsis, slice(None), rows) + (slice(None),) * len(grid)] = \
+                np.moveaxis(stack_ctsimilarities_cal(ctrdms, Model_RDMs, method=method), -2, -2 - len(grid))
+
+    n_tail = 1
+
+    if single:
+        CTSimilarities = CTSimilarities[(Ellipsis, 0) + (slice(None),) * (len(grid) + 1)]
+
+    if method == 'similarity' or method == 'distance':
+        CTSimilarities = CTSimilarities[..., 0]
+        n_tail = 0
+
+    if time_pairs is not None:
+        return TimePairArray(CTSimilarities, t1, t2, nts, n_tail=n_tail)
+
+    return CTSimilarities
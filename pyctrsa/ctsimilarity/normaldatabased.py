@@ -10,12 +10,25 @@
 ' a module for calculating Cross-Temporal Similarities between neural data under two conditions '
 
 import numpy as np
-from scipy.stats import spearmanr, pearsonr, kendalltau
+from scipy.spatial.distance import cdist
+from pyctrsa.similarity.stack import rank_cal, standardize, corr_p_cal
+from pyctrsa.similarity.kendallrp import kendalltau_cal
+from pyctrsa.util.windows import nts_cal, window_view
+from pyctrsa.util.prefix import prefix_similarities_cal
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.util.parallel import parallel_imap
+from pyctrsa.util.running import RunningStats
+from pyctrsa.util.pairs import diagonal_pairs_cal, time_pairs_cal, TimePairArray
+
+
+# the number of window values gathered in one row block by method='kendall'
+BLOCK_SIZE = 2 ** 22
 
 
 ' a function for calculating Cross-Temporal Similarities between neural data under two conditions '
 
-def ctsimilarities_cal(data1, data2, sub_opt=1, chl_opt=1, time_win=10, time_step=5, method='spearman'):
+def ctsimilarities_cal(data1, data2, sub_opt=1, chl_opt=1, time_win=10, time_step=5, method='spearman', n_jobs=1,
+                       dtype=None, return_var=False, engine='gemm', time_pairs=None, diagonal_only=False):
 
     """
     Calculate the Cross-Temporal Similarities between neural data under two conditions
@@ -48,6 +61,34 @@ def ctsimilarities_cal(data1, data2, sub_opt=1, chl_opt=1, time_win=10, time_ste
         If method='spearman', calculate the Spearman Correlations. If method='pearson', calculate the Pearson
         Correlations. If methd='kendall', calculate the Kendall tau Correlations. If method='similarity', calculate the
         Cosine Similarities. If method='distance', calculate the Euclidean Distances.
+    n_jobs : int or None. Default is 1.
+        The number of worker processes.
+        If n_jobs=1, calculate all subjects (all channels of a subject at once) in the current process. Otherwise, the
+        work is sharded by subject (and channel if chl_opt=1) across a process pool reading the data from shared
+        memory. If n_jobs=None or n_jobs<0, use all CPUs. The results are identical whatever the number of workers is.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of CTSimilarities. The similarities and the average among subjects are always calculated in
+        float64. If dtype=None, float32 is used for float32 data or when CTSimilarities of all subjects have at least
+        2**24 values, otherwise float64 (see pyctrsa.util.precision.dtype_cal).
+    return_var : bool True or False. Default is False.
+        Only when sub_opt=0, it works. Otherwise, return_var=True raises a ValueError.
+        If return_var=True, also return the variance (ddof=1) of CTSimilarities among subjects, of the same shape as
+        CTSimilarities.
+    engine : string 'gemm' or 'prefix'. Default is 'gemm'.
+        How to calculate the similarities of the time-windows.
+        If engine='gemm', compare the time-windows by matrix products. If engine='prefix', derive the similarities from
+        prefix sums of the data (see pyctrsa.util.prefix.prefix_similarities_cal), which is faster when time_win is
+        large compared with time_step. The results agree to about 1e-10. Only when method='pearson' or 'similarity' or
+        'distance', it works.
+    time_pairs : None or tuple. Default is None.
+        Only calculate the similarities for a selection of time pairs: ('band', k), ('rectangle', rows, cols) or
+        (t1, t2) (see pyctrsa.util.pairs.time_pairs_cal). If time_pairs is given, the time-by-time axes [nts, nts] are
+        replaced by one axis of the selected time pairs and a pyctrsa.util.pairs.TimePairArray is returned. The
+        time-windows of the selected time pairs are compared directly and engine is ignored.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
 
     Returns
     -------
@@ -71,118 +112,315 @@ def ctsimilarities_cal(data1, data2, sub_opt=1, chl_opt=1, time_win=10, time_ste
             +1, int((n_ts-time_win)/time_step)+1]
             If sub_opt=0 and chl_opt=0, the shape of CTSimilarities will be [int((n_ts-time_win)/time_step)+1,
             int((n_ts-time_win)/time_step)+1]
+        If sub_opt=0, the results of each subject are added to a running mean as soon as they are calculated, so only
+        the results of one subject are kept in memory.
     """
 
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
+
+    if return_var and sub_opt != 0:
+        raise ValueError("return_var=True only works with sub_opt=0.")
+
     n_subs, n_chls, n_ts = np.shape(data1)
 
-    nts = int((n_ts - time_win) / time_step) + 1
+    nts = nts_cal(n_ts, time_win, time_step)
+
+    if time_pairs is not None:
+        t1, t2 = time_pairs_cal(time_pairs, nts)
+        time_pairs = (t1, t2)
+        n_pairs = len(t1)
+    else:
+        n_pairs = nts*nts
+
+    dtype = dtype_cal(dtype, size=n_subs*n_chls**chl_opt*n_pairs*2, like=np.asarray(data1).dtype)
+
+    if chl_opt == 0 or n_jobs == 1:
+        units = [(sub,) for sub in range(n_subs)]
+    else:
+        units = [(sub, chl) for sub in range(n_subs) for chl in range(n_chls)]
+
+    kwargs = {'chl_opt': chl_opt, 'time_win': time_win, 'time_step': time_step, 'method': method, 'engine': engine,
+              'time_pairs': time_pairs}
+
+    if n_jobs == 1:
+        results = ((unit, ctsimilarities_unit_cal([data1, data2], unit, **kwargs)) for unit in units)
+    else:
+        results = parallel_imap(ctsimilarities_unit_cal, [data1, data2], units, n_jobs=n_jobs, **kwargs)
+
+    # sub_opt=0: add each subject to a running mean as soon as all its channels are calculated
+    if sub_opt == 0:
+
+        stats = RunningStats(var=return_var)
+        block = None
+
+        for unit, result in results:
+
+            if len(unit) == 1:
+                stats.add(result)
+                continue
+
+            if block is None:
+                block = np.zeros([n_chls] + list(np.shape(result)), dtype=np.float64)
+
+            block[unit[1]] = result
+
+            if unit[1] == n_chls - 1:
+                stats.add(block)
+
+        CTSimilarities = stats.mean.astype(dtype, copy=False)
+
+    else:
+
+        CTSimilarities = None
+
+        for unit, result in results:
+
+            if CTSimilarities is None:
+                CTSimilarities = np.zeros([n_subs, n_chls][:len(unit)] + list(np.shape(result)), dtype=dtype)
+
+            CTSimilarities[unit] = result
+
+    n_tail = 1
+
+    if method == 'similarity' or method == 'distance':
+        CTSimilarities = CTSimilarities[..., 0]
+        n_tail = 0
+
+    if time_pairs is not None:
+        CTSimilarities = TimePairArray(CTSimilarities, t1, t2, nts, n_tail=n_tail)
+
+    if sub_opt == 0 and return_var:
+
+        var = stats.var().astype(dtype, copy=False)
+
+        if n_tail == 0:
+            var = var[..., 0]
+
+        if time_pairs is not None:
+            var = TimePairArray(var, t1, t2, nts, n_tail=n_tail)
+
+        return CTSimilarities, var
+
+    return CTSimilarities
+
+
+' a function for calculating Cross-Temporal Similarities for one subject (and one channel) '
+
+def ctsimilarities_unit_cal(arrays, unit, chl_opt=1, time_win=10, time_step=5, method='spearman', engine='gemm',
+                            time_pairs=None):
+
+    """
+    Calculate the Cross-Temporal Similarities of one work unit, used by ctsimilarities_cal()
+
+    Parameters
+    ----------
+    arrays : list [data1, data2]
+        data1 & data2 are EEG/MEG data under condition1 & condition2 of shape [n_subs, n_channels, n_ts].
+    unit : tuple (sub,) or (sub, chl)
+        The subject (and the channel) to calculate. If chl_opt=1 and unit=(sub,), all channels of the subject are
+        calculated.
+    chl_opt, time_win, time_step, method, engine, time_pairs :
+        The same as ctsimilarities_cal().
+
+    Returns
+    -------
+    CTSimilarities : array [int((n_ts-time_win)/time_step)+1, int((n_ts-time_win)/time_step)+1, 2]
+        Cross-temporal similarities. If method='similarity' or 'distance', the values are in CTSimilarities[..., 0].
+        If time_pairs is given, the shape is [n_pairs, 2]. If chl_opt=1 and unit=(sub,), there is a leading n_channels
+        axis.
+    """
+
+    data1, data2 = arrays
+
+    prefix = engine == 'prefix' and time_pairs is None
 
-    # chl_opt=0
+    if prefix and (method == 'pearson' or method == 'similarity' or method == 'distance'):
+
+        # chl_opt=0: [1, n_chls, n_ts], chl_opt=1: [n_chls, 1, 1, n_ts] or [1, 1, n_ts]
+        if chl_opt == 0:
+            x1 = data1[unit[0]][np.newaxis]
+            x2 = data2[unit[0]][np.newaxis]
+        else:
+            x1 = data1[unit][..., np.newaxis, np.newaxis, :]
+            x2 = data2[unit][..., np.newaxis, np.newaxis, :]
+
+        r = prefix_similarities_cal(x1, x2, time_win=time_win, time_step=time_step, method=method)[..., 0, 0]
+
+        CTSimilarities = np.zeros(np.shape(r) + (2,), dtype=np.float64)
+        CTSimilarities[..., 0] = r
+
+        if method == 'pearson':
+            CTSimilarities[..., 1] = corr_p_cal(r, time_win * np.shape(x1)[-2])
+
+        return CTSimilarities
+
+    # chl_opt=0: [nts, n_chls*time_win]
     if chl_opt == 0:
+        windows1 = window_view(data1[unit[0]], time_win=time_win, time_step=time_step)
+        windows2 = window_view(data2[unit[0]], time_win=time_win, time_step=time_step)
+        n_chls, nts = np.shape(windows1)[:2]
+        newdata1 = np.reshape(np.transpose(windows1, (1, 0, 2)), [nts, n_chls*time_win])
+        newdata2 = np.reshape(np.transpose(windows2, (1, 0, 2)), [nts, n_chls*time_win])
+
+    # chl_opt=1: [n_chls, nts, time_win] or [nts, time_win]
+    else:
+        newdata1 = window_view(data1[unit], time_win=time_win, time_step=time_step)
+        newdata2 = window_view(data2[unit], time_win=time_win, time_step=time_step)
+
+    if time_pairs is not None:
+        t1, t2 = time_pairs_cal(time_pairs, np.shape(newdata1)[-2])
+        return pairs_ctsimilarities_cal(newdata1, newdata2, t1, t2, method=method)
+
+    return windows_ctsimilarities_cal(newdata1, newdata2, method=method)
+
+
+' a function for calculating the similarities between all pairs of time-windows '
+
+def windows_ctsimilarities_cal(windows1, windows2, method='spearman'):
 
-        newdata1 = np.zeros([n_subs, nts, n_chls, time_win], dtype=np.float)
-        newdata2 = np.zeros([n_subs, nts, n_chls, time_win], dtype=np.float)
+    """
+    Calculate the similarities between each time-window under condition1 and each time-window under condition2
+
+    Each time-window is standardized (and ranked for Spearman) once and all pairs of time-windows are compared by one
+    matrix product (or one cdist for the Euclidean Distances).
+
+    Parameters
+    ----------
+    windows1 : array [..., nts, n_features]
+        The time-windows under condition1. Any leading axes (e.g. channels) are batch axes.
+    windows2 : array [..., nts, n_features]
+        The time-windows under condition2.
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarities.
+
+    Returns
+    -------
+    CTSimilarities : array [..., nts, nts, 2]
+        CTSimilarities[..., t1, t2] compares windows1[..., t1, :] with windows2[..., t2, :]. If method='spearman' or
+        'pearson' or 'kendall', a r-value and a p-value. If method='similarity' or 'distance', the values are in
+        CTSimilarities[..., 0].
+    """
 
-        for sub in range(n_subs):
-            for t in range(nts):
-                for chl in range(n_chls):
-                    newdata1[sub, t, chl] = data1[sub, chl, t*time_step:t*time_step+time_win]
-                    newdata2[sub, t, chl] = data2[sub, chl, t*time_step:t*time_step+time_win]
+    windows1 = np.asarray(windows1, dtype=np.float64)
+    windows2 = np.asarray(windows2, dtype=np.float64)
 
-        newdata1 = np.reshape(newdata1, [n_subs, nts, n_chls*time_win])
-        newdata2 = np.reshape(newdata2, [n_subs, nts, n_chls*time_win])
+    nts, n_features = np.shape(windows1)[-2:]
 
-        CTSimilarities = np.zeros([n_subs, nts, nts, 2], dtype=np.float)
+    CTSimilarities = np.zeros(np.shape(windows1)[:-1] + (nts, 2), dtype=np.float64)
 
-        for sub in range(n_subs):
-            for t1 in range(nts):
-                for t2 in range(nts):
+    if method == 'spearman' or method == 'pearson':
 
-                    if method == 'spearman':
-                        CTSimilarities[sub, t1, t2] = spearmanr(newdata1[sub, t1], newdata2[sub, t2])
-                    if method == 'pearson':
-                        CTSimilarities[sub, t1, t2] = pearsonr(newdata1[sub, t1], newdata2[sub, t2])
-                    if method == 'kendall':
-                        CTSimilarities[sub, t1, t2] = kendalltau(newdata1[sub, t1], newdata2[sub, t2])
-                    if method == 'similarity':
-                        V1 = np.mat(newdata1[sub, t1])
-                        V2 = np.mat(newdata2[sub, t2])
-                        num = float(V1 * V2.T)
-                        denom = np.linalg.norm(V1) * np.linalg.norm(V2)
-                        cos = num / denom
-                        CTSimilarities[sub, t1, t2, 0] = 0.5 + 0.5 * cos
-                    if method == 'distance':
-                        CTSimilarities[sub, t1, t2, 0] = np.linalg.norm(newdata1[sub, t1] - newdata2[sub, t2])
+        if method == 'spearman':
+            windows1 = rank_cal(windows1)
+            windows2 = rank_cal(windows2)
 
-        if sub_opt == 0:
+        r = np.matmul(standardize(windows1), np.swapaxes(standardize(windows2), -1, -2))
+        r = np.clip(r, -1, 1)
 
-            CTSimilarities = np.average(CTSimilarities, axis=0)
+        CTSimilarities[..., 0] = r
+        CTSimilarities[..., 1] = corr_p_cal(r, n_features)
 
-            if method == 'spearman' or method == 'pearson' or method == 'kendall':
-                return CTSimilarities
+    if method == 'kendall':
 
-            if method == 'similarity' or method == 'distance':
-                return CTSimilarities[:, :, 0]
+        # the windows of all time pairs are gathered one block of t1 rows at a time, so the peak memory is bounded
+        rows = max(1, BLOCK_SIZE // (int(np.prod(np.shape(windows1)[:-2])) * nts * n_features))
 
-        if sub_opt == 1:
+        for start in range(0, nts, rows):
 
-            if method == 'spearman' or method == 'pearson' or method == 'kendall':
-                return CTSimilarities
+            t1, t2 = np.meshgrid(np.arange(start, min(start + rows, nts)), np.arange(nts), indexing='ij')
+            CTSimilarities[..., t1, t2, :] = kendalltau_cal(windows1[..., t1, :], windows2[..., t2, :])
+
+    if method == 'similarity':
+
+        cos = np.matmul(standardize(windows1, center=False), np.swapaxes(standardize(windows2, center=False), -1, -2))
+
+        CTSimilarities[..., 0] = 0.5 + 0.5 * cos
+
+    if method == 'distance':
+
+        flat1 = np.reshape(windows1, (-1, nts, n_features))
+        flat2 = np.reshape(windows2, (-1, nts, n_features))
+
+        CTSimilarities[..., 0] = np.reshape([cdist(flat1[i], flat2[i]) for i in range(len(flat1))],
+                                            np.shape(CTSimilarities)[:-1])
+
+    return CTSimilarities
+
+
+' a function for calculating the similarities between selected pairs of time-windows '
+
+def pairs_ctsimilarities_cal(windows1, windows2, t1, t2, method='spearman', chunk_size=2**12):
+
+    """
+    Calculate the similarities between the time-windows t1 under condition1 and t2 under condition2 for each time pair
+
+    Each time-window is standardized (and ranked for Spearman) once and the time pairs are compared chunk by chunk by
+    row-wise dot products, so the cost and the memory scale with the number of time pairs instead of nts*nts.
+
+    Parameters
+    ----------
+    windows1 : array [..., nts, n_features]
+        The time-windows under condition1. Any leading axes (e.g. channels) are batch axes.
+    windows2 : array [..., nts, n_features]
+        The time-windows under condition2.
+    t1 : array [n_pairs]
+    t2 : array [n_pairs]
+        The time pairs (see pyctrsa.util.pairs.time_pairs_cal).
+    method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
+        The method to calculate the similarities.
+    chunk_size : int. Default is 2**12.
+        The number of time pairs compared at once.
+
+    Returns
+    -------
+    CTSimilarities : array [..., n_pairs, 2]
+        CTSimilarities[..., i] compares windows1[..., t1[i], :] with windows2[..., t2[i], :], the same as
+        windows_ctsimilarities_cal(windows1, windows2, method)[..., t1[i], t2[i], :].
+    """
 
-            if method == 'similarity' or method == 'distance':
-                return CTSimilarities[:, :, :, 0]
+    windows1 = np.asarray(windows1, dtype=np.float64)
+    windows2 = np.asarray(windows2, dtype=np.float64)
 
-    if chl_opt == 1:
+    t1 = np.asarray(t1, dtype=np.intp)
+    t2 = np.asarray(t2, dtype=np.intp)
 
-        newdata1 = np.zeros([n_subs, n_chls, nts, time_win], dtype=np.float)
-        newdata2 = np.zeros([n_subs, n_chls, nts, time_win], dtype=np.float)
+    n_features = np.shape(windows1)[-1]
 
-        for sub in range(n_subs):
-            for chl in range(n_chls):
-                for t in range(nts):
-                    newdata1[sub, chl, t] = data1[sub, chl, t * time_step:t * time_step + time_win]
-                    newdata2[sub, chl, t] = data2[sub, chl, t * time_step:t * time_step + time_win]
+    CTSimilarities = np.zeros(np.shape(windows1)[:-2] + (len(t1), 2), dtype=np.float64)
 
-        CTSimilarities = np.zeros([n_subs, n_chls, nts, nts, 2], dtype=np.float)
+    if method == 'spearman':
+        windows1 = rank_cal(windows1)
+        windows2 = rank_cal(windows2)
 
-        for sub in range(n_subs):
-            for chl in range(n_chls):
-                for t1 in range(nts):
-                    for t2 in range(nts):
+    if method == 'spearman' or method == 'pearson':
+        windows1 = standardize(windows1)
+        windows2 = standardize(windows2)
 
-                        if method == 'spearman':
-                            CTSimilarities[sub, chl, t1, t2] = spearmanr(newdata1[sub, chl, t1], newdata2[sub, chl, t2])
-                        if method == 'pearson':
-                            CTSimilarities[sub, chl, t1, t2] = pearsonr(newdata1[sub, chl, t1], newdata2[sub, chl, t2])
-                        if method == 'kendall':
-                            CTSimilarities[sub, chl, t1, t2] = kendalltau(newdata1[sub, chl, t1], newdata2[sub, chl, t2])
-                        if method == 'similarity':
-                            V1 = np.mat(newdata1[sub, chl, t1])
-                            V2 = np.mat(newdata2[sub, chl, t2])
-                            num = float(V1 * V2.T)
-                            denom = np.linalg.norm(V1) * np.linalg.norm(V2)
-                            cos = num / denom
-                            CTSimilarities[sub, t1, t2, 0] = 0.5 + 0.5 * cos
-                        if method == 'distance':
-                            CTSimilarities[sub, t1, t2, 0] = np.linalg.norm(newdata1[sub, chl, t1] - newdata2[sub, chl, t2])
+    if method == 'similarity':
+        windows1 = standardize(windows1, center=False)
+        windows2 = standardize(windows2, center=False)
 
-        if sub_opt == 0:
+    for start in range(0, len(t1), chunk_size):
 
-            CTSimilarities = np.average(CTSimilarities, axis=0)
+        chunk = slice(start, start + chunk_size)
 
-            if method == 'spearman' or method == 'pearson' or method == 'kendall':
-                return CTSimilarities
+        v1 = windows1[..., t1[chunk], :]
+        v2 = windows2[..., t2[chunk], :]
 
-            if method == 'similarity' or method == 'distance':
-                return CTSimilarities[:, :, :, 0]
+        if method == 'spearman' or method == 'pearson':
 
-        if sub_opt == 1:
+            r = np.clip(np.einsum('...i,...i->...', v1, v2), -1, 1)
 
-            if method == 'spearman' or method == 'pearson' or method == 'kendall':
-                return CTSimilarities
+            CTSimilarities[..., chunk, 0] = r
+            CTSimilarities[..., chunk, 1] = corr_p_cal(r, n_features)
 
-            if method == 'similarity' or method == 'distance':
-                return CTSimilarities[:, :, :, :, 0]
+        if method == 'kendall':
+            CTSimilarities[..., chunk, :] = kendalltau_cal(v1, v2)
 
+        if method == 'similarity':
+            CTSimilarities[..., chunk, 0] = 0.5 + 0.5 * np.einsum('...i,...i->...', v1, v2)
 
+        if method == 'distance':
+            CTSimilarities[..., chunk, 0] = np.linalg.norm(v1 - v2, axis=-1)
 
+    return CTSimilarities
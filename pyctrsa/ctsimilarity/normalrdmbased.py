@@ -10,25 +10,38 @@
 ' a module for calculating Cross-Temporal Similarities based on normal RDMs '
 
 import numpy as np
-from neurora.rdm_corr import rdm_correlation_spearman, rdm_correlation_pearson, rdm_correlation_kendall
-from neurora.rdm_corr import rdm_similarity, rdm_distance
+from pyctrsa.similarity.stack import upper_vector, rank_cal, standardize, corr_p_cal
+from pyctrsa.similarity.kendallrp import kendalltau_cal
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.util.pairs import diagonal_pairs_cal, time_pairs_cal, TimePairArray
+from pyctrsa.ctsimilarity.normaldatabased import pairs_ctsimilarities_cal
+
+
+# the number of pairs of time-points calculated at a time by the Kendall tau (and for selected time pairs)
+CHUNK_SIZE = 2 ** 12
 
 
 ' a function for calculating Cross-Temporal Similarities based on normal RDMs '
 
-def ctsimilarities_cal(RDMs, method='spearman', fisherz=True):
+def ctsimilarities_cal(RDMs, method='spearman', fisherz=True, dtype=None, time_pairs=None, diagonal_only=False):
 
     """
     Calculate the Cross-Temporal Similarities based on normal RDMs
 
+    The values above the diagonal of all RDMs are vectorized into a [..., n_ts, n_pairs] matrix and all pairs of
+    time-points are compared by one [n_ts, n_ts] correlation (or cosine similarity, or distance) matrix product. The
+    results are the same as comparing each pair of RDMs by NeuroRA's rdm_correlation_*, rdm_similarity and
+    rdm_distance.
+
     Parameters
     ----------
     RDMs : array
         The Representational Dissimilarity Matrices in time series.
         The shape could be [n_ts, n_conditions, n_conditions] or [n_subs, n_ts, n_conditions, n_conditions] or
-        [n_channels, n_ts, n_conditions, n_conditions] or [n_subs, n_channels, n_ts, n_conditions, n_conditions].
-        n_ts, n_conditions, n_subs, n_channels represent the number of time-points, the number of conditions, the number
-        of subjects and the number of channels, respectively.
+        [n_channels, n_ts, n_conditions, n_conditions] or [n_subs, n_channels, n_ts, n_conditions, n_conditions] (or
+        any other leading shape [..., n_ts, n_conditions, n_conditions]). n_ts, n_conditions, n_subs, n_channels
+        represent the number of time-points, the number of conditions, the number of subjects and the number of
+        channels, respectively.
     method : string 'spearman' or 'pearson' or 'kendall' or 'similarity' or 'distance'. Default is 'spearman'.
         The method to calculate the similarities.
         If method='spearman', calculate the Spearman Correlations. If method='pearson', calculate the Pearson
@@ -37,6 +50,18 @@ def ctsimilarities_cal(RDMs, method='spearman', fisherz=True):
     fisherz : bool True or False. Default is False.
         Do the Fisher-Z transform of the CTRDMs or not.
         Only when method='spearman' or 'pearson' or 'kendall', it works.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of CTSimilarities. The similarities are always calculated in float64. If dtype=None, float32 is
+        used for float32 RDMs or when the RDMs have at least 2**24 values, otherwise float64 (see
+        pyctrsa.util.precision.dtype_cal).
+    time_pairs : None or tuple. Default is None.
+        Only calculate the similarities for a selection of time pairs: ('band', k), ('rectangle', rows, cols) or
+        (t1, t2) (see pyctrsa.util.pairs.time_pairs_cal). If time_pairs is given, the time-by-time axes [n_ts, n_ts]
+        are replaced by one axis of the selected time pairs and a pyctrsa.util.pairs.TimePairArray is returned.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
 
     Returns
     -------
@@ -64,90 +89,78 @@ def ctsimilarities_cal(RDMs, method='spearman', fisherz=True):
     Users can calculate RDMs by NeuroRA (zitonglu1996.github.io/neurora/)
     """
 
-    n = len(np.shape(RDMs))
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
 
-    if n == 3:
+    dtype = dtype_cal(dtype, size=int(np.prod(np.shape(RDMs))), like=getattr(RDMs, 'dtype', None))
 
-        n_ts, n_cons = np.shape(RDMs)[:2]
+    # [..., n_ts, n_pairs], the values above the diagonal of each RDM
+    v = upper_vector(RDMs)
 
-        CTSimilarities = np.zeros([n_ts, n_ts, 2], dtype=np.float)
+    batch = np.shape(v)[:-2]
+    n_ts, n = np.shape(v)[-2:]
 
-        for t1 in range(n_ts):
-            for t2 in range(n_ts):
+    if fisherz and (method == 'spearman' or method == 'pearson' or method == 'kendall'):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            v = np.arctanh(v)
 
-                if method == 'spearman':
-                    CTSimilarities[t1, t2] = rdm_correlation_spearman(RDMs[t1], RDMs[t2], fisherz=fisherz)
-                if method == 'pearson':
-                    CTSimilarities[t1, t2] = rdm_correlation_pearson(RDMs[t1], RDMs[t2], fisherz=fisherz)
-                if method == 'kendall':
-                    CTSimilarities[t1, t2] = rdm_correlation_kendall(RDMs[t1], RDMs[t2], fisherz=fisherz)
-                if method == 'similarity':
-                    CTSimilarities[t1, t2, 0] = rdm_similarity(RDMs[t1], RDMs[t2])
-                if method == 'distance':
-                    CTSimilarities[t1, t2, 0] = rdm_distance(RDMs[t1], RDMs[t2])
+    if time_pairs is not None:
 
-        if method == 'spearman' or method == 'pearson' or method == 'kendall':
+        t1, t2 = time_pairs_cal(time_pairs, n_ts)
 
-            return CTSimilarities
+        # [..., n_pairs, 2], only the selected pairs of RDMs are compared
+        CTSimilarities = pairs_ctsimilarities_cal(v, v, t1, t2, method=method, chunk_size=CHUNK_SIZE)
+        CTSimilarities = CTSimilarities.astype(dtype, copy=False)
 
         if method == 'similarity' or method == 'distance':
+            return TimePairArray(CTSimilarities[..., 0], t1, t2, n_ts)
 
-            return CTSimilarities[:, :, 0]
+        return TimePairArray(CTSimilarities, t1, t2, n_ts, n_tail=1)
 
-    if n == 4:
+    rows, cols = np.triu_indices(n_ts)
 
-        n1, n_ts, n_cons = np.shape(RDMs)[:3]
+    CTSimilarities = np.zeros(batch + (n_ts, n_ts, 2), dtype=np.float64)
 
-        CTSimilarities = np.zeros([n1, n_ts, n_ts, 2], dtype=np.float)
+    if method == 'spearman' or method == 'pearson':
 
-        for i in range(n1):
-            for t1 in range(n_ts):
-                for t2 in range(n_ts):
+        if method == 'spearman':
+            v = rank_cal(v)
 
-                    if method == 'spearman':
-                        CTSimilarities[i, t1, t2] = rdm_correlation_spearman(RDMs[i, t1], RDMs[i, t2], fisherz=fisherz)
-                    if method == 'pearson':
-                        CTSimilarities[i, t1, t2] = rdm_correlation_pearson(RDMs[i, t1], RDMs[i, t2], fisherz=fisherz)
-                    if method == 'kendall':
-                        CTSimilarities[i, t1, t2] = rdm_correlation_kendall(RDMs[i, t1], RDMs[i, t2], fisherz=fisherz)
-                    if method == 'similarity':
-                        CTSimilarities[i, t1, t2, 0] = rdm_similarity(RDMs[i, t1], RDMs[i, t2])
-                    if method == 'distance':
-                        CTSimilarities[i, t1, t2, 0] = rdm_distance(RDMs[i, t1], RDMs[i, t2])
+        # one [n_ts, n_ts] correlation matrix for all pairs of time-points
+        z = standardize(v)
+        r = np.clip(np.matmul(z, np.swapaxes(z, -1, -2)), -1, 1)
 
-        if method == 'spearman' or method == 'pearson' or method == 'kendall':
-            return CTSimilarities
+        CTSimilarities[..., 0] = r
+        CTSimilarities[..., rows, cols, 1] = corr_p_cal(r[..., rows, cols], n)
 
-        if method == 'similarity' or method == 'distance':
-            return CTSimilarities[:, :, :, 0]
+    if method == 'kendall':
 
-    if n == 5:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            pairs = slice(start, start + CHUNK_SIZE)
+            CTSimilarities[..., rows[pairs], cols[pairs], :] = kendalltau_cal(v[..., rows[pairs], :],
+                                                                              v[..., cols[pairs], :])
 
-        n1, n2, n_ts, n_cons = np.shape(RDMs)[:4]
+    if method == 'similarity':
 
-        CTSimilarities = np.zeros([n1, n2, n_ts, n_ts, 2], dtype=np.float)
+        z = standardize(v, center=False)
+        CTSimilarities[..., 0] = 0.5 + 0.5 * np.matmul(z, np.swapaxes(z, -1, -2))
 
-        for i in range(n1):
-            for j in range(n2):
-                for t1 in range(n_ts):
-                    for t2 in range(n_ts):
+    if method == 'distance':
 
-                        if method == 'spearman':
-                            CTSimilarities[i, j, t1, t2] = rdm_correlation_spearman(RDMs[i, j, t1], RDMs[i, j, t2],
-                                                                                 fisherz=fisherz)
-                        if method == 'pearson':
-                            CTSimilarities[i, j, t1, t2] = rdm_correlation_pearson(RDMs[i, j, t1], RDMs[i, j, t2],
-                                                                                fisherz=fisherz)
-                        if method == 'kendall':
-                            CTSimilarities[i, j, t1, t2] = rdm_correlation_kendall(RDMs[i, j, t1], RDMs[i, j, t2],
-                                                                                fisherz=fisherz)
-                        if method == 'similarity':
-                            CTSimilarities[i, j, t1, t2, 0] = rdm_similarity(RDMs[i, j, t1], RDMs[i, j, t2])
-                        if method == 'distance':
-                            CTSimilarities[i, j, t1, t2, 0] = rdm_distance(RDMs[i, j, t1], RDMs[i, j, t2])
+        # |v1-v2|^2 = |v1|^2+|v2|^2-2*v1.v2, after removing the mean RDM (which does not change the distances)
+        v = v - np.mean(v, axis=-2, keepdims=True)
+        sq = np.sum(v ** 2, axis=-1)
+        d2 = sq[..., :, np.newaxis] + sq[..., np.newaxis, :] - 2 * np.matmul(v, np.swapaxes(v, -1, -2))
 
-        if method == 'spearman' or method == 'pearson' or method == 'kendall':
-            return CTSimilarities
+        CTSimilarities[..., 0] = np.sqrt(np.maximum(d2, 0))
+        CTSimilarities[..., np.arange(n_ts), np.arange(n_ts), 0] = 0
 
-        if method == 'similarity' or method == 'distance':
-            return CTSimilarities[:, :, :, :, 0]
+    # the similarities are symmetric: CTSimilarities[t2, t1] = CTSimilarities[t1, t2]
+    CTSimilarities[..., cols, rows, :] = CTSimilarities[..., rows, cols, :]
+
+    CTSimilarities = CTSimilarities.astype(dtype, copy=False)
+
+    if method == 'similarity' or method == 'distance':
+
+        return CTSimilarities[..., 0]
+
+    return CTSimilarities
@@ -0,0 +1,209 @@
+# -*- coding: utf-8
+
+"""
+@File       :   regression.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for fitting multiple Coding Model RDMs jointly to CTRDMs by multiple regression '
+
+import numpy as np
+from scipy.stats import t as tdist
+from pyctrsa.similarity.stack import offdiag_vector
+from pyctrsa.util.precision import dtype_cal
+from pyctrsa.util.pairs import diagonal_pairs_cal, pair_values_cal, TimePairArray
+
+
+# the number of CTRDMs vectorized at a time
+CHUNK_SIZE = 2 ** 14
+
+
+' a function for fitting Coding Model RDMs jointly to CTRDMs '
+
+def ctregressions_cal(CTRDMs, Model_RDMs, method='ols', tol=1e-10, max_iter=1000, dtype=None, time_pairs=None,
+                      diagonal_only=False):
+
+    """
+    Fit multiple Coding Model RDMs jointly to the CTRDMs by multiple regression
+
+    For each CTRDM, the off-diagonal values are regressed on the off-diagonal values of all Model RDMs (and an
+    intercept). The pseudo-inverse of the design matrix is calculated once and all CTRDMs are fitted by matrix
+    products, a chunk of CTRDMs at a time.
+
+    Parameters
+    ----------
+    CTRDMs : array
+        The Cross-Temporal Representational Dissimilarity Matrices.
+        The shape should be [..., n_ts, n_ts, n_conditions, n_conditions], e.g. [n_subs, n_ts, n_ts, n_conditions,
+        n_conditions] or [n_subs, n_channels, n_ts, n_ts, n_conditions, n_conditions]. It can also be a
+        pyctrsa.ctrdm.symmetric.SymmetricCTRDMs or a pyctrsa.util.pairs.TimePairArray.
+    Model_RDMs : array [n_models, n_conditions, n_conditions].
+        The Coding Model RDMs.
+    method : string 'ols' or 'nnls'. Default is 'ols'.
+        The method to estimate the betas.
+        If method='ols', ordinary least squares. If method='nnls', non-negative least squares (the betas of the Model
+        RDMs are constrained to be >= 0, the intercept is not), solved by coordinate descent on the Gram matrix.
+    tol : float. Default is 1e-10.
+        If method='nnls', stop when the largest change of a beta in one sweep is smaller than tol.
+    max_iter : int. Default is 1000.
+        If method='nnls', the maximum number of coordinate descent sweeps.
+    dtype : None or numpy floating dtype. Default is None.
+        The precision of the results. The fits are always calculated in float64. If dtype=None, float32 is used for
+        float32 CTRDMs or when the CTRDMs have at least 2**24 values, otherwise float64 (see
+        pyctrsa.util.precision.dtype_cal).
+    time_pairs : None or tuple. Default is None.
+        Only fit the CTRDMs for a selection of time pairs: ('band', k), ('rectangle', rows, cols) or (t1, t2) (see
+        pyctrsa.util.pairs.time_pairs_cal). If time_pairs is given or CTRDMs is a TimePairArray, only the CTRDMs of
+        the selected time pairs are read and betas and partials are returned as pyctrsa.util.pairs.TimePairArray.
+    diagonal_only : bool True or False. Default is False.
+        Only calculate the time pairs t1 == t2 (time-resolved RSA) or not. It is the same as time_pairs=('band', 0):
+        a pyctrsa.util.pairs.TimePairArray is returned, whose values have one time axis [..., nts, ...] in place of
+        the time-by-time axes.
+
+    Returns
+    -------
+    betas : array [..., n_models, n_ts, n_ts]
+        The betas of the Model RDMs.
+    partials : array [..., n_models, n_ts, n_ts, 2]
+        The partial correlations between the CTRDMs and each Model RDM controlling for the other Model RDMs, including
+        a r-value and a p-value. They are derived from the t-values of the ordinary least squares betas,
+        r = t/sqrt(t^2+df) with df = n_conditions*(n_conditions-1)-n_models-1, whatever the method is.
+    """
+
+    time_pairs = diagonal_pairs_cal(time_pairs, diagonal_only)
+
+    if method != 'ols' and method != 'nnls':
+        raise ValueError("method should be 'ols' or 'nnls'.")
+
+    pairs = time_pairs is not None or isinstance(CTRDMs, TimePairArray)
+
+    # [..., n_pairs, n_conditions, n_conditions], only the CTRDMs of the selected time pairs are read
+    if pairs:
+        CTRDMs, t1, t2, n_ts = pair_values_cal(CTRDMs, time_pairs)
+
+    dtype = dtype_cal(dtype, size=int(np.prod(np.shape(CTRDMs))), like=getattr(CTRDMs, 'dtype', None))
+
+    CTRDMs = np.asarray(CTRDMs)
+
+    batch = np.shape(CTRDMs)[:-2]
+    n_cons = np.shape(CTRDMs)[-1]
+
+    Model_RDMs = np.asarray(Model_RDMs)
+    n_models = len(Model_RDMs)
+
+    # the design matrix [n, n_models+1], with an intercept
+    X = np.column_stack([np.ones([n_cons * (n_cons - 1)]), offdiag_vector(Model_RDMs).T])
+
+    n = len(X)
+    df = n - n_models - 1
+
+    # factored once for all CTRDMs
+    pinv = np.linalg.pinv(X)
+    gram = X.T @ X
+    cov = np.diag(np.linalg.pinv(gram))[1:]
+
+    flat = np.reshape(CTRDMs, (-1, n_cons, n_cons))
+
+    betas = np.zeros([len(flat), n_models], dtype=np.float64)
+    partials = np.zeros([len(flat), n_models, 2], dtype=np.float64)
+
+    for start in range(0, len(flat), CHUNK_SIZE):
+
+        v = offdiag_vector(flat[start:start+CHUNK_SIZE])
+        end = start + len(v)
+
+        b = v @ pinv.T
+
+        # the t-values of the betas and the partial correlations
+        rss = np.sum((v - b @ X.T) ** 2, axis=-1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = b[:, 1:] / np.sqrt(rss[:, np.newaxis] / df * cov)
+            r = t / np.sqrt(t ** 2 + df)
+
+        partials[start:end, :, 0] = r
+        partials[start:end, :, 1] = 2 * tdist.sf(np.abs(t), df)
+
+        if method == 'nnls':
+            b = nnls_cal(gram, v @ X, init=b, tol=tol, max_iter=max_iter)
+
+        betas[start:end] = b[:, 1:]
+
+    if pairs:
+
+        # [..., n_pairs, n_models] -> [..., n_models, n_pairs]
+        betas = np.moveaxis(np.reshape(betas, batch + (n_models,)), -1, -2)
+        partials = np.moveaxis(np.reshape(partials, batch + (n_models, 2)), -2, -3)
+
+        return (TimePairArray(betas.astype(dtype, copy=False), t1, t2, n_ts),
+                TimePairArray(partials.astype(dtype, copy=False), t1, t2, n_ts, n_tail=1))
+
+    # [..., n_ts, n_ts, n_models] -> [..., n_models, n_ts, n_ts]
+    betas = np.moveaxis(np.reshape(betas, batch + (n_models,)), -1, -3)
+    partials = np.moveaxis(np.reshape(partials, batch + (n_models, 2)), -2, -4)
+
+    return betas.astype(dtype, copy=False), partials.astype(dtype, copy=False)
+
+
+' a function for solving batched non-negative least squares problems '
+
+def nnls_cal(gram, c, init=None, tol=1e-10, max_iter=1000):
+
+    """
+    Solve min |y - Xb|^2 with b[1:] >= 0 for many y sharing one design matrix X, by coordinate descent
+
+    All problems are updated together, one coefficient at a time, using only the Gram matrix X'X and X'y.
+
+    Parameters
+    ----------
+    gram : array [n_coefs, n_coefs]
+        The Gram matrix X'X.
+    c : array [n_problems, n_coefs]
+        X'y of each problem.
+    init : None or array [n_problems, n_coefs]. Default is None.
+        The initial coefficients (e.g. the least squares solutions). They are clipped to the constraints.
+    tol : float. Default is 1e-10.
+        Stop when the largest change of a coefficient in one sweep is smaller than tol.
+    max_iter : int. Default is 1000.
+        The maximum number of sweeps.
+
+    Returns
+    -------
+    b : array [n_problems, n_coefs]
+        The coefficients, b[:, 0] (the intercept) unconstrained and b[:, 1:] >= 0.
+    """
+
+    n_coefs = len(gram)
+
+    if init is None:
+        b = np.zeros(np.shape(c), dtype=np.float64)
+    else:
+        b = np.array(init, dtype=np.float64)
+        b[:, 1:] = np.maximum(b[:, 1:], 0)
+
+    diag = np.diag(gram)
+
+    for i in range(max_iter):
+
+        change = 0
+
+        for j in range(n_coefs):
+
+            if diag[j] == 0:
+                continue
+
+            new = b[:, j] + (c[:, j] - b @ gram[j]) / diag[j]
+
+            if j > 0:
+                new = np.maximum(new, 0)
+
+            change = max(change, np.max(np.abs(new - b[:, j]), initial=0))
+
+            b[:, j] = new
+
+        if change < tol:
+            break
+
+    return b
@@ -10,14 +10,15 @@
 ' a module for plotting the time-by-time similarities '
 
 import numpy as np
-from neurora.stuff import permutation_test
 import matplotlib.pyplot as plt
 from neurora.rsa_plot import plot_corrs_hotmap
+from pyctrsa.util.pairs import diagonal_cal
+from pyctrsa.stats.permutation import signflip_permutation_cal
 
 
 ' a function for plotting the time-by-time similarities averaging all subjects '
 
-def tbytsimilarities_plot(CTSimilarities, start_time=0, end_time=1, color='r', lim=[-0.1, 0.8]):
+def tbytsimilarities_plot(CTSimilarities, start_time=0, end_time=1, color='r', lim=[-0.1, 0.8], seed=None):
 
     """
     Plot the time-by-time Similarities averaging all subjects
@@ -28,6 +29,8 @@ def tbytsimilarities_plot(CTSimilarities, start_time=0, end_time=1, color='r', l
         The Cross-Temporal Similarities.
         The size of CTSimilarities should be [n_subs, n_ts, n_ts] or [n_subs, n_ts, n_ts, 2]. n_subs, n_ts represent the
         number of subjects and number of time-points. 2 represents the similarity and a p-value.
+        Only the diagonal t1 == t2 is read, so CTSimilarities can also be a pyctrsa.util.pairs.TimePairArray, e.g.
+        calculated with diagonal_only=True.
     start_time : int or float. Default is 0.
         The start time.
     end_time : int or float. Default is 1.
@@ -36,6 +39,8 @@ def tbytsimilarities_plot(CTSimilarities, start_time=0, end_time=1, color='r', l
         The color for the curve.
     lim : array or list [min, max]. Default is [-0.1, 0.8].
         The corrs view lims.
+    seed : None or int. Default is None.
+        The seed of the permutation test (see pyctrsa.stats.permutation.signflip_permutation_cal).
     """
 
     n = len(np.shape(CTSimilarities))
@@ -43,21 +48,16 @@ def tbytsimilarities_plot(CTSimilarities, start_time=0, end_time=1, color='r', l
     minlim = lim[0]
     maxlim = lim[1]
 
+    # [n_subs, n_ts], only the time pairs t1 == t2 are read
+    sim = np.array(diagonal_cal(CTSimilarities, n_tail=n-3), dtype=np.float64)
+
     if n == 4:
-        CTSimilarities = CTSimilarities[:, :, :, 0]
+        sim = sim[:, :, 0]
 
-    nsubs = np.shape(CTSimilarities)[0]
-    nts = np.shape(CTSimilarities)[1]
+    nsubs, nts = np.shape(sim)
 
     tstep = float((end_time-start_time)/nts)
 
-    sim = np.zeros([nsubs, nts], dtype=np.float)
-
-    for sub in range(nsubs):
-        for t in range(nts):
-
-            sim[sub, t] = CTSimilarities[sub, t, t]
-
     for sub in range(nsubs):
         for t in range(nts):
 
@@ -74,11 +74,10 @@ def tbytsimilarities_plot(CTSimilarities, start_time=0, end_time=1, color='r', l
     for t in range(nts):
         err[t] = np.std(sim[:, t], ddof=1)/np.sqrt(nsubs)
 
-    ps = np.zeros([nts], dtype=np.float)
-    chance = np.full([nsubs], 0)
+    # one sign-flip permutation test for all time-points at once
+    ps = signflip_permutation_cal(sim, chance=0, n_perms=5000, tail=1, seed=seed)
 
     for t in range(nts):
-        ps[t] = permutation_test(sim[:, t], chance)
         if ps[t] < 0.05 and avg[t] > 0:
             plt.plot(t*tstep+start_time, maxlim*0.9, 's', color=color, alpha=1)
             xi = [t*tstep+start_time, t*tstep+tstep+start_time]
@@ -115,6 +114,8 @@ def tbytsimilarities_plot_bysubject(CTSimilarities, start_time=0, end_time=1, fi
         The Cross-Temporal Similarities.
         The size of CTSimilarities should be [n_subs, n_ts, n_ts] or [n_subs, n_ts, n_ts, 2]. n_subs, n_ts represent the
         number of subjects and number of time-points. 2 represents the similarity and a p-value.
+        Only the diagonal t1 == t2 is read, so CTSimilarities can also be a pyctrsa.util.pairs.TimePairArray, e.g.
+        calculated with diagonal_only=True.
     start_time : int or float. Default is 0.
         The start time.
     end_time : int or float. Default is 1.
@@ -130,20 +131,16 @@ def tbytsimilarities_plot_bysubject(CTSimilarities, start_time=0, end_time=1, fi
 
     n = len(np.shape(CTSimilarities))
 
+    # [n_subs, n_ts], only the time pairs t1 == t2 are read
+    sim = np.array(diagonal_cal(CTSimilarities, n_tail=n-3), dtype=np.float64)
+
     if n == 4:
-        CTSimilarities = CTSimilarities[:, :, :, 0]
+        sim = sim[:, :, 0]
 
-    nsubs = np.shape(CTSimilarities)[0]
-    nts = np.shape(CTSimilarities)[1]
+    nsubs, nts = np.shape(sim)
 
     tstep = float((end_time - start_time) / nts)
 
-    sim = np.zeros([nsubs, nts], dtype=np.float)
-
-    for sub in range(nsubs):
-        for t in range(nts):
-            sim[sub, t] = CTSimilarities[sub, t, t]
-
     for sub in range(nsubs):
         for t in range(nts):
 
@@ -169,6 +166,8 @@ def tbytsimilarities_plot_bychannel(CTSimilarities, start_time=0, end_time=1, fi
         The Cross-Temporal Similarities.
         The size of CTSimilarities should be [n_subs, n_ts, n_ts] or [n_subs, n_ts, n_ts, 2]. n_subs, n_ts represent the
         number of subjects and number of time-points. 2 represents the similarity and a p-value.
+        Only the diagonal t1 == t2 is read, so CTSimilarities can also be a pyctrsa.util.pairs.TimePairArray, e.g.
+        calculated with diagonal_only=True.
     start_time : int or float. Default is 0.
         The start time.
     end_time : int or float. Default is 1.
@@ -184,20 +183,16 @@ def tbytsimilarities_plot_bychannel(CTSimilarities, start_time=0, end_time=1, fi
 
     n = len(np.shape(CTSimilarities))
 
+    # [n_channels, n_ts], only the time pairs t1 == t2 are read
+    sim = np.array(diagonal_cal(CTSimilarities, n_tail=n-3), dtype=np.float64)
+
     if n == 4:
-        CTSimilarities = CTSimilarities[:, :, :, 0]
+        sim = sim[:, :, 0]
 
-    nchls = np.shape(CTSimilarities)[0]
-    nts = np.shape(CTSimilarities)[1]
+    nchls, nts = np.shape(sim)
 
     tstep = float((end_time - start_time) / nts)
 
-    sim = np.zeros([nchls, nts], dtype=np.float)
-
-    for chl in range(nchls):
-        for t in range(nts):
-            sim[chl, t] = CTSimilarities[chl, t, t]
-
     for chl in range(nchls):
         for t in range(nts):
 
@@ -10,50 +10,318 @@
 ' a module for calculating the similarity based on Kendalls tau Correlation Coefficient between two CTRDMs '
 
 import numpy as np
-from neurora.stuff import fisherz_rdm
-from scipy.stats import kendalltau
+from functools import lru_cache
+from math import lgamma
+from scipy.special import erfc
+from pyctrsa.similarity.stack import offdiag_vector, rp_stack
 
 
 ' a function for calculating the similarity based on Kendalls tau Correlation Coefficient between two CTRDMs '
 
 def kendallrp_cal(CTRDM1, CTRDM2):
+
     """
     Calculate the similarity based on Kendalls tau Correlation Coefficient between two CTRDMs
 
+    Two stacks of CTRDMs are compared pair by pair. The off-diagonal values of all CTRDMs are taken by one cached index
+    and the Kendall tau-b of all pairs is calculated by pyctrsa.similarity.kendallrp.kendalltau_cal.
+
+    Parameters
+    ----------
+    CTRDM1 : array [n_conditions, n_conditions] or [..., n_conditions, n_conditions]
+        The Cross-Temporal RDM 1, or a stack of Cross-Temporal RDMs.
+    CTRDM2 : array [n_conditions, n_conditions] or [..., n_conditions, n_conditions]
+        The Cross-Temporal RDM 2, or a stack of Cross-Temporal RDMs. The leading shapes of CTRDM1 and CTRDM2 are
+        broadcast against each other, e.g. a stack of CTRDMs can be compared with one Model RDM.
+
+    Returns
+    -------
+    rp : array [2] or [..., 2]
+        Kendall's tau correlation coefficient
+        A r-value and a p-value (for each pair of CTRDMs).
+    """
+
+    rp = kendalltau_cal(offdiag_vector(CTRDM1), offdiag_vector(CTRDM2))
+
+    return rp
+
+
+' a function for calculating the Kendall tau-b between two stacks of vectors '
+
+def kendalltau_cal(v1, v2):
+
+    """
+    Calculate the Kendall tau-b (and its p-value) between each pair of vectors of two stacks
+
+    It gives the same results as scipy.stats.kendalltau(v1[i], v2[i]) for each pair, but all pairs are calculated
+    together in O(n log n) operations each: the values are sorted by v2 then by v1 and the discordant pairs are counted
+    as the inversions of a batched bottom-up merge sort. If v2 is one vector (e.g. a Model RDM), it is sorted only once.
+
+    Parameters
+    ----------
+    v1 : array [..., n]
+        The vectors 1.
+    v2 : array [..., n]
+        The vectors 2. The leading shapes of v1 and v2 are broadcast against each other.
+
+    Returns
+    -------
+    rp : array [..., 2]
+        The tau-b values and the two-sided p-values. As scipy.stats.kendalltau, the p-values are exact for vectors
+        without ties and n <= 33 (or nearly perfect orderings), otherwise asymptotic with the tie-corrected variance.
+        Pairs with a NaN or a constant vector give NaN.
+    """
+
+    v1 = np.asarray(v1, dtype=np.float64)
+    v2 = np.asarray(v2, dtype=np.float64)
+
+    batch = np.broadcast_shapes(np.shape(v1)[:-1], np.shape(v2)[:-1])
+    n = np.shape(v1)[-1]
+
+    # sort by v2 and convert v2 to dense ranks (only once if v2 is one vector)
+    perm = np.argsort(v2, axis=-1, kind='mergesort')
+    s2 = np.take_along_axis(v2, perm, axis=-1)
+    d2 = np.cumsum(first_cal(s2), axis=-1)
+    tie2 = tie_cal(first_cal(s2))
+    nan2 = np.isnan(s2[..., -1])
+
+    perm = np.reshape(np.broadcast_to(perm, batch + (n,)), (-1, n))
+    d2 = np.reshape(np.broadcast_to(d2, batch + (n,)), (-1, n))
+    v1 = np.reshape(np.broadcast_to(v1, batch + (n,)), (-1, n))
+
+    # then stable sort by v1 (ties in v1 stay ordered by v2)
+    x = np.take_along_axis(v1, perm, axis=-1)
+    order = np.argsort(x, axis=-1, kind='mergesort')
+    s1 = np.take_along_axis(x, order, axis=-1)
+    y = np.take_along_axis(d2, order, axis=-1)
+
+    first1 = first_cal(s1)
+    tie1 = tie_cal(first1)
+
+    # joint ties: neighbours tied both in v1 and in v2
+    joint = first1.copy()
+    joint[:, 1:] |= y[:, 1:] != y[:, :-1]
+    ntie = tie_cal(joint)[0]
+
+    dis = discordant_cal(y)
+
+    xtie, x0, x1 = [np.reshape(t, batch) for t in tie1]
+    ytie, y0, y1 = [np.broadcast_to(t, batch) for t in tie2]
+    ntie = np.reshape(ntie, batch)
+    dis = np.reshape(dis, batch)
+
+    tot = n * (n - 1) / 2
+
+    con_minus_dis = tot - xtie - ytie + ntie - 2 * dis
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        tau = np.clip(con_minus_dis / np.sqrt(tot - xtie) / np.sqrt(tot - ytie), -1, 1)
+
+        # the asymptotic p-values
+        m = n * (n - 1.)
+        var = (m * (2 * n + 5) - x1 - y1) / 18 + (2 * xtie * ytie) / m + x0 * y0 / (9 * m * (n - 2))
+        p = erfc(np.abs(con_minus_dis) / np.sqrt(var) / np.sqrt(2))
+
+    # the exact p-values
+    c = np.minimum(dis, tot - dis)
+    exact = (xtie == 0) & (ytie == 0) & ((n <= 33) | (c <= 1))
+    if np.any(exact):
+        p = np.where(exact, kendall_p_exact_cal(n, c), p)
+
+    invalid = (xtie == tot) | (ytie == tot) | np.reshape(np.isnan(s1[:, -1]), batch) | nan2
+    tau = np.where(invalid, np.nan, tau)
+    p = np.where(invalid, np.nan, p)
+
+    return rp_stack(tau, p)
+
+
+' a function for flagging the first values of the groups of tied values '
+
+def first_cal(s):
+
+    """
+    Flag the first value of each group of tied values in sorted vectors
+
+    Parameters
+    ----------
+    s : array [..., n]
+        The vectors, sorted along the last axis.
+
+    Returns
+    -------
+    first : array of bool [..., n]
+        first[..., i] is True if s[..., i] is not tied with s[..., i-1].
+    """
+
+    first = np.ones(np.shape(s), dtype=bool)
+    first[..., 1:] = s[..., 1:] != s[..., :-1]
+
+    return first
+
+
+' a function for calculating the statistics of the tied values '
+
+def tie_cal(first):
+
+    """
+    Calculate the statistics of the groups of tied values used by the Kendall tau-b
+
+    Parameters
+    ----------
+    first : array of bool [..., n]
+        The flags of the first value of each group of tied values (see first_cal).
+
+    Returns
+    -------
+    tie, t0, t1 : arrays [...]
+        The sums of t*(t-1)/2, t*(t-1)*(t-2) and t*(t-1)*(2t+5) over the groups, t being the number of tied values in
+        a group.
+    """
+
+    n = np.shape(first)[-1]
+
+    pos = np.arange(n)
+
+    start = np.maximum.accumulate(np.where(first, pos, 0), axis=-1)
+
+    last = np.ones(np.shape(first), dtype=bool)
+    last[..., :-1] = first[..., 1:]
+
+    # the size of each group, counted at its last value
+    t = np.where(last, pos - start + 1, 0).astype(np.float64)
+
+    tie = np.sum(t * (t - 1) / 2, axis=-1)
+    t0 = np.sum(t * (t - 1) * (t - 2), axis=-1)
+    t1 = np.sum(t * (t - 1) * (2 * t + 5), axis=-1)
+
+    return tie, t0, t1
+
+
+' a function for counting the discordant pairs by a batched merge sort '
+
+def discordant_cal(y, block_size=16):
+
+    """
+    Count the inversions (pairs i < j with y[i] > y[j]) of each vector
+
+    The inversions inside blocks of block_size values are counted by direct comparisons. The sorted blocks are then
+    merged bottom-up, all blocks of all vectors at a level by one stable sort, which merges the two sorted runs of each
+    block in linear time, so the count takes O(n log n) operations: with the values of the right run tagged, the number
+    of values of the left run greater than a value of the right run is the number of left values not placed before it.
+
     Parameters
     ----------
-    CTRDM1 : array [n_conditions, n_conditions]
-        The Cross-Temporal RDM 1.
-    CTRDM2 : array [n_conditions, n_conditions]
-        The Cross-Temporal RDM 2.
+    y : array of int [n_vectors, n]
+        The vectors, with values from 0 to n.
+    block_size : int. Default is 16.
+        The number of values of the blocks counted by direct comparisons (a power of 2).
 
     Returns
     -------
-    rp : float, float
-        Kendalls tau's correlation coefficient
-        A r-value and a p-value.
+    dis : array [n_vectors]
+        The numbers of inversions.
     """
 
-    # get number of conditions
-    n_cons = np.shape(CTRDM1)[0]
+    n_vectors, n = np.shape(y)
+
+    size = max(1 << max(n - 1, 0).bit_length(), block_size)
+
+    top = int(np.max(y, initial=0)) + 1
+
+    # pad with values greater than all values, which add no inversions
+    a = np.full([n_vectors, size], top, dtype=np.int32 if 2 * top + 1 < 2 ** 31 else np.int64)
+    a[:, :n] = y
+
+    blocks = np.reshape(a, (n_vectors, size // block_size, block_size))
+
+    dis = np.zeros([n_vectors], dtype=np.float64)
+
+    for d in range(1, block_size):
+        dis += np.count_nonzero(blocks[..., :-d] > blocks[..., d:], axis=(1, 2))
+
+    a = np.reshape(np.sort(blocks, axis=-1), (n_vectors, size))
+
+    w = block_size
+    while w < size:
+
+        n_blocks = size // (2 * w)
+
+        # tag the right run by the lowest bit, so tied values of the left run are placed first
+        side = np.zeros([2 * w], dtype=a.dtype)
+        side[w:] = 1
+
+        # both runs are sorted, so the stable sort (timsort) merges them in linear time
+        key = np.sort(np.reshape(a, (n_vectors, n_blocks, 2 * w)) * 2 + side, axis=-1, kind='stable')
+
+        # the sum of the merged positions of the right values, minus the right values placed before each of them
+        pos = np.tile(np.arange(2 * w, dtype=np.float64), n_blocks)
+        left = np.reshape(key & 1, (n_vectors, size)).astype(np.float64) @ pos - n_blocks * w * (w - 1) / 2
 
-    # calculate the number of value above the diagonal in RDM
-    n = n_cons * (n_cons - 1)
+        dis += n_blocks * w * w - left
+
+        a = np.reshape(key >> 1, (n_vectors, size))
+
+        w = w * 2
+
+    return dis
+
+
+' a function for getting the null distribution of the number of discordant pairs '
+
+@lru_cache(maxsize=None)
+def kendall_null_cdf(n):
+
+    """
+    Get the cumulative null distribution of the number of inversions of a random permutation of n values
+
+    Parameters
+    ----------
+    n : int
+        The number of values.
+
+    Returns
+    -------
+    cdf : array [n*(n-1)/2+1]
+        cdf[c] is the probability of at most c inversions.
+    """
+
+    pmf = np.ones([1])
+
+    for j in range(2, n + 1):
+        pmf = np.convolve(pmf, np.ones([j]) / j)
+
+    return np.cumsum(pmf)
+
+
+' a function for calculating the exact p-values of the Kendall tau '
+
+def kendall_p_exact_cal(n, c):
+
+    """
+    Calculate the exact two-sided p-values of the Kendall tau of vectors without ties
+
+    Parameters
+    ----------
+    n : int
+        The number of values of each vector.
+    c : array
+        The numbers of discordant (or concordant, whichever is smaller) pairs.
+
+    Returns
+    -------
+    p : array
+        The exact p-values, as scipy.stats.kendalltau(method='exact').
+        For n > 33 only c <= 1 is supported (other values give NaN).
+    """
 
-    # initialize two vectors to store the values above the diagnal of two RDMs
-    v1 = np.zeros([n], dtype=np.float64)
-    v2 = np.zeros([n], dtype=np.float64)
+    c = np.asarray(c)
 
-    # assignment
-    nn = 0
-    for i in range(n_cons):
-        for j in range(n_cons):
-            if i != j:
-                v1[nn] = CTRDM1[i, j]
-                v2[nn] = CTRDM2[i, j]
-                nn = nn + 1
+    if n <= 33:
+        cdf = kendall_null_cdf(n)
+        return np.clip(2 * cdf[np.clip(c, 0, len(cdf) - 1).astype(np.intp)], 0, 1)
 
-    # calculate the Kendalls tau Correlation
-    rp = np.array(kendalltau(v1, v2))
+    # P(c=0) = 1/n!, P(c=1) = (n-1)/n!
+    p0 = np.exp(-lgamma(n + 1))
 
-    return rp
\ No newline at end of file
+    return np.where(c == 0, 2 * p0, np.where(c == 1, 2 * n * p0, np.nan))
@@ -10,50 +10,43 @@
 ' a module for calculating the similarity based on Pearson Correlation between two CTRDMs '
 
 import numpy as np
-from neurora.stuff import fisherz_rdm
-from scipy.stats import pearsonr
+from pyctrsa.similarity.stack import offdiag_vector, standardize, dot_cal, corr_p_cal, rp_stack
 
 
 ' a function for calculating the similarity based on Pearson Correlation Coefficient between two CTRDMs '
 
 def pearsonrp_cal(CTRDM1, CTRDM2):
+
     """
     Calculate the similarity based on Pearson Correlation Coefficient between two CTRDMs
 
+    Two stacks of CTRDMs are compared pair by pair. The off-diagonal values of all CTRDMs are taken by one cached index
+    and all pairs are correlated by a few array operations.
+
     Parameters
     ----------
-    CTRDM1 : array [n_conditions, n_conditions]
-        The Cross-Temporal RDM 1.
-    CTRDM2 : array [n_conditions, n_conditions]
-        The Cross-Temporal RDM 2.
+    CTRDM1 : array [n_conditions, n_conditions] or [..., n_conditions, n_conditions]
+        The Cross-Temporal RDM 1, or a stack of Cross-Temporal RDMs.
+    CTRDM2 : array [n_conditions, n_conditions] or [..., n_conditions, n_conditions]
+        The Cross-Temporal RDM 2, or a stack of Cross-Temporal RDMs. The leading shapes of CTRDM1 and CTRDM2 are
+        broadcast against each other, e.g. a stack of CTRDMs can be compared with one Model RDM.
 
     Returns
     -------
-    rp : float, float
+    rp : array [2] or [..., 2]
         Pearson's correlation coefficient
-        A r-value and a p-value.
+        A r-value and a p-value (for each pair of CTRDMs).
     """
 
-    # get number of conditions
-    n_cons = np.shape(CTRDM1)[0]
-
-    # calculate the number of value above the diagonal in RDM
-    n = n_cons * (n_cons - 1)
+    v1 = offdiag_vector(CTRDM1)
+    v2 = offdiag_vector(CTRDM2)
 
-    # initialize two vectors to store the values above the diagnal of two RDMs
-    v1 = np.zeros([n], dtype=np.float64)
-    v2 = np.zeros([n], dtype=np.float64)
-
-    # assignment
-    nn = 0
-    for i in range(n_cons):
-        for j in range(n_cons):
-            if i != j:
-                v1[nn] = CTRDM1[i, j]
-                v2[nn] = CTRDM2[i, j]
-                nn = nn + 1
+    n = np.shape(v1)[-1]
 
     # calculate the Pearson Correlation
-    rp = np.array(pearsonr(v1, v2))
+    r = dot_cal(standardize(v1), standardize(v2))
+    r = np.clip(r, -1, 1)
+
+    rp = rp_stack(r, corr_p_cal(r, n))
 
-    return rp
\ No newline at end of file
+    return rp
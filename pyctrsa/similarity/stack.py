@@ -0,0 +1,282 @@
+# -*- coding: utf-8
+
+"""
+@File       :   stack.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for vectorizing stacks of CTRDMs for the similarity calculations '
+
+import numpy as np
+from functools import lru_cache
+from scipy.stats import t as tdist
+
+
+' a function for getting the indices of the off-diagonal values in a RDM '
+
+@lru_cache(maxsize=None)
+def offdiag_index(n_cons):
+
+    """
+    Get the flat indices of the off-diagonal values in a [n_cons, n_cons] RDM
+
+    The indices are calculated once for each n_cons and cached.
+
+    Parameters
+    ----------
+    n_cons : int
+        The number of conditions.
+
+    Returns
+    -------
+    index : array [n_cons*(n_cons-1)]
+        The flat indices (read-only), in the row-major order of (i, j) with i != j.
+    """
+
+    index = np.flatnonzero(~np.eye(n_cons, dtype=bool))
+    index.flags.writeable = False
+
+    return index
+
+
+' a function for vectorizing the off-diagonal values of a stack of RDMs '
+
+def offdiag_vector(RDMs):
+
+    """
+    Vectorize the off-diagonal values of a stack of RDMs
+
+    Parameters
+    ----------
+    RDMs : array [..., n_conditions, n_conditions]
+        A RDM or a stack of RDMs.
+
+    Returns
+    -------
+    v : array [..., n_conditions*(n_conditions-1)]
+        The off-diagonal values (float64), in the row-major order of (i, j) with i != j.
+    """
+
+    RDMs = np.asarray(RDMs)
+
+    n_cons = np.shape(RDMs)[-1]
+
+    flat = np.reshape(RDMs, np.shape(RDMs)[:-2] + (n_cons * n_cons,))
+
+    return np.asarray(np.take(flat, offdiag_index(n_cons), axis=-1), dtype=np.float64)
+
+
+' a function for getting the indices of the values above the diagonal in a RDM '
+
+@lru_cache(maxsize=None)
+def upper_index(n_cons):
+
+    """
+    Get the flat indices of the values above the diagonal in a [n_cons, n_cons] RDM
+
+    The indices are calculated once for each n_cons and cached.
+
+    Parameters
+    ----------
+    n_cons : int
+        The number of conditions.
+
+    Returns
+    -------
+    index : array [n_cons*(n_cons-1)/2]
+        The flat indices (read-only), in the row-major order of (i, j) with i < j.
+    """
+
+    rows, cols = np.triu_indices(n_cons, 1)
+
+    index = rows * n_cons + cols
+    index.flags.writeable = False
+
+    return index
+
+
+' a function for vectorizing the values above the diagonal of a stack of RDMs '
+
+def upper_vector(RDMs):
+
+    """
+    Vectorize the values above the diagonal of a stack of RDMs
+
+    Parameters
+    ----------
+    RDMs : array [..., n_conditions, n_conditions]
+        A RDM or a stack of RDMs.
+
+    Returns
+    -------
+    v : array [..., n_conditions*(n_conditions-1)/2]
+        The values above the diagonal (float64), in the row-major order of (i, j) with i < j.
+    """
+
+    RDMs = np.asarray(RDMs)
+
+    n_cons = np.shape(RDMs)[-1]
+
+    flat = np.reshape(RDMs, np.shape(RDMs)[:-2] + (n_cons * n_cons,))
+
+    return np.asarray(np.take(flat, upper_index(n_cons), axis=-1), dtype=np.float64)
+
+
+' a function for ranking the values of a stack of vectors '
+
+def rank_cal(v):
+
+    """
+    Rank the values of each vector along the last axis, tied values getting their average rank
+
+    It gives the same ranks as scipy.stats.rankdata(v, axis=-1), but all vectors are ranked by one sort.
+
+    Parameters
+    ----------
+    v : array [..., n]
+        The vectors.
+
+    Returns
+    -------
+    ranks : array [..., n]
+        The ranks (from 1 to n). Vectors containing NaN get NaN ranks.
+    """
+
+    v = np.asarray(v, dtype=np.float64)
+
+    n = np.shape(v)[-1]
+
+    order = np.argsort(v, axis=-1, kind='mergesort')
+    sv = np.take_along_axis(v, order, axis=-1)
+
+    # the first and the last position of the group of tied values of each sorted value
+    first = np.ones(np.shape(v), dtype=bool)
+    first[..., 1:] = sv[..., 1:] != sv[..., :-1]
+    last = np.ones(np.shape(v), dtype=bool)
+    last[..., :-1] = first[..., 1:]
+
+    pos = np.arange(n)
+    start = np.maximum.accumulate(np.where(first, pos, 0), axis=-1)
+    end = np.flip(np.minimum.accumulate(np.flip(np.where(last, pos, n - 1), axis=-1), axis=-1), axis=-1)
+
+    ranks = np.empty(np.shape(v), dtype=np.float64)
+    np.put_along_axis(ranks, order, (start + end) / 2 + 1, axis=-1)
+
+    # NaN are sorted last
+    if n > 0:
+        ranks[np.isnan(sv[..., -1])] = np.nan
+
+    return ranks
+
+
+' a function for standardizing vectors '
+
+def standardize(v, center=True):
+
+    """
+    Scale vectors along the last axis to unit norm (after centering them)
+
+    Parameters
+    ----------
+    v : array [..., n]
+        The vectors.
+    center : bool True or False. Default is True.
+        Center the vectors or not.
+
+    Returns
+    -------
+    z : array [..., n]
+        The standardized vectors. The dot product of two standardized (centered) vectors is their Pearson correlation
+        coefficient (cosine similarity if center=False). Constant vectors become NaN.
+    """
+
+    if center:
+        # constant vectors, whose centered values may be rounding errors
+        constant = np.all(v == v[..., :1], axis=-1, keepdims=True)
+        v = v - np.mean(v, axis=-1, keepdims=True)
+        v = np.where(constant, 0, v)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+' a function for calculating the dot products of two stacks of vectors '
+
+def dot_cal(z1, z2):
+
+    """
+    Calculate the dot products of two broadcastable stacks of vectors along the last axis
+
+    Parameters
+    ----------
+    z1 : array [..., n]
+    z2 : array [..., n]
+
+    Returns
+    -------
+    dot : array [...]
+        The dot products, of the broadcast leading shape.
+        A stack of vectors [..., 1, n] against a stack of vectors [n_vectors, n] (e.g. CTRDMs against a stack of Model
+        RDMs) is calculated by one matrix product.
+    """
+
+    if np.ndim(z2) == 2 and np.ndim(z1) >= 2 and np.shape(z1)[-2] == 1:
+        return np.matmul(z1[..., 0, :], np.transpose(z2))
+
+    if np.ndim(z2) == 1:
+        return np.dot(z1, z2)
+
+    if np.ndim(z1) == 1:
+        return np.dot(z2, z1)
+
+    return np.einsum('...i,...i->...', z1, z2)
+
+
+' a function for calculating the two-sided p-values of correlation coefficients '
+
+def corr_p_cal(r, n):
+
+    """
+    Calculate the two-sided p-values of Pearson (or Spearman) correlation coefficients
+
+    Parameters
+    ----------
+    r : array
+        The correlation coefficients.
+    n : int
+        The number of values of each correlated vector.
+
+    Returns
+    -------
+    p : array
+        The p-values based on the t-distribution with n-2 degrees of freedom, as scipy.stats.pearsonr and
+        scipy.stats.spearmanr.
+    """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt((n - 2) / ((1 - r) * (1 + r)))
+
+    return 2 * tdist.sf(np.abs(t), n - 2)
+
+
+' a function for stacking r-values and p-values '
+
+def rp_stack(r, p):
+
+    """
+    Stack r-values and p-values
+
+    Parameters
+    ----------
+    r : array [...]
+    p : array [...]
+
+    Returns
+    -------
+    rp : array [..., 2]
+        rp[..., 0] = r, rp[..., 1] = p.
+    """
+
+    return np.stack(np.broadcast_arrays(r, p), axis=-1)
@@ -0,0 +1,8 @@
+# -*- coding: utf-8
+
+"""
+@File       :   __init__.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
\ No newline at end of file
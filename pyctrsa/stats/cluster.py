@@ -0,0 +1,181 @@
+# -*- coding: utf-8
+
+"""
+@File       :   cluster.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for cluster-based sign-flip permutation tests of time-by-time maps '
+
+import numpy as np
+from scipy import ndimage
+from scipy.stats import t as tdist
+from pyctrsa.stats.permutation import permutation_stats_cal, null_cal
+
+
+' a function for finding the clusters of a batch of statistic maps '
+
+def clusters_cal(stats, threshold, tail=1):
+
+    """
+    Find the clusters of a batch of statistic maps, all maps labelled at once
+
+    Parameters
+    ----------
+    stats : array [n_maps, ...]
+        The statistic maps, e.g. [n_maps, nts, nts].
+    threshold : float
+        The cluster-forming threshold (> 0).
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, clusters of stats > threshold. If tail=-1, clusters of stats < -threshold. If tail=0, both, labelled
+        separately.
+
+    Returns
+    -------
+    labels : array [n_maps, ...]
+        The cluster of each cell, 0 outside the clusters. The labels of map i are larger than those of map i-1.
+    masses : array [n_labels+1]
+        The mass (the sum of the absolute statistics) of each cluster. masses[0] is 0.
+    owners : array [n_labels+1]
+        The map of each cluster.
+    """
+
+    stats = np.asarray(stats)
+
+    # the neighbours along the axes of a map, not across the maps
+    structure = np.zeros((3,) * np.ndim(stats), dtype=bool)
+    structure[1] = ndimage.generate_binary_structure(np.ndim(stats) - 1, 1)
+
+    if tail == 1:
+        masks = [stats > threshold]
+    elif tail == -1:
+        masks = [stats < -threshold]
+    elif tail == 0:
+        masks = [stats > threshold, stats < -threshold]
+    else:
+        raise ValueError("tail should be 1, -1 or 0.")
+
+    labels = np.zeros(np.shape(stats), dtype=np.intp)
+    n_labels = 0
+
+    for mask in masks:
+        sign_labels, n = ndimage.label(mask, structure=structure)
+        labels[mask] = sign_labels[mask] + n_labels
+        n_labels = n_labels + n
+
+    masses = np.bincount(labels.ravel(), weights=np.abs(stats).ravel(), minlength=n_labels + 1)
+    masses[0] = 0
+
+    owners = np.zeros([n_labels + 1], dtype=np.intp)
+    owners[labels] = np.arange(len(stats)).reshape((-1,) + (1,) * (np.ndim(stats) - 1))
+
+    return labels, masses, owners
+
+
+' a function for the largest cluster mass of each permutation of one work unit '
+
+def cluster_null_unit_cal(arrays, unit, threshold=None, tail=1, stat='t'):
+
+    """
+    a function to calculate the largest cluster mass of each permutation of one work unit, used by the process pool in
+    cluster_permutation_cal()
+
+    Parameters
+    ----------
+    arrays : list [x, signs]
+        x is the data of shape [n_subs, ...] and signs the sign matrix of shape [n_perms, n_subs].
+    unit : tuple (start, stop)
+        The permutations to calculate.
+    threshold, tail, stat :
+        The same as cluster_permutation_cal().
+
+    Returns
+    -------
+    max_masses : array [stop-start]
+        The largest cluster mass of each permutation, 0 if a permutation has no cluster.
+    """
+
+    x, signs = arrays
+
+    # [n_perms, ...]
+    stats = permutation_stats_cal(x, signs[unit[0]:unit[1]], stat=stat)
+
+    labels, masses, owners = clusters_cal(stats, threshold, tail=tail)
+
+    max_masses = np.zeros([unit[1] - unit[0]], dtype=np.float64)
+    np.maximum.at(max_masses, owners[1:], masses[1:])
+
+    return max_masses
+
+
+' a function for the cluster-based permutation test of time-by-time maps '
+
+def cluster_permutation_cal(x, chance=0, n_perms=1000, threshold=None, p_threshold=0.05, tail=1, stat='t', n_jobs=1,
+                            seed=None):
+
+    """
+    Conduct a cluster-based sign-flip permutation test against the chance level
+
+    The statistic maps of a block of permutations are calculated by one matrix product (see
+    pyctrsa.stats.permutation.permutation_stats_cal), thresholded and labelled at once, and the largest cluster mass of
+    each permutation forms the null distribution. The blocks of permutations can be spread across a process pool.
+
+    Parameters
+    ----------
+    x : array [n_subs, ...]
+        The results of each subject, e.g. the similarities (r-values) of shape [n_subs, nts, nts].
+    chance : float or array. Default is 0.
+        The chance level, broadcastable to x.
+    n_perms : int. Default is 1000.
+        The number of permutations.
+    threshold : None or float. Default is None.
+        The cluster-forming threshold on the statistic. If threshold=None, it is the t-value of p_threshold (only for
+        stat='t').
+    p_threshold : float. Default is 0.05.
+        The cluster-forming p-value if threshold=None (one-sided, or two-sided if tail=0).
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, test x > chance. If tail=-1, test x < chance. If tail=0, a two-sided test.
+    stat : string 't' or 'mean'. Default is 't'.
+        The group statistic (see pyctrsa.stats.permutation.permutation_stats_cal).
+    n_jobs : int or None. Default is 1.
+        The number of worker processes. If n_jobs=None or n_jobs<0, use all CPUs. The results are identical whatever the
+        number of workers is.
+    seed : None or int or numpy.random.Generator. Default is None.
+        The seed of the random number generator. The same seed gives the same p-values.
+
+    Returns
+    -------
+    clusters : array [n_clusters, ...]
+        The mask of each observed cluster.
+    ps : array [n_clusters]
+        The corrected p-value of each cluster: (1 + the number of permutations whose largest cluster mass is at least
+        its mass) / (1 + n_perms).
+    """
+
+    x = np.asarray(x, dtype=np.float64) - chance
+
+    n_subs = len(x)
+
+    if threshold is None:
+
+        if stat != 't':
+            raise ValueError("threshold should be given if stat is not 't'.")
+
+        threshold = tdist.ppf(1 - (p_threshold / 2 if tail == 0 else p_threshold), n_subs - 1)
+
+    # the observed clusters
+    stats = permutation_stats_cal(x, np.ones([1, n_subs]), stat=stat)
+    labels, masses, owners = clusters_cal(stats, threshold, tail=tail)
+
+    # the null distribution of the largest cluster mass
+    null = null_cal(cluster_null_unit_cal, x, n_perms=n_perms, n_jobs=n_jobs, seed=seed, threshold=threshold, tail=tail,
+                    stat=stat)
+
+    clusters = labels[0] == np.arange(1, len(masses))[(slice(None),) + (np.newaxis,) * (np.ndim(x) - 1)]
+
+    # masses equal up to rounding (e.g. of the permutation without any flip) count as ties
+    ps = (np.sum(null >= masses[1:, np.newaxis] * (1 - 1e-12), axis=1) + 1) / (n_perms + 1)
+
+    return clusters, ps
@@ -0,0 +1,233 @@
+# -*- coding: utf-8
+
+"""
+@File       :   group.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for group-level t-maps and max-statistic FWE correction of large (disk-backed) results '
+
+import numpy as np
+from scipy.stats import t as tdist
+from pyctrsa.stats.permutation import BLOCK_SIZE, signs_cal, permutation_stats_cal
+
+
+' a function for cutting a grid into blocks of basic slices '
+
+def blocks_cal(shape, size):
+
+    """
+    Cut a grid into blocks of at most size cells, indexed by basic slicing
+
+    Basic slicing of a np.memmap or h5py.Dataset only reads the cells of the block.
+
+    Parameters
+    ----------
+    shape : tuple
+        The shape of the grid.
+    size : int
+        The largest number of cells in a block (at least one cell is in a block).
+
+    Yields
+    ------
+    index : tuple of slices and ints
+        The index of a block in the grid.
+    """
+
+    if len(shape) == 0:
+        yield ()
+        return
+
+    inner = int(np.prod(shape[1:]))
+
+    if inner <= size:
+
+        step = max(1, size // max(inner, 1))
+
+        for start in range(0, shape[0], step):
+            yield (slice(start, min(start + step, shape[0])),)
+
+    else:
+
+        for i in range(shape[0]):
+            for index in blocks_cal(shape[1:], size):
+                yield (i,) + index
+
+
+' a function for reading a block of the differences between the subjects and the chance level (or paired data) '
+
+def block_read_cal(x, y, chance, index):
+
+    """
+    Read a block of x - y (or x - chance) for all subjects
+
+    Parameters
+    ----------
+    x : array or np.memmap or h5py.Dataset [n_subs, ...]
+    y : None or array or np.memmap or h5py.Dataset [n_subs, ...]
+    chance : float or array
+        The chance level, broadcastable to x.shape[1:]. Only used if y=None.
+    index : tuple
+        The index of the block in x.shape[1:] (see blocks_cal).
+
+    Returns
+    -------
+    d : array [n_subs, n_cells]
+        The differences of the block.
+    """
+
+    d = np.asarray(x[(slice(None),) + index], dtype=np.float64)
+
+    if y is not None:
+        d = d - np.asarray(y[(slice(None),) + index], dtype=np.float64)
+    elif np.ndim(chance) == 0:
+        d = d - chance
+    else:
+        d = d - np.broadcast_to(chance, np.shape(x)[1:])[index]
+
+    return np.reshape(d, (len(d), -1))
+
+
+' a function for the one-sample or paired t-maps of all cells '
+
+def ttest_cal(x, y=None, chance=0, tail=1, chunk_size=BLOCK_SIZE):
+
+    """
+    Conduct one-sample (against the chance level) or paired t-tests among subjects for all cells
+
+    Each block of cells is tested in one vectorized pass, so the data can be disk-backed and larger than the memory.
+
+    Parameters
+    ----------
+    x : array or np.memmap or h5py.Dataset [n_subs, ...]
+        The results of each subject, e.g. the similarities of shape [n_subs, nts, nts] or [n_subs, n_chls, nts, nts].
+        For results with r-values and p-values [..., 2], use the r-values x[..., 0] (a view for np.memmap).
+    y : None or array or np.memmap or h5py.Dataset [n_subs, ...]. Default is None.
+        If y is given, the paired t-test of x against y.
+    chance : float or array. Default is 0.
+        The chance level of the one-sample t-test, broadcastable to x.shape[1:].
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, test x > chance (or y). If tail=-1, test x < chance (or y). If tail=0, a two-sided test.
+    chunk_size : int. Default is 2**22.
+        The largest number of values read at a time.
+
+    Returns
+    -------
+    ts : array [...]
+        The t-value of each cell.
+    ps : array [...]
+        The p-value of each cell (not corrected).
+    """
+
+    if tail not in [1, -1, 0]:
+        raise ValueError("tail should be 1, -1 or 0.")
+
+    n_subs = np.shape(x)[0]
+    shape = tuple(np.shape(x)[1:])
+
+    ts = np.zeros(shape, dtype=np.float64)
+    ps = np.zeros(shape, dtype=np.float64)
+
+    for index in blocks_cal(shape, max(1, chunk_size // n_subs)):
+
+        d = block_read_cal(x, y, chance, index)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.mean(d, axis=0) / (np.std(d, axis=0, ddof=1) / np.sqrt(n_subs))
+
+        if tail == 1:
+            p = tdist.sf(t, n_subs - 1)
+        elif tail == -1:
+            p = tdist.cdf(t, n_subs - 1)
+        else:
+            p = 2 * tdist.sf(np.abs(t), n_subs - 1)
+
+        ts[index] = np.reshape(t, np.shape(ts[index]))
+        ps[index] = np.reshape(p, np.shape(ps[index]))
+
+    return ts, ps
+
+
+' a function for the max-statistic permutation test of all cells '
+
+def maxstat_permutation_cal(x, y=None, chance=0, n_perms=1000, tail=1, stat='t', chunk_size=BLOCK_SIZE, seed=None):
+
+    """
+    Conduct a sign-flip permutation test with the max-statistic (family-wise error) correction for all cells
+
+    The cells are read one block at a time. The statistics of all permutations of a block are calculated by one matrix
+    product (see pyctrsa.stats.permutation.permutation_stats_cal), and the largest statistic of each permutation is
+    kept over the blocks, so the data are read only once and can be disk-backed and larger than the memory.
+
+    Parameters
+    ----------
+    x : array or np.memmap or h5py.Dataset [n_subs, ...]
+        The results of each subject, e.g. channel-resolved similarities of shape [n_subs, n_chls, n_models, nts, nts].
+        For results with r-values and p-values [..., 2], use the r-values x[..., 0] (a view for np.memmap).
+    y : None or array or np.memmap or h5py.Dataset [n_subs, ...]. Default is None.
+        If y is given, the paired test of x against y (the signs of x - y are flipped).
+    chance : float or array. Default is 0.
+        The chance level of the one-sample test, broadcastable to x.shape[1:].
+    n_perms : int. Default is 1000.
+        The number of permutations.
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, test x > chance (or y). If tail=-1, test x < chance (or y). If tail=0, a two-sided test.
+    stat : string 't' or 'mean'. Default is 't'.
+        The group statistic (see pyctrsa.stats.permutation.permutation_stats_cal).
+    chunk_size : int. Default is 2**22.
+        The largest number of permuted values calculated at a time.
+    seed : None or int or numpy.random.Generator. Default is None.
+        The seed of the random number generator. The same seed gives the same p-values.
+
+    Returns
+    -------
+    stats : array [...]
+        The observed statistic (t-value or mean) of each cell.
+    ps : array [...]
+        The FWE-corrected p-value of each cell: (1 + the number of permutations whose largest statistic over all cells
+        is at least as extreme as the statistic of the cell) / (1 + n_perms). NaN if the statistic is NaN.
+    """
+
+    if tail not in [1, -1, 0]:
+        raise ValueError("tail should be 1, -1 or 0.")
+
+    n_subs = np.shape(x)[0]
+    shape = tuple(np.shape(x)[1:])
+
+    # the first row gives the observed statistics, calculated exactly like the permuted ones
+    signs = np.concatenate([np.ones([1, n_subs]), signs_cal(n_subs, n_perms=n_perms, seed=seed)])
+
+    stats = np.zeros(shape, dtype=np.float64)
+    null = np.full([n_perms], -np.inf)
+
+    for index in blocks_cal(shape, max(1, chunk_size // (n_perms + 1))):
+
+        d = block_read_cal(x, y, chance, index)
+
+        block = permutation_stats_cal(d, signs, stat=stat)
+
+        stats[index] = np.reshape(block[0], np.shape(stats[index]))
+
+        if tail == -1:
+            block = -block
+        elif tail == 0:
+            block = np.abs(block)
+
+        block = np.where(np.isnan(block[1:]), -np.inf, block[1:])
+
+        if np.shape(block)[1] > 0:
+            null = np.maximum(null, np.max(block, axis=1))
+
+    if tail == 1:
+        observed = stats
+    elif tail == -1:
+        observed = -stats
+    else:
+        observed = np.abs(stats)
+
+    counts = n_perms - np.searchsorted(np.sort(null), observed, side='left')
+    ps = (counts + 1) / (n_perms + 1)
+
+    return stats, np.where(np.isnan(stats), np.nan, ps)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8
+
+"""
+@File       :   permutation.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for one-sample sign-flip permutation tests of all time-points (or time pairs) at once '
+
+import numpy as np
+from pyctrsa.util.parallel import n_jobs_cal, parallel_cal
+
+
+# the number of permuted values calculated at a time
+BLOCK_SIZE = 2 ** 22
+
+
+' a function for drawing the sign matrix of a sign-flip permutation test '
+
+def signs_cal(n_subs, n_perms=5000, seed=None):
+
+    """
+    Draw the random signs of a sign-flip permutation test
+
+    Parameters
+    ----------
+    n_subs : int
+        The number of subjects.
+    n_perms : int. Default is 5000.
+        The number of permutations.
+    seed : None or int or numpy.random.Generator. Default is None.
+        The seed of the random number generator. The same seed gives the same signs.
+
+    Returns
+    -------
+    signs : array [n_perms, n_subs]
+        The signs (+1 or -1) of each subject in each permutation.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    return rng.choice(np.array([-1.0, 1.0]), size=(n_perms, n_subs))
+
+
+' a function for calculating the group statistics of sign-flipped data '
+
+def permutation_stats_cal(x, signs, stat='mean'):
+
+    """
+    Calculate the group statistic of the data for each row of signs, by one matrix product
+
+    Parameters
+    ----------
+    x : array [n_subs, ...]
+        The data of each subject (e.g. the similarities minus the chance level).
+    signs : array [n_signs, n_subs]
+        The sign of each subject in each permutation. A row of ones gives the observed statistic.
+    stat : string 'mean' or 't'. Default is 'mean'.
+        The group statistic. If stat='mean', the mean among subjects. If stat='t', the one-sample t-value.
+
+    Returns
+    -------
+    stats : array [n_signs, ...]
+        The statistic of each permutation.
+
+    Notes
+    -----
+    Flipping signs does not change the sum of squares, so the t-values only need the permuted means and the sum of
+    squares of the data.
+    """
+
+    x = np.asarray(x, dtype=np.float64)
+
+    n_subs = len(x)
+
+    flat = np.reshape(x, (n_subs, -1))
+
+    # [n_signs, n_cells]
+    mean = np.asarray(signs, dtype=np.float64) @ flat / n_subs
+
+    if stat == 'mean':
+        stats = mean
+
+    elif stat == 't':
+
+        sq = np.sum(flat ** 2, axis=0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = np.maximum(sq - n_subs * mean ** 2, 0) / (n_subs - 1)
+            stats = mean / np.sqrt(var / n_subs)
+
+    else:
+        raise ValueError("stat should be 'mean' or 't'.")
+
+    return np.reshape(stats, (len(stats),) + np.shape(x)[1:])
+
+
+' a function for the p-values of the observed statistics among the permuted statistics '
+
+def pvalues_cal(observed, null, tail=1):
+
+    """
+    Get the permutation p-values
+
+    Parameters
+    ----------
+    observed : array [...]
+        The observed statistics.
+    null : array [n_perms, ...]
+        The statistics of the permutations.
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, test observed > null. If tail=-1, test observed < null. If tail=0, a two-sided test on the absolute
+        values.
+
+    Returns
+    -------
+    p : array [...]
+        p = (1 + the number of permutations at least as extreme as the observed statistic) / (1 + n_perms). NaN if the
+        observed statistic is NaN.
+    """
+
+    if tail == 1:
+        count = np.sum(null >= observed, axis=0)
+    elif tail == -1:
+        count = np.sum(null <= observed, axis=0)
+    elif tail == 0:
+        count = np.sum(np.abs(null) >= np.abs(observed), axis=0)
+    else:
+        raise ValueError("tail should be 1, -1 or 0.")
+
+    p = (count + 1) / (len(null) + 1)
+
+    return np.where(np.isnan(observed), np.nan, p)
+
+
+' a function for the one-sample sign-flip permutation test of all time-points (or time pairs) at once '
+
+def signflip_permutation_cal(x, chance=0, n_perms=5000, tail=1, stat='mean', seed=None):
+
+    """
+    Conduct a one-sample sign-flip permutation test against the chance level for all time-points (or time pairs)
+
+    One [n_perms, n_subs] sign matrix is drawn and applied to all time-points by one matrix product (a block of
+    time-points at a time), so all time-points share the same permutations.
+
+    Parameters
+    ----------
+    x : array [n_subs, ...]
+        The results of each subject, e.g. the similarities of shape [n_subs, n_ts] or [n_subs, n_ts, n_ts].
+    chance : float or array. Default is 0.
+        The chance level, broadcastable to x.
+    n_perms : int. Default is 5000.
+        The number of permutations.
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, test x > chance. If tail=-1, test x < chance. If tail=0, a two-sided test.
+    stat : string 'mean' or 't'. Default is 'mean'.
+        The group statistic (see permutation_stats_cal).
+    seed : None or int or numpy.random.Generator. Default is None.
+        The seed of the random number generator. The same seed gives the same p-values.
+
+    Returns
+    -------
+    p : array [...]
+        The p-value of each time-point (or time pair).
+    """
+
+    x = np.asarray(x, dtype=np.float64) - chance
+
+    n_subs = len(x)
+    shape = np.shape(x)[1:]
+
+    flat = np.reshape(x, (n_subs, -1))
+    n_cells = np.shape(flat)[1]
+
+    # the observed statistic is the first row, so it is calculated exactly like the permuted ones (ties stay ties)
+    signs = np.concatenate([np.ones([1, n_subs]), signs_cal(n_subs, n_perms=n_perms, seed=seed)])
+
+    p = np.zeros([n_cells], dtype=np.float64)
+
+    step = max(1, BLOCK_SIZE // n_perms)
+
+    for start in range(0, n_cells, step):
+
+        block = flat[:, start:start+step]
+
+        stats = permutation_stats_cal(block, signs, stat=stat)
+
+        p[start:start+step] = pvalues_cal(stats[0], stats[1:], tail=tail)
+
+    return np.reshape(p, shape)
+
+
+' a function for the null distribution of a statistic over blocks of permutations '
+
+def null_cal(func, x, n_perms=1000, n_jobs=1, seed=None, **kwargs):
+
+    """
+    Calculate the null distribution of a statistic (e.g. the largest cluster mass) block of permutations by block
+
+    One [n_perms, n_subs] sign matrix is drawn and cut into blocks of permutations of at most BLOCK_SIZE permuted
+    values, which can be spread across a process pool.
+
+    Parameters
+    ----------
+    func : function
+        A module-level function func([x, signs], (start, stop), **kwargs), returning the statistic of each permutation
+        signs[start:stop] as an array [stop-start].
+    x : array [n_subs, ...]
+        The data of each subject.
+    n_perms : int. Default is 1000.
+        The number of permutations.
+    n_jobs : int or None. Default is 1.
+        The number of worker processes. If n_jobs=None or n_jobs<0, use all CPUs. The results are identical whatever the
+        number of workers is.
+    seed : None or int or numpy.random.Generator. Default is None.
+        The seed of the random number generator.
+    kwargs : other keyword arguments passed to func.
+
+    Returns
+    -------
+    null : array [n_perms]
+        The statistic of each permutation.
+    """
+
+    n_subs = len(x)
+
+    signs = signs_cal(n_subs, n_perms=n_perms, seed=seed)
+
+    # blocks of at most BLOCK_SIZE permuted values, and at least one block for each worker
+    step = max(1, BLOCK_SIZE // max(np.size(x) // n_subs, 1))
+    if n_jobs != 1:
+        step = max(1, min(step, -(-n_perms // n_jobs_cal(n_jobs))))
+
+    units = [(start, min(start + step, n_perms)) for start in range(0, n_perms, step)]
+
+    if n_jobs == 1:
+        results = [func([x, signs], unit, **kwargs) for unit in units]
+    else:
+        results = parallel_cal(func, [x, signs], units, n_jobs=n_jobs, **kwargs)
+
+    return np.concatenate(results) if len(results) > 0 else np.zeros([0])
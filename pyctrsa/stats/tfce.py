@@ -0,0 +1,393 @@
+# -*- coding: utf-8
+
+"""
+@File       :   tfce.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for threshold-free cluster enhancement (TFCE) of time-by-time maps and time courses '
+
+import numpy as np
+from pyctrsa.stats.permutation import permutation_stats_cal, null_cal
+
+
+' a function for getting the neighbours of each cell of a grid '
+
+def neighbours_cal(grid):
+
+    """
+    Get the neighbouring cells (sharing a face) of each cell of a grid
+
+    Parameters
+    ----------
+    grid : tuple
+        The shape of the grid, e.g. (nts, nts) or (nts,).
+
+    Returns
+    -------
+    neighbours : array [n_cells, 2*n_dims]
+        The flat indices of the neighbours of each cell, -1 outside the grid.
+    """
+
+    index = np.arange(int(np.prod(grid))).reshape(grid)
+
+    neighbours = []
+
+    for axis in range(len(grid)):
+        for shift in [-1, 1]:
+            neighbour = np.full(grid, -1, dtype=np.intp)
+            src = [slice(None)] * len(grid)
+            dst = [slice(None)] * len(grid)
+            src[axis] = slice(max(shift, 0), grid[axis] + min(shift, 0))
+            dst[axis] = slice(max(-shift, 0), grid[axis] + min(-shift, 0))
+            neighbour[tuple(dst)] = index[tuple(src)]
+            neighbours.append(neighbour.ravel())
+
+    return np.stack(neighbours, axis=1)
+
+
+' a class for a union-find forest with a score accumulated on each component '
+
+class ScoreForest(object):
+
+    """
+    A union-find forest whose components accumulate a score
+
+    The score of a cell is the sum of acc along its path to the root, so a score can be added to a whole component by
+    adding it to its root only. When a root is hooked under another root, its acc is reduced by the acc of the new root,
+    which keeps the scores of its cells. All operations act on arrays of cells at once.
+
+    Parameters
+    ----------
+    n : int
+        The number of cells.
+    """
+
+    def __init__(self, n):
+
+        self.parent = np.arange(n)
+        self.acc = np.zeros([n], dtype=np.float64)
+        self.size = np.ones([n], dtype=np.float64)
+
+    def find(self, x):
+
+        """
+        Get the roots of cells by pointer jumping (the paths of the cells are compressed)
+
+        Parameters
+        ----------
+        x : array
+            The cells.
+
+        Returns
+        -------
+        roots : array
+            The root of each cell.
+        """
+
+        while True:
+
+            p = self.parent[x]
+            pp = self.parent[p]
+            move = p != pp
+
+            if not np.any(move):
+                return p
+
+            # the parents are read before they are updated, so all cells jump at the same time
+            xm = x[move]
+            pm = p[move]
+            self.acc[xm] = self.acc[xm] + self.acc[pm]
+            self.parent[xm] = pp[move]
+
+    def union(self, u, v):
+
+        """
+        Merge the components of the cells u[i] and v[i]
+
+        Parameters
+        ----------
+        u : array
+        v : array
+            The pairs of cells to connect.
+        """
+
+        while len(u) > 0:
+
+            ru = self.find(u)
+            rv = self.find(v)
+
+            diff = ru != rv
+            u, v, ru, rv = u[diff], v[diff], ru[diff], rv[diff]
+
+            if len(u) == 0:
+                break
+
+            # each root is hooked under the smallest root it meets in this round, so no cycle can form
+            hi, inverse = np.unique(np.maximum(ru, rv), return_inverse=True)
+            lo = np.full(len(hi), len(self.parent), dtype=np.intp)
+            np.minimum.at(lo, inverse, np.minimum(ru, rv))
+
+            size = self.size[hi]
+            self.acc[hi] = self.acc[hi] - self.acc[lo]
+            self.parent[hi] = lo
+
+            np.add.at(self.size, self.find(hi), size)
+
+    def scores(self, x):
+
+        """
+        Get the scores of cells
+
+        Parameters
+        ----------
+        x : array
+            The cells.
+
+        Returns
+        -------
+        scores : array
+            The score of each cell.
+        """
+
+        roots = self.find(x)
+
+        return self.acc[x] + np.where(roots != x, self.acc[roots], 0)
+
+
+' a function for the one-sided TFCE of a batch of maps '
+
+def tfce_onesided_cal(stats, dh, E=0.5, H=2.0):
+
+    """
+    Calculate the TFCE scores of the positive part of a batch of maps
+
+    The cells are sorted once. Going down the thresholds h = k*dh, only the cells entering at each threshold are added
+    to a union-find forest and connected to their active neighbours, and e(h)^E * h^H * dh is added to the root of
+    each component, instead of labelling the whole map at each threshold.
+
+    Parameters
+    ----------
+    stats : array [n_maps, ...]
+        The statistic maps.
+    dh : float
+        The threshold step.
+    E, H : float
+        The extent and height exponents.
+
+    Returns
+    -------
+    scores : array [n_maps, ...]
+        The TFCE scores, sum over h <= stats of e(h)^E * h^H * dh, where e(h) is the number of cells of the component
+        of stats >= h containing the cell.
+    """
+
+    stats = np.asarray(stats, dtype=np.float64)
+
+    grid = np.shape(stats)[1:]
+    n_cells = int(np.prod(grid))
+
+    flat = np.nan_to_num(np.reshape(stats, [-1]), nan=0.0)
+
+    scores = np.zeros(np.shape(flat), dtype=np.float64)
+
+    if len(flat) == 0 or np.max(flat) < dh:
+        return np.reshape(scores, np.shape(stats))
+
+    neighbours = neighbours_cal(grid)
+
+    order = np.argsort(-flat, kind='stable')
+    ascending = -flat[order]
+
+    forest = ScoreForest(len(flat))
+    active = np.zeros(np.shape(flat), dtype=bool)
+    roots = np.zeros([0], dtype=np.intp)
+    start = 0
+
+    for k in range(int(np.max(flat) / dh), 0, -1):
+
+        h = k * dh
+
+        # the cells with stats >= h which are not active yet
+        stop = np.searchsorted(ascending, -h, side='right')
+        new = order[start:stop]
+        start = stop
+
+        if len(new) > 0:
+
+            active[new] = True
+
+            cells = new % n_cells
+            nbs = neighbours[cells]
+            valid = nbs >= 0
+
+            u = np.repeat(new, np.shape(nbs)[1])[valid.ravel()]
+            v = (new - cells)[:, np.newaxis] + nbs
+            v = v[valid]
+
+            connected = active[v]
+            forest.union(u[connected], v[connected])
+
+            roots = np.concatenate([roots, new])
+
+        roots = roots[forest.parent[roots] == roots]
+
+        forest.acc[roots] = forest.acc[roots] + forest.size[roots] ** E * h ** H * dh
+
+    cells = np.flatnonzero(active)
+    scores[cells] = forest.scores(cells)
+
+    return np.reshape(scores, np.shape(stats))
+
+
+' a function for the TFCE of a batch of maps '
+
+def tfce_cal(stats, dh=None, E=0.5, H=2.0, tail=1):
+
+    """
+    Calculate the threshold-free cluster enhancement (TFCE) of a batch of maps
+
+    Parameters
+    ----------
+    stats : array [n_maps, ...]
+        The statistic maps, e.g. t-maps of shape [n_maps, nts, nts] or time courses of shape [n_maps, nts]. The cells
+        sharing a face are neighbours. For one map, use stats[np.newaxis].
+    dh : None or float. Default is None.
+        The threshold step. If dh=None, it is the largest absolute statistic divided by 100.
+    E : float. Default is 0.5.
+        The extent exponent.
+    H : float. Default is 2.0.
+        The height exponent.
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, enhance the positive statistics. If tail=-1, the negative statistics (the scores are negative). If
+        tail=0, both.
+
+    Returns
+    -------
+    scores : array [n_maps, ...]
+        The TFCE scores.
+    """
+
+    stats = np.asarray(stats, dtype=np.float64)
+
+    if tail not in [1, -1, 0]:
+        raise ValueError("tail should be 1, -1 or 0.")
+
+    if dh is None:
+        dh = np.nanmax(np.abs(stats)) / 100 if np.size(stats) > 0 else 1
+
+    if not dh > 0:
+        return np.zeros(np.shape(stats))
+
+    scores = np.zeros(np.shape(stats))
+
+    if tail != -1:
+        scores = scores + tfce_onesided_cal(stats, dh, E=E, H=H)
+
+    if tail != 1:
+        scores = scores - tfce_onesided_cal(-stats, dh, E=E, H=H)
+
+    return scores
+
+
+' a function for the largest TFCE score of each permutation of one work unit '
+
+def tfce_null_unit_cal(arrays, unit, dh=0.1, E=0.5, H=2.0, tail=1, stat='t'):
+
+    """
+    a function to calculate the largest absolute TFCE score of each permutation of one work unit, used by the process
+    pool in tfce_permutation_cal()
+
+    Parameters
+    ----------
+    arrays : list [x, signs]
+        x is the data of shape [n_subs, ...] and signs the sign matrix of shape [n_perms, n_subs].
+    unit : tuple (start, stop)
+        The permutations to calculate.
+    dh, E, H, tail, stat :
+        The same as tfce_permutation_cal().
+
+    Returns
+    -------
+    max_scores : array [stop-start]
+        The largest absolute TFCE score of each permutation.
+    """
+
+    x, signs = arrays
+
+    # [n_perms, ...]
+    stats = permutation_stats_cal(x, signs[unit[0]:unit[1]], stat=stat)
+
+    scores = np.abs(tfce_cal(stats, dh=dh, E=E, H=H, tail=tail))
+
+    return np.max(np.reshape(scores, [len(scores), -1]), axis=1, initial=0)
+
+
+' a function for the TFCE permutation test of time-by-time maps and time courses '
+
+def tfce_permutation_cal(x, chance=0, n_perms=1000, dh=None, E=0.5, H=2.0, tail=1, stat='t', n_jobs=1, seed=None):
+
+    """
+    Conduct a TFCE sign-flip permutation test against the chance level
+
+    The statistic maps of a block of permutations are calculated by one matrix product (see
+    pyctrsa.stats.permutation.permutation_stats_cal) and enhanced together (see tfce_cal), and the largest TFCE score of
+    each permutation forms the null distribution. The blocks of permutations can be spread across a process pool.
+
+    Parameters
+    ----------
+    x : array [n_subs, ...]
+        The results of each subject, e.g. the similarities (r-values) of shape [n_subs, nts, nts], or the diagonal of
+        shape [n_subs, nts].
+    chance : float or array. Default is 0.
+        The chance level, broadcastable to x.
+    n_perms : int. Default is 1000.
+        The number of permutations.
+    dh : None or float. Default is None.
+        The threshold step. If dh=None, it is the largest absolute observed statistic divided by 100. The same step is
+        used for all permutations.
+    E : float. Default is 0.5.
+        The extent exponent.
+    H : float. Default is 2.0.
+        The height exponent.
+    tail : int 1 or -1 or 0. Default is 1.
+        If tail=1, test x > chance. If tail=-1, test x < chance. If tail=0, a two-sided test.
+    stat : string 't' or 'mean'. Default is 't'.
+        The group statistic (see pyctrsa.stats.permutation.permutation_stats_cal).
+    n_jobs : int or None. Default is 1.
+        The number of worker processes. If n_jobs=None or n_jobs<0, use all CPUs. The results are identical whatever the
+        number of workers is.
+    seed : None or int or numpy.random.Generator. Default is None.
+        The seed of the random number generator. The same seed gives the same p-values.
+
+    Returns
+    -------
+    scores : array [...]
+        The observed TFCE scores.
+    ps : array [...]
+        The corrected p-value of each cell: (1 + the number of permutations whose largest absolute TFCE score is at
+        least its absolute score) / (1 + n_perms).
+    """
+
+    x = np.asarray(x, dtype=np.float64) - chance
+
+    n_subs = len(x)
+
+    stats = permutation_stats_cal(x, np.ones([1, n_subs]), stat=stat)
+
+    if dh is None:
+        dh = np.nanmax(np.abs(stats)) / 100
+
+    scores = tfce_cal(stats, dh=dh, E=E, H=H, tail=tail)[0]
+
+    # the null distribution of the largest TFCE score
+    null = null_cal(tfce_null_unit_cal, x, n_perms=n_perms, n_jobs=n_jobs, seed=seed, dh=dh, E=E, H=H, tail=tail,
+                    stat=stat)
+
+    # scores equal up to rounding (e.g. of the permutation without any flip) count as ties
+    counts = n_perms - np.searchsorted(np.sort(null), np.abs(scores) * (1 - 1e-12), side='left')
+    ps = (counts + 1) / (n_perms + 1)
+
+    return scores, ps
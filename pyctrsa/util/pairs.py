@@ -0,0 +1,344 @@
+# -*- coding: utf-8
+
+"""
+@File       :   pairs.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for selecting time pairs of the time-by-time grid and storing values only for them '
+
+import numpy as np
+
+
+' a function for getting the time pairs (t1, t2) of a selection '
+
+def time_pairs_cal(time_pairs, nts):
+
+    """
+    Get the time pairs (t1, t2) of a selection of the nts x nts time-by-time grid
+
+    Parameters
+    ----------
+    time_pairs : tuple
+        The selection of time pairs.
+        If time_pairs=('band', k), select the band |t1-t2| <= k around the diagonal.
+        If time_pairs=('rectangle', rows, cols), select all t1 in rows against all t2 in cols (e.g. training
+        time-windows against testing time-windows). rows and cols can be slices, ranges or lists of indices.
+        If time_pairs=(t1, t2), select the pairs (t1[i], t2[i]) given by two lists of indices of the same length.
+    nts : int
+        The number of time-windows.
+
+    Returns
+    -------
+    t1 : array [n_pairs]
+    t2 : array [n_pairs]
+        The time pairs, sorted by t1 then t2, without duplicates.
+    """
+
+    if len(time_pairs) > 0 and isinstance(time_pairs[0], str):
+
+        if time_pairs[0] == 'band':
+
+            k = int(time_pairs[1])
+
+            if k < 0:
+                raise ValueError("The width of the band should be >= 0.")
+
+            # one diagonal t2 = t1+d at a time, so the cost scales with the number of pairs
+            diagonals = range(-min(k, nts - 1), min(k, nts - 1) + 1)
+            t1 = np.concatenate([np.arange(max(0, -d), min(nts, nts - d)) for d in diagonals])
+            t2 = np.concatenate([np.arange(max(0, -d), min(nts, nts - d)) + d for d in diagonals])
+
+        elif time_pairs[0] == 'rectangle':
+
+            rows = np.arange(nts)[index_cal(time_pairs[1])]
+            cols = np.arange(nts)[index_cal(time_pairs[2])]
+
+            t1 = np.repeat(rows, len(cols))
+            t2 = np.tile(cols, len(rows))
+
+        else:
+            raise ValueError("time_pairs should be ('band', k), ('rectangle', rows, cols) or (t1, t2).")
+
+    else:
+
+        if len(time_pairs) != 2 or np.shape(time_pairs[0]) != np.shape(time_pairs[1]):
+            raise ValueError("time_pairs should be ('band', k), ('rectangle', rows, cols) or (t1, t2).")
+
+        t1 = np.ravel(np.asarray(time_pairs[0], dtype=np.intp))
+        t2 = np.ravel(np.asarray(time_pairs[1], dtype=np.intp))
+
+        if np.any((t1 < -nts) | (t1 >= nts) | (t2 < -nts) | (t2 >= nts)):
+            raise IndexError("The time pairs should be in the range of the " + str(nts) + " time-windows.")
+
+        t1 = t1 % nts
+        t2 = t2 % nts
+
+    keys = np.unique(np.asarray(t1, dtype=np.intp) * nts + np.asarray(t2, dtype=np.intp))
+
+    return keys // nts, keys % nts
+
+
+' a function for getting the selection of time pairs of the diagonal_only option '
+
+def diagonal_pairs_cal(time_pairs=None, diagonal_only=False):
+
+    """
+    Get the selection of time pairs from the time_pairs and diagonal_only options of the compute functions
+
+    Parameters
+    ----------
+    time_pairs : None or tuple. Default is None.
+        The selection of time pairs (see time_pairs_cal).
+    diagonal_only : bool True or False. Default is False.
+        Only select the time pairs t1 == t2 or not.
+
+    Returns
+    -------
+    time_pairs : None or tuple
+        ('band', 0) if diagonal_only=True, otherwise time_pairs.
+    """
+
+    if not diagonal_only:
+        return time_pairs
+
+    if time_pairs is not None:
+        raise ValueError("diagonal_only=True cannot be combined with time_pairs.")
+
+    return ('band', 0)
+
+
+' a function for getting the values on the diagonal t1 == t2 '
+
+def diagonal_cal(array, n_tail=0):
+
+    """
+    Get the values of the time pairs t1 == t2 from a dense array, a SymmetricCTRDMs or a TimePairArray
+
+    Parameters
+    ----------
+    array : array or SymmetricCTRDMs or TimePairArray [..., nts, nts, ...]
+        The values on the time-by-time grid, followed by n_tail axes. For a TimePairArray, its own n_tail is used.
+    n_tail : int. Default is 0.
+        The number of axes after the time-by-time axes.
+
+    Returns
+    -------
+    values : array [..., nts, ...]
+        The values on the diagonal, with NaN for the time pairs t1 == t2 which are not stored in a TimePairArray.
+    """
+
+    if isinstance(array, TimePairArray):
+
+        n_tail = array.n_tail
+        index = array.pair_index(np.arange(array.nts), np.arange(array.nts))
+
+        values = np.asarray(array.values)[(Ellipsis, np.maximum(index, 0)) + (slice(None),) * n_tail]
+        values = values.astype(np.result_type(values.dtype, np.float32))
+        values[(Ellipsis, index < 0) + (slice(None),) * n_tail] = np.nan
+
+        return values
+
+    nts = np.shape(array)[len(np.shape(array)) - n_tail - 1]
+
+    return np.asarray(array[(Ellipsis, np.arange(nts), np.arange(nts)) + (slice(None),) * n_tail])
+
+
+' a function for getting the values of selected time pairs '
+
+def pair_values_cal(array, time_pairs=None, n_tail=2):
+
+    """
+    Get the values of a selection of time pairs from a dense array, a SymmetricCTRDMs or a TimePairArray
+
+    Only the values of the selected time pairs are read, so it also works on disk-backed arrays.
+
+    Parameters
+    ----------
+    array : array or SymmetricCTRDMs or TimePairArray [..., nts, nts, ...]
+        The values on the time-by-time grid, followed by n_tail axes.
+    time_pairs : None or tuple. Default is None.
+        The selection of time pairs (see time_pairs_cal). If array is a TimePairArray, time_pairs=None selects all its
+        time pairs, otherwise time_pairs should only select time pairs stored in it.
+    n_tail : int. Default is 2.
+        The number of axes after the time-by-time axes (e.g. 2 for [n_conditions, n_conditions]).
+
+    Returns
+    -------
+    values : array [..., n_pairs, ...]
+        The values of the selected time pairs.
+    t1 : array [n_pairs]
+    t2 : array [n_pairs]
+        The time pairs.
+    nts : int
+        The number of time-windows.
+    """
+
+    tail = (slice(None),) * n_tail
+
+    if isinstance(array, TimePairArray):
+
+        if time_pairs is None:
+            return array.values, array.t1, array.t2, array.nts
+
+        t1, t2 = time_pairs_cal(time_pairs, array.nts)
+        index = array.pair_index(t1, t2)
+
+        if np.any(index < 0):
+            raise ValueError("time_pairs should only select the time pairs stored in the TimePairArray.")
+
+        return np.asarray(array.values)[(Ellipsis, index) + tail], t1, t2, array.nts
+
+    if time_pairs is None:
+        raise ValueError("time_pairs should be given for a dense array.")
+
+    nts = np.shape(array)[len(np.shape(array)) - n_tail - 1]
+
+    t1, t2 = time_pairs_cal(time_pairs, nts)
+
+    return array[(Ellipsis, t1, t2) + tail], t1, t2, nts
+
+
+' a function for turning a selection of time-windows into an index '
+
+def index_cal(selection):
+
+    """
+    Turn a selection of time-windows into an index of np.arange(nts)
+
+    Parameters
+    ----------
+    selection : slice or range or int or list of ints
+
+    Returns
+    -------
+    index : slice or array
+    """
+
+    if isinstance(selection, slice):
+        return selection
+
+    return np.atleast_1d(np.asarray(selection, dtype=np.intp))
+
+
+' a class for storing values only for selected time pairs '
+
+class TimePairArray(object):
+
+    """
+    Values (e.g. CTRDMs or CTSimilarities) stored only for a selection of time pairs of the time-by-time grid
+
+    The time-by-time axes [nts, nts] of the dense array are replaced by one axis of the selected pairs, so the memory
+    scales with the number of pairs instead of nts*nts.
+
+    Parameters
+    ----------
+    values : array [..., n_pairs, ...]
+        The values of the time pairs. The pair axis is followed by n_tail axes (e.g. [n_conditions, n_conditions] for
+        CTRDMs or [2] for r-values and p-values). It can also be a disk-backed array (np.memmap or h5py.Dataset).
+    t1 : array [n_pairs]
+    t2 : array [n_pairs]
+        The time pairs (see time_pairs_cal).
+    nts : int
+        The number of time-windows.
+    n_tail : int. Default is 0.
+        The number of axes after the pair axis.
+
+    Notes
+    -----
+    values[..., i, ...] is the value of the time pair (t1[i], t2[i]). np.asarray() or to_dense() gives the dense array
+    of shape [..., nts, nts, ...] with NaN for the time pairs which are not selected.
+    """
+
+    def __init__(self, values, t1, t2, nts, n_tail=0):
+
+        # keep disk-backed arrays (np.memmap, h5py.Dataset) as they are
+        if not hasattr(values, 'shape'):
+            values = np.asarray(values)
+
+        t1 = np.asarray(t1, dtype=np.intp)
+        t2 = np.asarray(t2, dtype=np.intp)
+
+        if len(t1) != len(t2) or np.shape(values)[len(np.shape(values)) - n_tail - 1] != len(t1):
+            raise ValueError("The pair axis of values should have one value for each time pair.")
+
+        self.values = values
+        self.t1 = t1
+        self.t2 = t2
+        self.nts = nts
+        self.n_tail = n_tail
+
+    @property
+    def shape(self):
+        nb = len(self.values.shape) - self.n_tail - 1
+        return self.values.shape[:nb] + (self.nts, self.nts) + self.values.shape[nb+1:]
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        if dtype is not None:
+            dense = dense.astype(dtype)
+        return dense
+
+    def pair_index(self, t1, t2):
+
+        """
+        Get the positions of time pairs on the pair axis
+
+        Parameters
+        ----------
+        t1 : int or array
+        t2 : int or array
+
+        Returns
+        -------
+        index : int or array
+            The position of each time pair (t1, t2) on the pair axis, or -1 if it is not selected.
+        """
+
+        keys = self.t1 * self.nts + self.t2
+        order = np.argsort(keys, kind='mergesort')
+
+        query = np.asarray(t1) % self.nts * self.nts + np.asarray(t2) % self.nts
+
+        if len(keys) == 0:
+            return np.full(np.shape(query), -1, dtype=np.intp)[()]
+
+        pos = np.minimum(np.searchsorted(keys[order], query), len(keys) - 1)
+
+        return np.where(keys[order][pos] == query, order[pos], -1)
+
+    def to_dense(self, fill_value=np.nan):
+
+        """
+        Get the dense array
+
+        Parameters
+        ----------
+        fill_value : float. Default is np.nan.
+            The value of the time pairs which are not selected.
+
+        Returns
+        -------
+        dense : array [..., nts, nts, ...]
+            The values on the whole time-by-time grid.
+        """
+
+        values = np.asarray(self.values)
+
+        dense = np.full(self.shape, fill_value, dtype=np.result_type(values.dtype, np.float32))
+        dense[(Ellipsis, self.t1, self.t2) + (slice(None),) * self.n_tail] = values
+
+        return dense
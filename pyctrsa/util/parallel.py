@@ -0,0 +1,150 @@
+# -*- coding: utf-8
+
+"""
+@File       :   parallel.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for running independent work units in a process pool with the input data in shared memory '
+
+import os
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+# the shared input arrays attached in a worker process
+worker_arrays = []
+worker_shms = []
+
+
+' a function for getting the number of worker processes '
+
+def n_jobs_cal(n_jobs=-1):
+
+    """
+    Get the number of worker processes
+
+    Parameters
+    ----------
+    n_jobs : int or None. Default is -1.
+        The number of worker processes. If n_jobs=None or n_jobs<0, use all CPUs.
+
+    Returns
+    -------
+    n_jobs : int
+        The number of worker processes.
+    """
+
+    if n_jobs is None or n_jobs < 0:
+        return os.cpu_count() or 1
+
+    return max(int(n_jobs), 1)
+
+
+' a function for attaching the shared input arrays in a worker process '
+
+def attach_shared(specs):
+
+    for name, shape, dtype in specs:
+        shm = shared_memory.SharedMemory(name=name)
+        worker_shms.append(shm)
+        worker_arrays.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+
+
+' a function for running one work unit in a worker process '
+
+def run_unit(func, unit, kwargs):
+
+    return func(worker_arrays, unit, **kwargs)
+
+
+' a function for running work units in a process pool '
+
+def parallel_cal(func, arrays, units, n_jobs=-1, **kwargs):
+
+    """
+    Run independent work units in a process pool
+
+    The input arrays are copied once into shared memory and the workers read them from there, so they are never
+    pickled to the workers.
+
+    Parameters
+    ----------
+    func : function
+        A module-level function func(arrays, unit, **kwargs). arrays is the list of the shared input arrays.
+    arrays : list of arrays
+        The input arrays.
+    units : list
+        The work units, e.g. a list of (sub, chl).
+    n_jobs : int or None. Default is -1.
+        The number of worker processes. If n_jobs=None or n_jobs<0, use all CPUs.
+    kwargs : other keyword arguments passed to func.
+
+    Returns
+    -------
+    results : list
+        The results of func for each unit, in the order of units.
+    """
+
+    return [result for unit, result in parallel_imap(func, arrays, units, n_jobs=n_jobs, **kwargs)]
+
+
+' a function for iterating over the results of work units run in a process pool '
+
+def parallel_imap(func, arrays, units, n_jobs=-1, **kwargs):
+
+    """
+    Run independent work units in a process pool and yield the results one by one
+
+    At most 2*n_jobs units are in flight at the same time, so only a bounded number of results is held in memory.
+
+    Parameters
+    ----------
+    The same as parallel_cal().
+
+    Yields
+    ------
+    unit, result : the work unit and the result of func for it, in the order of units.
+    """
+
+    n_jobs = n_jobs_cal(n_jobs)
+
+    shms = []
+    specs = []
+
+    try:
+
+        for array in arrays:
+            array = np.asarray(array)
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            shms.append(shm)
+            shared = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+            shared[...] = array
+            del shared
+            specs.append((shm.name, array.shape, array.dtype.str))
+
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=attach_shared, initargs=(specs,)) as executor:
+
+            units = list(units)
+            futures = deque()
+            index = 0
+
+            while index < len(units) or futures:
+
+                while index < len(units) and len(futures) < 2 * n_jobs:
+                    futures.append((units[index], executor.submit(run_unit, func, units[index], kwargs)))
+                    index = index + 1
+
+                unit, future = futures.popleft()
+
+                yield unit, future.result()
+
+    finally:
+
+        for shm in shms:
+            shm.close()
+            shm.unlink()
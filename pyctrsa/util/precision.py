@@ -0,0 +1,57 @@
+# -*- coding: utf-8
+
+"""
+@File       :   precision.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for choosing the floating-point precision of the calculations '
+
+import numpy as np
+
+
+# tensors with at least this many values are calculated in float32 by default
+LARGE_SIZE = 2 ** 24
+
+
+' a function for getting the floating-point dtype of a calculation '
+
+def dtype_cal(dtype=None, size=0, like=None):
+
+    """
+    Get the floating-point dtype of a calculation
+
+    Parameters
+    ----------
+    dtype : None or numpy floating dtype. Default is None.
+        The requested dtype. If dtype is not None, it is returned (as a np.dtype).
+    size : int. Default is 0.
+        The number of values of the largest tensor in the calculation.
+        If dtype=None and size >= LARGE_SIZE (2**24), float32 is used.
+    like : None or numpy dtype. Default is None.
+        The dtype of the input. If dtype=None and the input is float32 (or float16), float32 is used.
+
+    Returns
+    -------
+    dtype : np.dtype
+        np.float32 or np.float64 if dtype=None, otherwise the requested dtype.
+    """
+
+    if dtype is not None:
+
+        dtype = np.dtype(dtype)
+
+        if dtype.kind != 'f':
+            raise ValueError("dtype should be a floating-point type, e.g. np.float32 or np.float64.")
+
+        return dtype
+
+    if like is not None and np.dtype(like).kind == 'f' and np.dtype(like).itemsize <= 4:
+        return np.dtype(np.float32)
+
+    if size >= LARGE_SIZE:
+        return np.dtype(np.float32)
+
+    return np.dtype(np.float64)
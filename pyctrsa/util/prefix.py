@@ -0,0 +1,422 @@
+# -*- coding: utf-8
+
+"""
+@File       :   prefix.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for calculating the statistics of overlapping time-windows by prefix sums '
+
+import numpy as np
+from math import gcd
+from pyctrsa.util.windows import nts_cal
+
+
+# the number of values of the similarities calculated at a time
+ROW_SIZE = 2 ** 16
+
+
+' a function for calculating the cumulative sums of time series '
+
+def cumsum_cal(data):
+
+    """
+    Calculate the cumulative sums of the data along the last axis, starting from 0
+
+    Parameters
+    ----------
+    data : array [..., n_ts]
+        The data. The time-points must be on the last axis.
+
+    Returns
+    -------
+    cum : array [..., n_ts+1]
+        cum[..., i] = np.sum(data[..., :i]), in float64.
+    """
+
+    data = np.asarray(data, dtype=np.float64)
+
+    cum = np.zeros(np.shape(data)[:-1] + (np.shape(data)[-1] + 1,), dtype=np.float64)
+    np.cumsum(data, axis=-1, out=cum[..., 1:])
+
+    return cum
+
+
+' a function for calculating the sums of all time-windows by prefix sums '
+
+def window_sums(data, time_win=10, time_step=5):
+
+    """
+    Calculate the sum of the values of each time-window from the cumulative sums of the data
+
+    Each window sum is the difference of two cumulative sums, so the cost does not depend on time_win.
+
+    Parameters
+    ----------
+    data : array [..., n_ts]
+        The data. The time-points must be on the last axis.
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+
+    Returns
+    -------
+    sums : array [..., int((n_ts-time_win)/time_step)+1]
+        sums[..., t] = np.sum(data[..., t*time_step:t*time_step+time_win]), in float64.
+    """
+
+    nts = nts_cal(np.shape(data)[-1], time_win, time_step)
+
+    cum = cumsum_cal(data)
+
+    starts = np.arange(nts) * time_step
+
+    return cum[..., starts + time_win] - cum[..., starts]
+
+
+' a function for calculating the 2-D prefix sums of the cross-products of two groups of time series '
+
+def prefix_cross_cal(x, y, block=1):
+
+    """
+    Calculate the prefix sums along the diagonals of the cross-products of the blocks of two groups of time series
+
+    The time series are cut into blocks of block time-points. The cross-products of the blocks u1 and u2 are
+    accumulated along the diagonals (2-D prefix sums of the lagged cross-products), so the cross-product of a pair of
+    time-windows made of whole blocks is the difference of two prefix sums (see cross_sums). Each row of blocks is one
+    matrix product with an inner size of block (times the number of channels K) instead of time_win (times K), added
+    to the previous row.
+
+    Parameters
+    ----------
+    x : array [..., A, K, n_ts]
+        The group 1 of A time series of K channels.
+    y : array [..., B, K, n_ts]
+        The group 2 of B time series of K channels. The leading shapes of x and y are broadcast against each other.
+    block : int. Default is 1.
+        The number of time-points in each block. The time-points after the last whole block are ignored.
+
+    Returns
+    -------
+    prefix : array [..., n_blocks, A, n_blocks, B]
+        prefix[..., u1, a, u2, b] is the sum over k >= 0 of the cross-products of the block u1-k of x[..., a, :, :] and
+        the block u2-k of y[..., b, :, :], in float64, with n_blocks = int(n_ts/block). It is about as large as the
+        similarities of all pairs of time-windows when time_step=block.
+    """
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    n_a, n_k, n_ts = np.shape(x)[-3:]
+    n_b = np.shape(y)[-3]
+
+    n_u = n_ts // block
+
+    # [..., U, A, K*block] and [..., K*block, U*B]
+    bx = np.moveaxis(np.reshape(x[..., :n_u*block], np.shape(x)[:-1] + (n_u, block)), -2, -4)
+    bx = np.reshape(bx, np.shape(bx)[:-2] + (n_k * block,))
+    by = np.moveaxis(np.reshape(y[..., :n_u*block], np.shape(y)[:-1] + (n_u, block)), -2, -4)
+    by = np.swapaxes(np.reshape(by, np.shape(by)[:-4] + (n_u * n_b, n_k * block)), -1, -2)
+
+    lead = np.broadcast_shapes(np.shape(x)[:-3], np.shape(y)[:-3])
+
+    prefix = np.empty(lead + (n_u, n_a, n_u * n_b), dtype=np.float64)
+    blocks = np.reshape(prefix, lead + (n_u, n_a, n_u, n_b))
+
+    for u in range(n_u):
+
+        np.matmul(bx[..., u, :, :], by, out=prefix[..., u, :, :])
+
+        if u > 0:
+            blocks[..., u, :, 1:, :] += blocks[..., u-1, :, :-1, :]
+
+    return blocks
+
+
+' a function for calculating the cross-products of pairs of time-windows from the 2-D prefix sums '
+
+def cross_sums(prefix, time_win=10, time_step=5, block=None, start=0, stop=None, col_start=0, out=None):
+
+    """
+    Calculate the sum of the products of the values of each pair of time-windows from the 2-D prefix sums
+
+    Parameters
+    ----------
+    prefix : array [..., n_blocks, A, n_blocks, B]
+        The 2-D prefix sums of the cross-products of the blocks of x and y, from prefix_cross_cal().
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+    block : None or int. Default is None.
+        The number of time-points in each block of prefix. It must divide time_win and time_step. If block=None, it
+        is gcd(time_win, time_step).
+    start : int. Default is 0.
+        The first time-window of x.
+    stop : None or int. Default is None.
+        The time-window of x to stop at. If stop=None, calculate until the last time-window.
+    col_start : int. Default is 0.
+        The first time-window of y.
+    out : None or array [..., stop-start, nts-col_start, A, B]. Default is None.
+        Where to write the sums. If out=None, a new float64 array is returned.
+
+    Returns
+    -------
+    sums : array [..., stop-start, nts-col_start, A, B]
+        sums[..., t1-start, t2-col_start, a, b] = np.sum(x[..., a, :, t1*time_step:t1*time_step+time_win] *
+        y[..., b, :, t2*time_step:t2*time_step+time_win]), with nts = int((n_ts-time_win)/time_step)+1.
+    """
+
+    if block is None:
+        block = gcd(time_win, time_step)
+
+    if time_win % block != 0 or time_step % block != 0:
+        raise ValueError("block should divide time_win and time_step.")
+
+    # each time-window is m blocks, starting every s blocks
+    m = time_win // block
+    s = time_step // block
+
+    n_u = np.shape(prefix)[-2]
+    nts = (n_u - m) // s + 1
+
+    if stop is None:
+        stop = nts
+
+    if out is None:
+        out = np.empty(np.shape(prefix)[:-4] + (stop - start, nts - col_start) + np.shape(prefix)[-3:-2] +
+                       np.shape(prefix)[-1:], dtype=np.float64)
+
+    # the prefix sums at the last blocks of the time-windows: [..., stop-start, nts-col_start, A, B]
+    ends = np.swapaxes(prefix[..., start*s+m-1:(stop-1)*s+m:s, :, col_start*s+m-1:(nts-1)*s+m:s, :], -3, -2)
+
+    # minus the prefix sums before their first blocks (none for the first time-windows)
+    first = max(start, 1)
+    first_col = max(col_start, 1)
+    c = first_col - col_start
+
+    if first < stop and first_col < nts:
+        before = np.swapaxes(prefix[..., first*s-1:(stop-1)*s:s, :, first_col*s-1:(nts-1)*s:s, :], -3, -2)
+        np.subtract(ends[..., first-start:, c:, :, :], before, out=out[..., first-start:, c:, :, :])
+        out[..., :first-start, :, :, :] = ends[..., :first-start, :, :, :]
+        out[..., first-start:, :c, :, :] = ends[..., first-start:, :c, :, :]
+    else:
+        out[...] = ends
+
+    return out
+
+
+' a class for the prefix sums of two groups of time series, shared by time-windows of different sizes '
+
+class PrefixSums(object):
+
+    """
+    The cumulative sums (of the values and the squares) and the 2-D prefix sums of the cross-products of two groups of
+    time series
+
+    They are calculated once and shared by the time-windows of any time_win and time_step that are multiples of block,
+    so a sweep over several (time_win, time_step) only pays the windowing and the matrix products once.
+
+    Parameters
+    ----------
+    x : array [..., A, K, n_ts]
+        The group 1 of A time series of K channels. The windows of the K channels form one feature vector.
+    y : array [..., B, K, n_ts]
+        The group 2 of B time series of K channels. The leading shapes of x and y are broadcast against each other.
+    block : int. Default is 1.
+        The number of time-points in each block (see prefix_cross_cal). It must divide all time_win and time_step.
+    center : bool True or False. Default is False.
+        Shift each group of K series by its mean or not. It does not change the Pearson Correlations but keeps the sums
+        small, and it is only allowed for the Pearson Correlations.
+
+    Notes
+    -----
+    The prefix sums of the cross-products take about n_blocks*A*n_blocks*B float64 values.
+    """
+
+    def __init__(self, x, y, block=1, center=False):
+
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+
+        if center:
+            x = x - np.mean(x, axis=(-2, -1), keepdims=True)
+            y = y - np.mean(y, axis=(-2, -1), keepdims=True)
+
+        self.block = block
+        self.center = center
+        self.n_channels = np.shape(x)[-2]
+
+        # the cumulative sums over the time-points and the channels: [..., A, n_ts+1] & [..., B, n_ts+1]
+        self.cx, self.cxx, self.cy, self.cyy = [cumsum_cal(np.sum(v, axis=-2)) for v in [x, x ** 2, y, y ** 2]]
+
+        self.prefix = prefix_cross_cal(x, y, block=block)
+
+    def similarities(self, time_win=10, time_step=5, method='pearson', upper=False):
+
+        """
+        Calculate the similarities between each time-window of x and each time-window of y
+
+        Parameters
+        ----------
+        time_win : int. Default is 10.
+            The number of time-points in each time-window. It must be a multiple of block.
+        time_step : int. Default is 5.
+            The time step size between two neighbouring time-windows. It must be a multiple of block.
+        method : string 'pearson' or 'similarity' or 'distance'. Default is 'pearson'.
+            Calculate the Pearson Correlations, the Cosine Similarities (0.5+0.5*cos) or the Euclidean Distances.
+        upper : bool True or False. Default is False.
+            Only calculate the pairs of time-windows t1 <= t2 or not.
+
+        Returns
+        -------
+        similarities : array [..., nts, nts, A, B] or [..., nts*(nts+1)/2, A, B]
+            similarities[..., t1, t2, a, b] compares the window t1 of x[..., a, :, :] with the window t2 of
+            y[..., b, :, :], with nts = int((n_ts-time_win)/time_step)+1. If upper=True, the time pairs t1 <= t2 in the
+            order of np.triu_indices(nts).
+        """
+
+        if method != 'pearson' and method != 'similarity' and method != 'distance':
+            raise ValueError("method should be 'pearson', 'similarity' or 'distance'.")
+
+        if self.center and method != 'pearson':
+            raise ValueError("The centered prefix sums only give the Pearson Correlations.")
+
+        n_features = time_win * self.n_channels
+
+        nts = nts_cal(np.shape(self.prefix)[-2] * self.block, time_win, time_step)
+        starts = np.arange(nts) * time_step
+
+        # the window sums (and sums of squares) of x: [..., nts, 1, A, 1] and of y: [..., 1, nts, 1, B]
+        sx, sxx = [np.swapaxes(c[..., starts + time_win] - c[..., starts], -1, -2)[..., :, np.newaxis, :, np.newaxis]
+                   for c in [self.cx, self.cxx]]
+        sy, syy = [np.swapaxes(c[..., starts + time_win] - c[..., starts], -1, -2)[..., np.newaxis, :, np.newaxis, :]
+                   for c in [self.cy, self.cyy]]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            if method == 'pearson':
+
+                # windows whose variance is only rounding errors are constant
+                vx = sxx - sx ** 2 / n_features
+                vy = syy - sy ** 2 / n_features
+                sx = sx / n_features
+                ix = np.where(vx > 1e-12 * sxx, 1 / np.sqrt(vx), np.nan)
+                iy = np.where(vy > 1e-12 * syy, 1 / np.sqrt(vy), np.nan)
+
+            if method == 'similarity':
+
+                ix = np.where(sxx > 0, 0.5 / np.sqrt(sxx), np.nan)
+                iy = np.where(syy > 0, 1 / np.sqrt(syy), np.nan)
+
+        shape = np.shape(self.prefix)
+
+        if upper:
+            similarities = np.empty(shape[:-4] + (nts*(nts+1)//2,) + shape[-3:-2] + shape[-1:], dtype=np.float64)
+        else:
+            similarities = np.empty(shape[:-4] + (nts, nts) + shape[-3:-2] + shape[-1:], dtype=np.float64)
+
+        # a few rows of time-windows of x at a time, so the temporary arrays stay in the cache
+        n_rows = max(1, ROW_SIZE // (nts * shape[-3] * shape[-1]))
+
+        for start in range(0, nts, n_rows):
+
+            stop = min(start + n_rows, nts)
+            rows = slice(start, stop)
+
+            if upper:
+
+                # only the time-windows t2 >= start of y
+                cols = slice(start, nts)
+                r = cross_sums(self.prefix, time_win, time_step, block=self.block, start=start, stop=stop,
+                               col_start=start)
+
+            else:
+
+                cols = slice(None)
+                r = cross_sums(self.prefix, time_win, time_step, block=self.block, start=start, stop=stop,
+                               out=similarities[..., rows, :, :, :])
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+
+                if method == 'pearson':
+
+                    r -= sx[..., rows, :, :, :] * sy[..., cols, :, :]
+                    r *= ix[..., rows, :, :, :]
+                    r *= iy[..., cols, :, :]
+                    np.clip(r, -1, 1, out=r)
+
+                if method == 'similarity':
+
+                    r *= ix[..., rows, :, :, :]
+                    r *= iy[..., cols, :, :]
+                    r += 0.5
+
+                if method == 'distance':
+
+                    r *= -2
+                    r += sxx[..., rows, :, :, :]
+                    r += syy[..., cols, :, :]
+                    np.maximum(r, 0, out=r)
+                    np.sqrt(r, out=r)
+
+            if upper:
+
+                # the time pairs t1 <= t2 of the rows are consecutive in the order of np.triu_indices(nts)
+                i, j = np.triu_indices(stop - start, m=nts - start)
+                offset = start * nts - start * (start - 1) // 2
+                similarities[..., offset:offset+len(i), :, :] = r[..., i, j, :, :]
+
+        return similarities
+
+
+' a function for calculating the similarities between all pairs of time-windows by prefix sums '
+
+def prefix_similarities_cal(x, y, time_win=10, time_step=5, method='pearson'):
+
+    """
+    Calculate the similarities between each time-window of x and each time-window of y from prefix sums
+
+    The window sums and sums of squares are derived from cumulative sums in O(1) per window and the cross-products of
+    all pairs of windows from 2-D prefix sums (see prefix_cross_cal), which pays off for large time_win and small
+    time_step. The similarities are calculated for a few rows of time-windows at a time.
+
+    Parameters
+    ----------
+    x : array [..., A, K, n_ts]
+        The group 1 of A time series of K channels. The windows of the K channels form one feature vector.
+    y : array [..., B, K, n_ts]
+        The group 2 of B time series of K channels. The leading shapes of x and y are broadcast against each other.
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+    method : string 'pearson' or 'similarity' or 'distance'. Default is 'pearson'.
+        Calculate the Pearson Correlations, the Cosine Similarities (0.5+0.5*cos) or the Euclidean Distances.
+
+    Returns
+    -------
+    similarities : array [..., nts, nts, A, B]
+        similarities[..., t1, t2, a, b] compares the window t1 of x[..., a, :, :] with the window t2 of
+        y[..., b, :, :].
+
+    Notes
+    -----
+    The differences of prefix sums lose a few digits compared with summing each window, so the results agree with the
+    window-by-window calculation to about 1e-10 rather than bitwise. Each group of K series is shifted by its mean
+    before the Pearson Correlations, which does not change them but keeps the sums small. Constant windows give NaN
+    Pearson Correlations and all-zero windows give NaN Cosine Similarities.
+    """
+
+    n_ts = np.shape(x)[-1]
+
+    # only the time-points covered by the time-windows
+    n_covered = (nts_cal(n_ts, time_win, time_step) - 1) * time_step + time_win
+
+    sums = PrefixSums(np.asarray(x)[..., :n_covered], np.asarray(y)[..., :n_covered], block=gcd(time_win, time_step),
+                      center=(method == 'pearson'))
+
+    return sums.similarities(time_win, time_step, method=method)
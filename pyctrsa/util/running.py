@@ -0,0 +1,87 @@
+# -*- coding: utf-8
+
+"""
+@File       :   running.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for averaging results subject by subject without keeping all of them '
+
+import numpy as np
+
+
+' a class for the running mean (and variance) of arrays '
+
+class RunningStats(object):
+
+    """
+    The running mean (and variance) of arrays of the same shape, updated one array at a time (Welford's algorithm)
+
+    Parameters
+    ----------
+    var : bool True or False. Default is False.
+        Also keep the running variance or not.
+
+    Notes
+    -----
+    The mean and the sum of squared deviations are accumulated in float64. Only these (and one temporary array) are
+    kept in memory, whatever the number of added arrays is.
+    """
+
+    def __init__(self, var=False):
+
+        self.n = 0
+        self.mean = None
+        self.m2 = None
+        self.var_opt = var
+
+    def add(self, x):
+
+        """
+        Add one array
+
+        Parameters
+        ----------
+        x : array
+            The array. It must have the same shape as the arrays added before.
+        """
+
+        x = np.asarray(x, dtype=np.float64)
+
+        self.n = self.n + 1
+
+        if self.mean is None:
+            self.mean = np.array(x, dtype=np.float64)
+            if self.var_opt:
+                self.m2 = np.zeros_like(self.mean)
+            return
+
+        delta = x - self.mean
+        self.mean += delta / self.n
+
+        if self.var_opt:
+            self.m2 += delta * (x - self.mean)
+
+    def var(self, ddof=1):
+
+        """
+        Get the variance
+
+        Parameters
+        ----------
+        ddof : int. Default is 1.
+            The delta degrees of freedom. The divisor is n-ddof.
+
+        Returns
+        -------
+        var : array
+            The variance of the added arrays.
+        """
+
+        if not self.var_opt:
+            raise ValueError("The running variance is not kept. Use RunningStats(var=True).")
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.m2 / (self.n - ddof)
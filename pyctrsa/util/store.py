@@ -0,0 +1,143 @@
+# -*- coding: utf-8
+
+"""
+@File       :   store.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for creating disk-backed arrays to store large results '
+
+import numpy as np
+
+
+' a function for creating a disk-backed array '
+
+def create_store(path, shape, dtype=np.float64, block_ndim=None):
+
+    """
+    Create a disk-backed array
+
+    Parameters
+    ----------
+    path : string
+        The file path. If it ends with '.h5' or '.hdf5', a chunked HDF5 dataset (named 'data') is created by h5py.
+        Otherwise, a np.memmap is created.
+    shape : tuple
+        The shape of the array.
+    dtype : numpy dtype. Default is np.float64.
+        The data type of the array.
+    block_ndim : int or None. Default is None.
+        Only for HDF5. The number of trailing axes written in one block, e.g. 4 for [.., nts, nts, n_cons, n_cons].
+        Each HDF5 chunk holds one block. If block_ndim=None, h5py chooses the chunks.
+
+    Returns
+    -------
+    store : np.memmap or h5py.Dataset
+        The disk-backed array, initialized with zeros. The HDF5 file stays open for writing until store.file.close() is
+        called (see close_store).
+    """
+
+    shape = tuple(int(n) for n in shape)
+
+    if path.endswith('.h5') or path.endswith('.hdf5'):
+
+        import h5py
+
+        if block_ndim is None:
+            chunks = True
+        else:
+            chunks = (1,) * (len(shape) - block_ndim) + shape[len(shape) - block_ndim:]
+
+        f = h5py.File(path, "w")
+
+        return f.create_dataset("data", shape=shape, dtype=dtype, chunks=chunks, fillvalue=0)
+
+    return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+
+
+' a function for flushing a disk-backed array and releasing its file '
+
+def close_store(store):
+
+    """
+    Flush a disk-backed array created by create_store and release its file
+
+    Parameters
+    ----------
+    store : np.memmap or h5py.Dataset
+        The disk-backed array.
+
+    Returns
+    -------
+    store : np.memmap or H5Array
+        The same data. A h5py.Dataset is closed and replaced by a H5Array, which opens the file read-only only while
+        reading, so the same path can be written again in the same session.
+    """
+
+    if hasattr(store, 'file') and hasattr(store.file, 'close'):
+
+        path = store.file.filename
+        name = store.name
+
+        store.file.flush()
+        store.file.close()
+
+        return H5Array(path, name=name)
+
+    if hasattr(store, 'flush'):
+        store.flush()
+
+    return store
+
+
+' a class for reading a HDF5 dataset without keeping its file open '
+
+class H5Array(object):
+
+    """
+    A read-only HDF5 dataset, whose file is only open while reading
+
+    Parameters
+    ----------
+    path : string
+        The file path.
+    name : string. Default is 'data'.
+        The name of the dataset.
+
+    Notes
+    -----
+    Indexing reads only the selected values. np.asarray() reads the whole dataset.
+    """
+
+    def __init__(self, path, name='data'):
+
+        import h5py
+
+        self.path = path
+        self.name = name
+
+        with h5py.File(path, "r") as f:
+            self.shape = f[name].shape
+            self.dtype = f[name].dtype
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+
+        import h5py
+
+        with h5py.File(self.path, "r") as f:
+            return f[self.name][key]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[()]
+        if dtype is not None:
+            values = values.astype(dtype)
+        return values
@@ -0,0 +1,104 @@
+# -*- coding: utf-8
+
+"""
+@File       :   windows.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+' a module for building the sliding time-windows used by the CTRDM & CTSimilarity calculations '
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+np.seterr(divide='ignore', invalid='ignore')
+
+
+' a function for getting the number of time-windows '
+
+def nts_cal(n_ts, time_win=10, time_step=5):
+
+    """
+    Get the number of time-windows
+
+    Parameters
+    ----------
+    n_ts : int
+        The number of time-points.
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+
+    Returns
+    -------
+    nts : int
+        The number of time-windows, int((n_ts-time_win)/time_step)+1.
+    """
+
+    return int((n_ts - time_win) / time_step) + 1
+
+
+' a function for getting all time-windows as a strided view '
+
+def window_view(data, time_win=10, time_step=5):
+
+    """
+    Get all time-windows of the data as one strided view (no copy)
+
+    Parameters
+    ----------
+    data : array [..., n_ts]
+        The data. The time-points must be on the last axis.
+    time_win : int. Default is 10.
+        The number of time-points in each time-window.
+    time_step : int. Default is 5.
+        The time step size between two neighbouring time-windows.
+
+    Returns
+    -------
+    windows : array [..., int((n_ts-time_win)/time_step)+1, time_win]
+        A read-only view of the data, windows[..., t, :] = data[..., t*time_step:t*time_step+time_win].
+    """
+
+    data = np.asarray(data)
+
+    nts = nts_cal(np.shape(data)[-1], time_win, time_step)
+
+    stride = data.strides[-1]
+
+    return as_strided(data, shape=data.shape[:-1] + (nts, time_win),
+                      strides=data.strides[:-1] + (stride * time_step, stride), writeable=False)
+
+
+' a function for standardizing the time-windows '
+
+def zscore_windows(windows, dtype=np.float64):
+
+    """
+    Standardize the windows along the last axis
+
+    Each window is centered and scaled to unit norm, so the dot product of two standardized windows is their Pearson
+    correlation coefficient.
+
+    Parameters
+    ----------
+    windows : array [..., n_features]
+        The windows.
+    dtype : numpy floating dtype. Default is np.float64.
+        The dtype of the standardized windows. The means and norms are always accumulated in float64.
+
+    Returns
+    -------
+    zwindows : array [..., n_features]
+        The standardized windows. Constant windows become NaN, like scipy.stats.pearsonr.
+    """
+
+    windows = np.asarray(windows, dtype=np.float64)
+
+    centered = windows - np.mean(windows, axis=-1, keepdims=True)
+
+    zwindows = centered / np.linalg.norm(centered, axis=-1, keepdims=True)
+
+    return zwindows.astype(dtype, copy=False)
@@ -19,7 +19,8 @@ setup(
         'numpy',
         'scipy>=1.4',
         'matplotlib',
-        'neurora'
+        'neurora',
+        'h5py'
     ],
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -0,0 +1,47 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_adaptive.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from pyctrsa.ctsimilarity.fitdata import ctsimilarities_cal
+from pyctrsa.ctsimilarity.adaptive import adaptive_ctsimilarities_cal
+
+class test_adaptive(unittest.TestCase):
+
+    def test_adaptive_ctsimilarities_cal(self):
+
+        data = np.random.rand(6, 3, 2, 83)
+        Model_RDMs = np.random.rand(2, 6, 6)
+        for method in ['spearman', 'distance']:
+            CTSimilarities = ctsimilarities_cal(data, Model_RDMs, time_step=2, method=method)
+
+            adaptive = adaptive_ctsimilarities_cal(data, Model_RDMs, time_step=2, coarse_step=8, threshold=-np.inf,
+                                                   method=method)
+            self.assertEqual(adaptive.fraction, 1)
+            np.testing.assert_allclose(np.asarray(adaptive), CTSimilarities, atol=1e-10)
+
+            adaptive = adaptive_ctsimilarities_cal(data, Model_RDMs, time_step=2, coarse_step=8, threshold=np.inf,
+                                                   method=method)
+            self.assertEqual(adaptive.fraction, 0)
+            dense = np.asarray(adaptive)
+            self.assertEqual(dense.shape, CTSimilarities.shape)
+            np.testing.assert_allclose(dense[:, :, :, ::4, ::4], CTSimilarities[:, :, :, ::4, ::4], atol=1e-10)
+            np.testing.assert_allclose(dense[:, :, :, 5, 9], CTSimilarities[:, :, :, 4, 8], atol=1e-10)
+
+        adaptive = adaptive_ctsimilarities_cal(data, Model_RDMs, time_step=2, coarse_step=8, change=0.1)
+        self.assertEqual(adaptive.refine.shape, (10, 10))
+        dense = np.asarray(adaptive)
+        fine = adaptive.fine
+        CTSimilarities = ctsimilarities_cal(data, Model_RDMs, time_step=2)
+        np.testing.assert_allclose(dense[..., fine.t1, fine.t2, :], CTSimilarities[..., fine.t1, fine.t2, :],
+                                   atol=1e-10)
+
+        self.assertRaises(ValueError, adaptive_ctsimilarities_cal, data, Model_RDMs)
+        self.assertRaises(ValueError, adaptive_ctsimilarities_cal, data, Model_RDMs, time_step=2, coarse_step=5,
+                          threshold=0)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_cluster.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from scipy import ndimage
+from scipy.stats import ttest_1samp
+from pyctrsa.stats.permutation import signs_cal
+from pyctrsa.stats.cluster import cluster_permutation_cal
+
+class test_cluster(unittest.TestCase):
+
+    def test_cluster_permutation_cal(self):
+
+        x = np.random.default_rng(0).standard_normal((12, 15, 15))
+        x[:, 3:8, 4:10] += 1.5
+        x[:, 10:14, 10:14] -= 1.5
+        n_perms = 200
+        threshold = 2
+
+        def masses(tmap, tail):
+            result = []
+            for sign in [1, -1]:
+                if (tail == 1 and sign == -1) or (tail == -1 and sign == 1):
+                    continue
+                labels, n = ndimage.label(sign * tmap > threshold)
+                result.extend([np.sum(np.abs(tmap[labels == i])) for i in range(1, n + 1)])
+            return labels, result
+
+        signs = signs_cal(12, n_perms=n_perms, seed=5)
+
+        for tail in [1, -1, 0]:
+            # brute force, one permutation at a time
+            null = np.array([max(masses(ttest_1samp(s[:, None, None] * x, 0, axis=0)[0], tail)[1] + [0])
+                             for s in signs])
+            observed = masses(ttest_1samp(x, 0, axis=0)[0], tail)[1]
+            clusters, ps = cluster_permutation_cal(x, n_perms=n_perms, threshold=threshold, tail=tail, seed=5)
+            self.assertEqual(len(clusters), len(observed))
+            self.assertEqual(clusters.shape[1:], (15, 15))
+            tmap = ttest_1samp(x, 0, axis=0)[0]
+            np.testing.assert_allclose(sorted([np.sum(np.abs(tmap[c])) for c in clusters]), sorted(observed))
+            for c, p in zip(clusters, ps):
+                mass = np.sum(np.abs(tmap[c]))
+                self.assertAlmostEqual(p, (np.sum(null >= mass - 1e-9) + 1) / (n_perms + 1))
+
+        # the planted clusters are significant, the same with a process pool
+        clusters, ps = cluster_permutation_cal(x, n_perms=n_perms, tail=0, seed=5)
+        self.assertTrue(np.any(clusters[ps < 0.05][:, 5, 6]))
+        self.assertTrue(np.any(clusters[ps < 0.05][:, 12, 12]))
+        clusters2, ps2 = cluster_permutation_cal(x, n_perms=n_perms, tail=0, n_jobs=2, seed=5)
+        np.testing.assert_array_equal(clusters, clusters2)
+        np.testing.assert_array_equal(ps, ps2)
+
+        self.assertRaises(ValueError, cluster_permutation_cal, x, stat='mean')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,4 +18,18 @@ class test_cosinesimilarity(unittest.TestCase):
         CTRDMs1 = np.random.rand(16, 16)
         CTRDMs2 = np.random.rand(16, 16)
         CTSimilarities = cosinesimilarity_cal(CTRDMs1, CTRDMs2)
-        self.assertNotEqual(CTSimilarities, None)
\ No newline at end of file
+        self.assertNotEqual(CTSimilarities, None)
+
+    def test_cosinesimilarity_cal_stack(self):
+
+        CTRDMs1 = np.random.rand(3, 8, 8)
+        CTRDMs2 = np.random.rand(4, 1, 8, 8)
+        CTSimilarities = cosinesimilarity_cal(CTRDMs1, CTRDMs2)
+        self.assertEqual(CTSimilarities.shape, (4, 3))
+
+        mask = ~np.eye(8, dtype=bool)
+        for i in range(4):
+            for j in range(3):
+                v1 = CTRDMs1[j][mask]
+                v2 = CTRDMs2[i, 0][mask]
+                self.assertAlmostEqual(CTSimilarities[i, j], 0.5 + 0.5 * np.dot(v1, v2) / np.linalg.norm(v1) / np.linalg.norm(v2))
@@ -9,7 +9,8 @@
 
 import numpy as np
 import unittest
-from pyctrsa.ctsimilarity.fitctrdm import ctsimilarities_cal
+from pyctrsa.ctrdm.multi_cal import ctrdms_cal
+from pyctrsa.ctsimilarity.fitctrdm import ctsimilarities_cal, ctsimilarity_cal
 
 class test_fitctrdm_cal(unittest.TestCase):
 
@@ -24,4 +25,48 @@ class test_fitctrdm_cal(unittest.TestCase):
         CTRDMs = np.random.rand(8, 10, 10, 16, 16)
         CTSimilarities = ctsimilarities_cal(CTRDMs, Model_RDM)
         self.assertEqual(CTSimilarities.shape[0], 8)
-        self.assertEqual(len(CTSimilarities.shape), 4)
\ No newline at end of file
+        self.assertEqual(len(CTSimilarities.shape), 4)
+
+    def test_ctsimilarities_cal_values(self):
+
+        CTRDMs = np.random.rand(2, 4, 4, 6, 6)
+        Model_RDM = np.random.rand(6, 6)
+        for method in ['spearman', 'pearson', 'kendall', 'similarity', 'distance']:
+            CTSimilarities = ctsimilarities_cal(CTRDMs, Model_RDM, method=method)
+            for i in range(2):
+                for t1 in range(4):
+                    for t2 in range(4):
+                        rp = ctsimilarity_cal(CTRDMs[i, t1, t2], Model_RDM, method=method)
+                        if method == 'similarity' or method == 'distance':
+                            self.assertAlmostEqual(CTSimilarities[i, t1, t2], rp[0])
+                        else:
+                            np.testing.assert_allclose(CTSimilarities[i, t1, t2], rp, atol=1e-10)
+
+    def test_ctsimilarities_cal_models(self):
+
+        CTRDMs = np.random.rand(2, 4, 4, 6, 6)
+        Model_RDMs = np.random.rand(3, 6, 6)
+        Model_RDMs[0] = Model_RDMs[0] + Model_RDMs[0].T
+        for method in ['spearman', 'pearson', 'kendall', 'similarity', 'distance']:
+            for symmetric in [False, True]:
+                CTSimilarities = ctsimilarities_cal(CTRDMs, Model_RDMs, method=method, symmetric=symmetric)
+                self.assertEqual(CTSimilarities.shape[:4], (2, 3, 4, 4))
+                for m in range(3):
+                    np.testing.assert_allclose(CTSimilarities[:, m],
+                                               ctsimilarities_cal(CTRDMs, Model_RDMs[m], method=method,
+                                                                  symmetric=symmetric), atol=1e-10)
+
+    def test_ctsimilarities_cal_time_pairs(self):
+
+        data = np.random.rand(6, 2, 1, 40)
+        CTRDMs = ctrdms_cal(data, chl_opt=0)
+        Model_RDMs = np.random.rand(2, 6, 6)
+        for method in ['spearman', 'kendall', 'distance']:
+            CTSimilarities = ctsimilarities_cal(CTRDMs, Model_RDMs, method=method)
+            for pairs in [ctsimilarities_cal(CTRDMs, Model_RDMs, method=method, time_pairs=('band', 2)),
+                          ctsimilarities_cal(ctrdms_cal(data, chl_opt=0, symmetric=True), Model_RDMs, method=method,
+                                             time_pairs=('band', 2)),
+                          ctsimilarities_cal(ctrdms_cal(data, chl_opt=0, time_pairs=('band', 2)), Model_RDMs,
+                                             method=method)]:
+                self.assertEqual(pairs.shape, CTSimilarities.shape)
+                np.testing.assert_allclose(pairs.values, CTSimilarities[:, :, pairs.t1, pairs.t2], atol=1e-10)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_fitdata.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from pyctrsa.ctrdm.multi_cal import ctrdms_cal
+from pyctrsa.ctsimilarity import fitctrdm
+from pyctrsa.ctsimilarity.fitdata import ctsimilarities_cal
+
+class test_fitdata(unittest.TestCase):
+
+    def test_ctsimilarities_cal(self):
+
+        data = np.random.rand(6, 3, 2, 30)
+        Model_RDMs = np.random.rand(2, 6, 6)
+
+        for sub_opt in [0, 1]:
+            for chl_opt in [0, 1]:
+                CTRDMs = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt)
+                CTSimilarities = ctsimilarities_cal(data, Model_RDMs, sub_opt=sub_opt, chl_opt=chl_opt, block_size=2)
+                self.assertEqual(CTSimilarities.shape, CTRDMs.shape[:-4] + (2, 5, 5, 2))
+                for m in range(2):
+                    np.testing.assert_allclose(CTSimilarities[..., m, :, :, :],
+                                               fitctrdm.ctsimilarities_cal(CTRDMs, Model_RDMs[m]), atol=1e-10)
+
+        CTRDMs = ctrdms_cal(data, chl_opt=0)
+        CTSimilarities = ctsimilarities_cal(data, Model_RDMs[0], chl_opt=0, method='distance')
+        np.testing.assert_allclose(CTSimilarities, fitctrdm.ctsimilarities_cal(CTRDMs, Model_RDMs[0], method='distance'))
+
+    def test_ctsimilarities_cal_time_pairs(self):
+
+        data = np.random.rand(6, 3, 2, 30)
+        Model_RDMs = np.random.rand(2, 6, 6)
+        for sub_opt in [0, 1]:
+            for chl_opt in [0, 1]:
+                CTSimilarities = ctsimilarities_cal(data, Model_RDMs, sub_opt=sub_opt, chl_opt=chl_opt, block_size=2)
+                pairs = ctsimilarities_cal(data, Model_RDMs, sub_opt=sub_opt, chl_opt=chl_opt, block_size=2,
+                                           time_pairs=('band', 1))
+                self.assertEqual(pairs.shape, CTSimilarities.shape)
+                np.testing.assert_allclose(pairs.values, CTSimilarities[..., pairs.t1, pairs.t2, :], atol=1e-10)
+
+    def test_ctsimilarities_cal_diagonal_only(self):
+
+        data = np.random.rand(6, 3, 2, 30)
+        Model_RDMs = np.random.rand(2, 6, 6)
+        for method in ['spearman', 'similarity']:
+            CTSimilarities = ctsimilarities_cal(data, Model_RDMs, method=method)
+            diagonal = ctsimilarities_cal(data, Model_RDMs, method=method, diagonal_only=True)
+            self.assertEqual(diagonal.values.shape, (3, 2, 2, 5) + CTSimilarities.shape[5:])
+            for t in range(5):
+                np.testing.assert_allclose(diagonal.values[:, :, :, t], CTSimilarities[:, :, :, t, t], atol=1e-10)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_group.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import os
+import tempfile
+import numpy as np
+import unittest
+from scipy.stats import ttest_1samp, ttest_rel
+from pyctrsa.stats.permutation import signs_cal
+from pyctrsa.stats.group import blocks_cal, ttest_cal, maxstat_permutation_cal
+
+class test_group(unittest.TestCase):
+
+    def test_blocks_cal(self):
+
+        for shape, size in [((3, 4, 5), 7), ((3, 4, 5), 25), ((3, 4, 5), 1000), ((6,), 4), ((2, 3), 1)]:
+            count = np.zeros(shape, dtype=int)
+            for index in blocks_cal(shape, size):
+                self.assertTrue(count[index].size <= size)
+                count[index] += 1
+            np.testing.assert_array_equal(count, 1)
+
+    def test_ttest_cal(self):
+
+        x = np.random.rand(10, 3, 6, 6)
+        y = np.random.rand(10, 3, 6, 6)
+        for tail, alternative in [(1, 'greater'), (-1, 'less'), (0, 'two-sided')]:
+            ts, ps = ttest_cal(x, chance=0.5, tail=tail, chunk_size=50)
+            t, p = ttest_1samp(x, 0.5, axis=0, alternative=alternative)
+            np.testing.assert_allclose(ts, t, rtol=1e-10)
+            np.testing.assert_allclose(ps, p, rtol=1e-8)
+            ts, ps = ttest_cal(x, y, tail=tail)
+            t, p = ttest_rel(x, y, axis=0, alternative=alternative)
+            np.testing.assert_allclose(ts, t, rtol=1e-10)
+            np.testing.assert_allclose(ps, p, rtol=1e-8)
+
+    def test_maxstat_permutation_cal(self):
+
+        x = np.random.default_rng(0).standard_normal((12, 2, 3, 5, 5))
+        x[:, 0, 1, 2:4, 2:4] += 3
+        n_perms = 300
+        signs = signs_cal(12, n_perms=n_perms, seed=4)
+
+        for tail in [1, -1, 0]:
+            t = ttest_1samp(x, 0, axis=0)[0]
+            null = np.array([ttest_1samp(s[:, None, None, None, None] * x, 0, axis=0)[0] for s in signs])
+            null = {1: null, -1: -null, 0: np.abs(null)}[tail].reshape(n_perms, -1).max(axis=1)
+            observed = {1: t, -1: -t, 0: np.abs(t)}[tail]
+            expected = (np.sum(null >= observed[..., np.newaxis] - 1e-9, axis=-1) + 1) / (n_perms + 1)
+            for chunk_size in [2**22, 3000]:
+                stats, ps = maxstat_permutation_cal(x, n_perms=n_perms, tail=tail, chunk_size=chunk_size, seed=4)
+                np.testing.assert_allclose(stats, t, rtol=1e-10)
+                np.testing.assert_allclose(ps, expected)
+
+        self.assertTrue(np.all(ps[0, 1, 2:4, 2:4] < 0.05))
+
+        # memory-mapped inputs with r-values and p-values, paired test
+        path = os.path.join(tempfile.mkdtemp(), 'ctsimilarities.dat')
+        store = np.memmap(path, dtype=np.float64, mode='w+', shape=x.shape + (2,))
+        store[..., 0] = x
+        y = np.random.randn(*x.shape)
+        stats, ps = maxstat_permutation_cal(store[..., 0], y, n_perms=n_perms, tail=0, chunk_size=3000, seed=4)
+        np.testing.assert_allclose(stats, ttest_rel(x, y, axis=0)[0], rtol=1e-10)
+        np.testing.assert_array_equal(ps, maxstat_permutation_cal(x - y, n_perms=n_perms, tail=0, seed=4)[1])
+        del store
+        os.remove(path)
+
+        self.assertRaises(ValueError, maxstat_permutation_cal, x, tail=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,7 @@
 
 import numpy as np
 import unittest
+from scipy.stats import kendalltau
 from pyctrsa.similarity.kendallrp import kendallrp_cal
 
 class test_kendallrp(unittest.TestCase):
@@ -18,4 +19,29 @@ class test_kendallrp(unittest.TestCase):
         CTRDMs1 = np.random.rand(16, 16)
         CTRDMs2 = np.random.rand(16, 16)
         CTSimilarities = kendallrp_cal(CTRDMs1, CTRDMs2)
-        self.assertEqual(len(CTSimilarities), 2)
\ No newline at end of file
+        self.assertEqual(len(CTSimilarities), 2)
+
+    def test_kendallrp_cal_stack(self):
+
+        CTRDMs1 = np.random.rand(3, 4, 8, 8)
+        CTRDM2 = np.random.rand(8, 8)
+        CTSimilarities = kendallrp_cal(CTRDMs1, CTRDM2)
+        self.assertEqual(CTSimilarities.shape, (3, 4, 2))
+
+        mask = ~np.eye(8, dtype=bool)
+        for i in range(3):
+            for j in range(4):
+                rp = kendalltau(CTRDMs1[i, j][mask], CTRDM2[mask])
+                np.testing.assert_allclose(CTSimilarities[i, j], rp, rtol=1e-8, atol=1e-12)
+
+    def test_kendallrp_cal_ties(self):
+
+        CTRDMs1 = np.random.randint(0, 4, (10, 5, 5)).astype(float)
+        CTRDM2 = np.random.randint(0, 4, (5, 5)).astype(float)
+        CTRDM2 = CTRDM2 + CTRDM2.T
+        CTSimilarities = kendallrp_cal(CTRDMs1, CTRDM2)
+
+        mask = ~np.eye(5, dtype=bool)
+        for i in range(10):
+            rp = kendalltau(CTRDMs1[i][mask], CTRDM2[mask])
+            np.testing.assert_allclose(CTSimilarities[i], rp, rtol=1e-8, atol=1e-12)
@@ -7,9 +7,13 @@
 @License    :   MIT License
 """
 
+import os
+import tempfile
 import numpy as np
 import unittest
-from pyctrsa.ctrdm.multi_cal import ctrdms_cal
+from scipy.stats import pearsonr
+from pyctrsa.ctrdm.multi_cal import ctrdms_cal, ctrdms_sweep_cal
+from pyctrsa.ctrdm.single_cal import ctrdm_cal
 
 class test_multi_cal(unittest.TestCase):
 
@@ -23,3 +27,130 @@ class test_multi_cal(unittest.TestCase):
         CTRDMs = ctrdms_cal(data, chl_opt=0, time_win=10, time_step=5)
         self.assertEqual(CTRDMs.shape[0], 8)
         self.assertEqual(len(CTRDMs.shape), 5)
+
+    def test_ctrdms_cal_values(self):
+
+        data = np.random.rand(4, 3, 2, 20)
+
+        CTRDMs = ctrdms_cal(data, chl_opt=1, time_win=6, time_step=3)
+        for sub in range(3):
+            for chl in range(2):
+                np.testing.assert_allclose(CTRDMs[sub, chl], ctrdm_cal(data[:, sub, chl], time_win=6, time_step=3))
+
+        CTRDMs = ctrdms_cal(data, chl_opt=0, time_win=6, time_step=3)
+        for sub in range(3):
+            for t1 in range(5):
+                for t2 in range(5):
+                    v1 = np.reshape(data[0, sub, :, t1*3:t1*3+6], [12])
+                    v2 = np.reshape(data[1, sub, :, t2*3:t2*3+6], [12])
+                    self.assertAlmostEqual(CTRDMs[sub, t1, t2, 0, 1], 1-pearsonr(v1, v2)[0])
+
+    def test_ctrdms_cal_n_jobs(self):
+
+        data = np.random.rand(6, 3, 4, 40)
+        for chl_opt in [0, 1]:
+            CTRDMs = ctrdms_cal(data, chl_opt=chl_opt, n_jobs=1)
+            np.testing.assert_array_equal(ctrdms_cal(data, chl_opt=chl_opt, n_jobs=2), CTRDMs)
+            np.testing.assert_array_equal(ctrdms_cal(data, chl_opt=chl_opt, n_jobs=3), CTRDMs)
+
+    def test_ctrdms_cal_engine(self):
+
+        data = np.random.rand(5, 2, 3, 44)
+        for chl_opt in [0, 1]:
+            for time_win, time_step in [(10, 5), (8, 2)]:
+                kwargs = {'chl_opt': chl_opt, 'time_win': time_win, 'time_step': time_step}
+                CTRDMs = ctrdms_cal(data, **kwargs)
+                np.testing.assert_allclose(ctrdms_cal(data, engine='prefix', **kwargs), CTRDMs, atol=1e-10)
+                np.testing.assert_allclose(ctrdms_cal(data, engine='prefix', n_jobs=2, **kwargs), CTRDMs, atol=1e-10)
+                np.testing.assert_allclose(ctrdms_cal(data, sub_opt=0, engine='prefix', **kwargs),
+                                           np.average(CTRDMs, axis=0), atol=1e-10)
+                np.testing.assert_allclose(ctrdms_cal(data, symmetric=True, engine='prefix', **kwargs).to_dense(),
+                                           CTRDMs, atol=1e-10)
+
+    def test_ctrdms_sweep_cal(self):
+
+        data = np.random.rand(4, 3, 2, 46)
+        configs = [(10, 5), (20, 5), (15, 10), (6, 2)]
+        for chl_opt in [0, 1]:
+            for sub_opt in [0, 1]:
+                CTRDMs_list = ctrdms_sweep_cal(data, configs, sub_opt=sub_opt, chl_opt=chl_opt)
+                self.assertEqual(len(CTRDMs_list), len(configs))
+                for (time_win, time_step), CTRDMs in zip(configs, CTRDMs_list):
+                    np.testing.assert_allclose(CTRDMs, ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt,
+                                                                  time_win=time_win, time_step=time_step), atol=1e-10)
+            CTRDMs_list = ctrdms_sweep_cal(data, configs, chl_opt=chl_opt, symmetric=True, n_jobs=2)
+            for (time_win, time_step), CTRDMs in zip(configs, CTRDMs_list):
+                np.testing.assert_allclose(CTRDMs.to_dense(), ctrdms_cal(data, chl_opt=chl_opt, time_win=time_win,
+                                                                         time_step=time_step), atol=1e-10)
+
+    def test_ctrdms_cal_out(self):
+
+        data = np.random.rand(6, 3, 4, 40)
+        path = os.path.join(tempfile.mkdtemp(), "ctrdms.dat")
+        for sub_opt in [0, 1]:
+            for chl_opt in [0, 1]:
+                CTRDMs = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt)
+                out = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt, out=path)
+                self.assertIsInstance(out, np.memmap)
+                np.testing.assert_allclose(out, CTRDMs)
+        out = ctrdms_cal(data, chl_opt=1, symmetric=True, n_jobs=2, out=path)
+        np.testing.assert_allclose(np.asarray(out), ctrdms_cal(data, chl_opt=1))
+
+    def test_ctrdms_cal_out_h5(self):
+
+        data = np.random.rand(6, 3, 4, 40)
+        path = os.path.join(tempfile.mkdtemp(), "ctrdms.h5")
+        for sub_opt in [0, 1]:
+            for chl_opt in [0, 1]:
+                CTRDMs = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt)
+                # the file is closed after writing, so the same path can be written again
+                for i in range(2):
+                    out = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt, out=path)
+                    self.assertEqual(out.shape, CTRDMs.shape)
+                    np.testing.assert_allclose(np.asarray(out), CTRDMs)
+                    np.testing.assert_allclose(out[0, 1], CTRDMs[0, 1])
+        out = ctrdms_cal(data, chl_opt=1, symmetric=True, out=path)
+        np.testing.assert_allclose(np.asarray(out), ctrdms_cal(data, chl_opt=1))
+        out = ctrdms_cal(data, chl_opt=0, time_pairs=('band', 1), out=path)
+        np.testing.assert_allclose(out.to_dense(), ctrdms_cal(data, chl_opt=0, time_pairs=('band', 1)).to_dense())
+
+    def test_ctrdms_cal_time_pairs(self):
+
+        data = np.random.rand(5, 3, 2, 40)
+        path = os.path.join(tempfile.mkdtemp(), "pairs.dat")
+        for sub_opt in [0, 1]:
+            for chl_opt in [0, 1]:
+                CTRDMs = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt)
+                for kwargs in [{'n_jobs': 1}, {'n_jobs': 2}, {'out': path}]:
+                    pairs = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=chl_opt, time_pairs=('band', 1), **kwargs)
+                    self.assertEqual(pairs.shape, CTRDMs.shape)
+                    np.testing.assert_allclose(pairs.values, CTRDMs[..., pairs.t1, pairs.t2, :, :], atol=1e-12)
+
+    def test_ctrdms_cal_dtype(self):
+
+        data = np.random.rand(6, 3, 4, 40)
+        for sub_opt in [0, 1]:
+            CTRDMs = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=1)
+            CTRDMs32 = ctrdms_cal(data, sub_opt=sub_opt, chl_opt=1, dtype=np.float32)
+            self.assertEqual(CTRDMs32.dtype, np.float32)
+            np.testing.assert_allclose(CTRDMs32, CTRDMs, atol=1e-5)
+
+    def test_ctrdms_cal_return_var(self):
+
+        data = np.random.rand(6, 3, 4, 40)
+        for chl_opt in [0, 1]:
+            CTRDMs = ctrdms_cal(data, sub_opt=1, chl_opt=chl_opt)
+            for n_jobs in [1, 2]:
+                avg, var = ctrdms_cal(data, sub_opt=0, chl_opt=chl_opt, n_jobs=n_jobs, return_var=True)
+                np.testing.assert_allclose(avg, np.average(CTRDMs, axis=0), atol=1e-12)
+                np.testing.assert_allclose(var, np.var(CTRDMs, axis=0, ddof=1), atol=1e-12)
+        self.assertRaises(ValueError, ctrdms_cal, data, sub_opt=1, return_var=True)
+
+    def test_ctrdms_cal_diagonal_only(self):
+
+        data = np.random.rand(5, 3, 2, 40)
+        for chl_opt in [0, 1]:
+            CTRDMs = ctrdms_cal(data, chl_opt=chl_opt)
+            diagonal = ctrdms_cal(data, chl_opt=chl_opt, diagonal_only=True)
+            np.testing.assert_allclose(diagonal.values, CTRDMs[..., range(7), range(7), :, :], atol=1e-12)
+        self.assertRaises(ValueError, ctrdms_cal, data, time_pairs=('band', 1), diagonal_only=True)
@@ -9,6 +9,7 @@
 
 import numpy as np
 import unittest
+from pyctrsa.ctsimilarity import normaldatabased
 from pyctrsa.ctsimilarity.normaldatabased import ctsimilarities_cal
 
 class test_normaldatabased(unittest.TestCase):
@@ -34,4 +35,88 @@ class test_normaldatabased(unittest.TestCase):
 
         CTSimilarities = ctsimilarities_cal(data1=data1, data2=data2, sub_opt=0, chl_opt=0)
         self.assertEqual(CTSimilarities.shape[0], 3)
-        self.assertEqual(len(CTSimilarities.shape), 3)
\ No newline at end of file
+        self.assertEqual(len(CTSimilarities.shape), 3)
+
+    def test_ctsimilarities_cal_n_jobs(self):
+
+        data1 = np.random.rand(3, 2, 30)
+        data2 = np.random.rand(3, 2, 30)
+        for chl_opt in [0, 1]:
+            for method in ['pearson', 'similarity']:
+                CTSimilarities = ctsimilarities_cal(data1, data2, chl_opt=chl_opt, method=method, n_jobs=1)
+                np.testing.assert_array_equal(ctsimilarities_cal(data1, data2, chl_opt=chl_opt, method=method,
+                                                                 n_jobs=2), CTSimilarities)
+
+    def test_ctsimilarities_cal_return_var(self):
+
+        data1 = np.random.rand(3, 2, 30)
+        data2 = np.random.rand(3, 2, 30)
+        for chl_opt in [0, 1]:
+            CTSimilarities = ctsimilarities_cal(data1, data2, sub_opt=1, chl_opt=chl_opt, method='pearson')
+            avg, var = ctsimilarities_cal(data1, data2, sub_opt=0, chl_opt=chl_opt, method='pearson', return_var=True)
+            np.testing.assert_allclose(avg, np.average(CTSimilarities, axis=0), atol=1e-12)
+            np.testing.assert_allclose(var, np.var(CTSimilarities, axis=0, ddof=1), atol=1e-12)
+        self.assertRaises(ValueError, ctsimilarities_cal, data1, data2, sub_opt=1, return_var=True)
+
+    def test_ctsimilarities_cal_slots(self):
+
+        data1 = np.random.rand(2, 3, 20)
+        data2 = np.random.rand(2, 3, 20)
+        for method in ['similarity', 'distance']:
+            CTSimilarities = ctsimilarities_cal(data1, data2, chl_opt=1, time_win=10, time_step=5, method=method)
+            for sub in range(2):
+                for chl in range(3):
+                    for t1 in range(3):
+                        for t2 in range(3):
+                            v1 = data1[sub, chl, t1*5:t1*5+10]
+                            v2 = data2[sub, chl, t2*5:t2*5+10]
+                            if method == 'similarity':
+                                value = 0.5 + 0.5 * np.dot(v1, v2) / np.linalg.norm(v1) / np.linalg.norm(v2)
+                            else:
+                                value = np.linalg.norm(v1 - v2)
+                            self.assertAlmostEqual(CTSimilarities[sub, chl, t1, t2], value)
+
+    def test_ctsimilarities_cal_engine(self):
+
+        data1 = np.random.rand(2, 3, 41)
+        data2 = np.random.rand(2, 3, 41)
+        for method in ['pearson', 'similarity', 'distance']:
+            for chl_opt in [0, 1]:
+                for time_win, time_step in [(10, 5), (6, 2)]:
+                    kwargs = {'chl_opt': chl_opt, 'time_win': time_win, 'time_step': time_step, 'method': method}
+                    CTSimilarities = ctsimilarities_cal(data1, data2, **kwargs)
+                    np.testing.assert_allclose(ctsimilarities_cal(data1, data2, engine='prefix', **kwargs),
+                                               CTSimilarities, atol=1e-10)
+                    np.testing.assert_allclose(ctsimilarities_cal(data1, data2, engine='prefix', n_jobs=2, **kwargs),
+                                               CTSimilarities, atol=1e-10)
+
+    def test_ctsimilarities_cal_time_pairs(self):
+
+        data1 = np.random.rand(2, 3, 40)
+        data2 = np.random.rand(2, 3, 40)
+        for method in ['spearman', 'pearson', 'kendall', 'similarity', 'distance']:
+            for sub_opt in [0, 1]:
+                for chl_opt in [0, 1]:
+                    kwargs = {'sub_opt': sub_opt, 'chl_opt': chl_opt, 'method': method}
+                    CTSimilarities = ctsimilarities_cal(data1, data2, **kwargs)
+                    pairs = ctsimilarities_cal(data1, data2, time_pairs=('rectangle', [1, 4], slice(None)), **kwargs)
+                    self.assertEqual(pairs.shape, CTSimilarities.shape)
+                    CTSimilarities = np.moveaxis(CTSimilarities, [-2 - pairs.n_tail, -1 - pairs.n_tail], [0, 1])
+                    np.testing.assert_allclose(np.moveaxis(pairs.values, -1 - pairs.n_tail, 0),
+                                               CTSimilarities[pairs.t1, pairs.t2], atol=1e-12)
+
+    def test_ctsimilarities_cal_kendall_blocks(self):
+
+        data1 = np.random.rand(2, 3, 40)
+        data2 = np.random.rand(2, 3, 40)
+        for chl_opt in [0, 1]:
+            CTSimilarities = ctsimilarities_cal(data1, data2, chl_opt=chl_opt, method='kendall')
+            block_size = normaldatabased.BLOCK_SIZE
+            try:
+                # a few t1 rows in each block
+                normaldatabased.BLOCK_SIZE = 100
+                np.testing.assert_array_equal(ctsimilarities_cal(data1, data2, chl_opt=chl_opt, method='kendall'),
+                                              CTSimilarities)
+            finally:
+                normaldatabased.BLOCK_SIZE = block_size
+
@@ -9,6 +9,7 @@
 
 import numpy as np
 import unittest
+from neurora.rdm_corr import rdm_correlation_pearson, rdm_correlation_kendall, rdm_distance
 from pyctrsa.ctsimilarity.normalrdmbased import ctsimilarities_cal
 
 class test_normalrdmbased(unittest.TestCase):
@@ -28,4 +29,31 @@ class test_normalrdmbased(unittest.TestCase):
         RDMs = np.random.rand(5, 4, 20, 6, 6)
         CTSimilarities = ctsimilarities_cal(RDMs)
         self.assertEqual(CTSimilarities.shape[0], 5)
-        self.assertEqual(len(CTSimilarities.shape), 5)
\ No newline at end of file
+        self.assertEqual(len(CTSimilarities.shape), 5)
+
+    def test_ctsimilarities_cal_values(self):
+
+        RDMs = np.random.rand(2, 2, 2, 5, 6, 6)
+        for method in ['pearson', 'kendall', 'distance']:
+            CTSimilarities = ctsimilarities_cal(RDMs, method=method)
+            self.assertEqual(CTSimilarities.shape[:5], (2, 2, 2, 5, 5))
+            for t1 in range(5):
+                for t2 in range(5):
+                    RDM1 = RDMs[1, 0, 1, t1]
+                    RDM2 = RDMs[1, 0, 1, t2]
+                    if method == 'pearson':
+                        rp = rdm_correlation_pearson(RDM1, RDM2, fisherz=True)
+                    if method == 'kendall':
+                        rp = rdm_correlation_kendall(RDM1, RDM2, fisherz=True)
+                    if method == 'distance':
+                        rp = rdm_distance(RDM1, RDM2)
+                    np.testing.assert_allclose(CTSimilarities[1, 0, 1, t1, t2], rp, atol=1e-10)
+
+    def test_ctsimilarities_cal_time_pairs(self):
+
+        RDMs = np.random.rand(2, 12, 5, 5)
+        for method in ['spearman', 'pearson', 'kendall', 'similarity', 'distance']:
+            CTSimilarities = ctsimilarities_cal(RDMs, method=method)
+            pairs = ctsimilarities_cal(RDMs, method=method, time_pairs=('band', 3))
+            self.assertEqual(pairs.shape, CTSimilarities.shape)
+            np.testing.assert_allclose(pairs.values, CTSimilarities[:, pairs.t1, pairs.t2], atol=1e-12)
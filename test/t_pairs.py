@@ -0,0 +1,78 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_pairs.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from pyctrsa.util.pairs import time_pairs_cal, pair_values_cal, diagonal_pairs_cal, diagonal_cal, TimePairArray
+
+class test_pairs(unittest.TestCase):
+
+    def test_time_pairs_cal(self):
+
+        t1, t2 = time_pairs_cal(('band', 2), 6)
+        grid = np.abs(np.subtract.outer(np.arange(6), np.arange(6))) <= 2
+        np.testing.assert_array_equal(t1, np.nonzero(grid)[0])
+        np.testing.assert_array_equal(t2, np.nonzero(grid)[1])
+
+        t1, t2 = time_pairs_cal(('band', 10), 4)
+        self.assertEqual(len(t1), 16)
+
+        t1, t2 = time_pairs_cal(('rectangle', slice(1, 3), [5, 0]), 6)
+        np.testing.assert_array_equal(t1, [1, 1, 2, 2])
+        np.testing.assert_array_equal(t2, [0, 5, 0, 5])
+
+        t1, t2 = time_pairs_cal(([3, -1, 3], [0, 2, 0]), 6)
+        np.testing.assert_array_equal(t1, [3, 5])
+        np.testing.assert_array_equal(t2, [0, 2])
+
+        self.assertRaises(IndexError, time_pairs_cal, ([6], [0]), 6)
+        self.assertRaises(ValueError, time_pairs_cal, ('diagonal', 1), 6)
+        self.assertRaises(ValueError, time_pairs_cal, ('band', -1), 6)
+        self.assertRaises(ValueError, time_pairs_cal, ([0, 1], [0]), 6)
+
+    def test_time_pair_array(self):
+
+        dense = np.random.rand(2, 5, 5, 3)
+        t1, t2 = time_pairs_cal(('band', 1), 5)
+        pairs = TimePairArray(dense[:, t1, t2], t1, t2, 5, n_tail=1)
+        self.assertEqual(pairs.shape, dense.shape)
+        self.assertEqual(len(pairs), 2)
+
+        full = np.asarray(pairs)
+        np.testing.assert_array_equal(full[:, t1, t2], dense[:, t1, t2])
+        self.assertTrue(np.all(np.isnan(full[:, 0, 2])))
+        self.assertEqual(pairs.to_dense(fill_value=0)[0, 4, 0, 0], 0)
+
+        np.testing.assert_array_equal(pairs.pair_index([0, 2, 0], [1, 3, 4]), [1, 7, -1])
+
+        values, s1, s2, nts = pair_values_cal(dense, ([4, 0], [3, 1]), n_tail=1)
+        np.testing.assert_array_equal(values, dense[:, [0, 4], [1, 3]])
+        values, s1, s2, nts = pair_values_cal(pairs, ([4, 0], [3, 1]), n_tail=1)
+        np.testing.assert_array_equal(values, dense[:, [0, 4], [1, 3]])
+        self.assertRaises(ValueError, pair_values_cal, pairs, ([0], [4]), 1)
+        self.assertRaises(ValueError, TimePairArray, dense[:, t1, t2], t1[1:], t2[1:], 5, 1)
+
+    def test_diagonal_cal(self):
+
+        dense = np.random.rand(2, 5, 5, 3)
+        np.testing.assert_array_equal(diagonal_cal(dense, n_tail=1), dense[:, range(5), range(5)])
+
+        t1, t2 = time_pairs_cal(diagonal_pairs_cal(diagonal_only=True), 5)
+        np.testing.assert_array_equal(t1, np.arange(5))
+        np.testing.assert_array_equal(t2, np.arange(5))
+        pairs = TimePairArray(dense[:, t1, t2], t1, t2, 5, n_tail=1)
+        np.testing.assert_array_equal(diagonal_cal(pairs), dense[:, range(5), range(5)])
+
+        t1, t2 = time_pairs_cal(([0, 2], [0, 3]), 5)
+        diagonal = diagonal_cal(TimePairArray(dense[:, t1, t2], t1, t2, 5, n_tail=1))
+        np.testing.assert_array_equal(diagonal[:, 0], dense[:, 0, 0])
+        self.assertTrue(np.all(np.isnan(diagonal[:, 1:])))
+
+        self.assertEqual(diagonal_pairs_cal(('band', 1)), ('band', 1))
+        self.assertRaises(ValueError, diagonal_pairs_cal, ('band', 1), True)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_permutation.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from scipy.stats import ttest_1samp
+from pyctrsa.stats.permutation import signs_cal, permutation_stats_cal, signflip_permutation_cal
+
+class test_permutation(unittest.TestCase):
+
+    def test_signflip_permutation_cal(self):
+
+        x = np.random.rand(12, 6, 6) - 0.4
+        n_perms = 500
+        signs = signs_cal(12, n_perms=n_perms, seed=3)
+        self.assertEqual(signs.shape, (n_perms, 12))
+        np.testing.assert_array_equal(signs, signs_cal(12, n_perms=n_perms, seed=3))
+
+        for stat in ['mean', 't']:
+            # brute force with the same signs
+            if stat == 'mean':
+                obs = np.mean(x, axis=0)
+                null = np.array([np.mean(s[:, None, None] * x, axis=0) for s in signs])
+            else:
+                obs = ttest_1samp(x, 0, axis=0)[0]
+                null = np.array([ttest_1samp(s[:, None, None] * x, 0, axis=0)[0] for s in signs])
+            np.testing.assert_allclose(permutation_stats_cal(x, signs, stat=stat), null, atol=1e-10)
+            for tail, count in [(1, null >= obs - 1e-12), (-1, null <= obs + 1e-12),
+                                (0, np.abs(null) >= np.abs(obs) - 1e-12)]:
+                p = signflip_permutation_cal(x, n_perms=n_perms, tail=tail, stat=stat, seed=3)
+                np.testing.assert_allclose(p, (np.sum(count, axis=0) + 1) / (n_perms + 1))
+
+        # the chance level, a strong effect and the same p-values for the same seed
+        x = np.random.randn(20, 30) * 0.1 + 0.5
+        x[:, 15:] = x[:, 15:] - 0.5
+        p = signflip_permutation_cal(x, chance=0.5, tail=-1, seed=1)
+        self.assertEqual(p.shape, (30,))
+        self.assertTrue(np.all(p[15:] < 0.01))
+        np.testing.assert_array_equal(p, signflip_permutation_cal(x, chance=0.5, tail=-1, seed=1))
+
+        x[0, 0] = np.nan
+        self.assertTrue(np.isnan(signflip_permutation_cal(x, seed=1)[0]))
+
+        self.assertRaises(ValueError, signflip_permutation_cal, x, tail=2)
+        self.assertRaises(ValueError, signflip_permutation_cal, x, stat='median')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_regression.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from scipy.optimize import lsq_linear
+from pyctrsa.ctsimilarity.regression import ctregressions_cal
+
+class test_regression(unittest.TestCase):
+
+    def test_ctregressions_cal(self):
+
+        CTRDMs = np.random.rand(2, 3, 3, 6, 6)
+        Model_RDMs = np.random.rand(3, 6, 6)
+        betas, partials = ctregressions_cal(CTRDMs, Model_RDMs)
+        self.assertEqual(betas.shape, (2, 3, 3, 3))
+        self.assertEqual(partials.shape, (2, 3, 3, 3, 2))
+
+        mask = ~np.eye(6, dtype=bool)
+        X = np.column_stack([np.ones(30)] + [M[mask] for M in Model_RDMs])
+        y = CTRDMs[1, 2, 0][mask]
+        b = np.linalg.lstsq(X, y, rcond=None)[0]
+        np.testing.assert_allclose(betas[1, :, 2, 0], b[1:], atol=1e-10)
+
+        # the partial correlation is the correlation of the residuals
+        others = np.delete(X, 2, axis=1)
+        ry = y - others @ np.linalg.lstsq(others, y, rcond=None)[0]
+        rm = X[:, 2] - others @ np.linalg.lstsq(others, X[:, 2], rcond=None)[0]
+        self.assertAlmostEqual(partials[1, 1, 2, 0, 0], np.corrcoef(ry, rm)[0, 1])
+
+    def test_ctregressions_cal_nnls(self):
+
+        CTRDMs = np.random.rand(3, 3, 6, 6)
+        Model_RDMs = np.random.rand(3, 6, 6)
+        Model_RDMs[1] = 1 - Model_RDMs[1]
+        betas, partials = ctregressions_cal(CTRDMs, Model_RDMs, method='nnls')
+        self.assertTrue(np.all(betas >= 0))
+
+        mask = ~np.eye(6, dtype=bool)
+        X = np.column_stack([np.ones(30)] + [M[mask] for M in Model_RDMs])
+        for t1 in range(3):
+            for t2 in range(3):
+                b = lsq_linear(X, CTRDMs[t1, t2][mask], bounds=([-np.inf, 0, 0, 0], np.inf), tol=1e-12).x
+                np.testing.assert_allclose(betas[:, t1, t2], b[1:], atol=1e-6)
+
+    def test_ctregressions_cal_time_pairs(self):
+
+        CTRDMs = np.random.rand(2, 5, 5, 6, 6)
+        Model_RDMs = np.random.rand(2, 6, 6)
+        betas, partials = ctregressions_cal(CTRDMs, Model_RDMs)
+        pair_betas, pair_partials = ctregressions_cal(CTRDMs, Model_RDMs, time_pairs=('rectangle', [0, 3], [1, 4]))
+        self.assertEqual(pair_betas.shape, betas.shape)
+        self.assertEqual(pair_partials.shape, partials.shape)
+        np.testing.assert_allclose(pair_betas.values, betas[..., pair_betas.t1, pair_betas.t2], atol=1e-12)
+        np.testing.assert_allclose(pair_partials.values, partials[..., pair_partials.t1, pair_partials.t2, :],
+                                   atol=1e-12)
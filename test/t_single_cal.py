@@ -9,6 +9,8 @@
 
 import numpy as np
 import unittest
+from scipy.stats import pearsonr
+from pyctrsa.util import prefix
 from pyctrsa.ctrdm.single_cal import ctrdm_cal
 
 class test_single_cal(unittest.TestCase):
@@ -18,4 +20,59 @@ class test_single_cal(unittest.TestCase):
         data = np.random.rand(10, 20)
         CTRDMs = ctrdm_cal(data, time_win=10, time_step=5)
         self.assertEqual(CTRDMs.shape[0], 3)
-        self.assertEqual(len(CTRDMs.shape), 4)
\ No newline at end of file
+        self.assertEqual(len(CTRDMs.shape), 4)
+
+    def test_ctrdms_cal_values(self):
+
+        data = np.random.rand(5, 23)
+        CTRDMs = ctrdm_cal(data, time_win=6, time_step=4)
+        self.assertEqual(CTRDMs.shape, (5, 5, 5, 5))
+        for t1 in range(5):
+            for t2 in range(5):
+                for con1 in range(5):
+                    for con2 in range(5):
+                        if con1 == con2:
+                            self.assertEqual(CTRDMs[t1, t2, con1, con2], 0)
+                        else:
+                            r = pearsonr(data[con1, t1*4:t1*4+6], data[con2, t2*4:t2*4+6])[0]
+                            self.assertAlmostEqual(CTRDMs[t1, t2, con1, con2], 1-r)
+
+    def test_ctrdms_cal_dtype(self):
+
+        data = np.random.rand(6, 40)
+        CTRDMs = ctrdm_cal(data)
+        self.assertEqual(CTRDMs.dtype, np.float64)
+        CTRDMs32 = ctrdm_cal(data, dtype=np.float32)
+        self.assertEqual(CTRDMs32.dtype, np.float32)
+        np.testing.assert_allclose(CTRDMs32, CTRDMs, atol=1e-5)
+        self.assertEqual(ctrdm_cal(data.astype(np.float32)).dtype, np.float32)
+
+    def test_ctrdms_cal_engine(self):
+
+        data = np.random.rand(6, 53)
+        for time_win, time_step in [(10, 5), (12, 1), (9, 6)]:
+            CTRDMs = ctrdm_cal(data, time_win=time_win, time_step=time_step)
+            np.testing.assert_allclose(ctrdm_cal(data, time_win=time_win, time_step=time_step, engine='prefix'),
+                                       CTRDMs, atol=1e-10)
+            np.testing.assert_allclose(ctrdm_cal(data, time_win=time_win, time_step=time_step, symmetric=True,
+                                                 engine='prefix').to_dense(), CTRDMs, atol=1e-10)
+            row_size = prefix.ROW_SIZE
+            try:
+                # one row of time-windows at a time
+                prefix.ROW_SIZE = 1
+                np.testing.assert_allclose(ctrdm_cal(data, time_win=time_win, time_step=time_step, symmetric=True,
+                                                     engine='prefix').to_dense(), CTRDMs, atol=1e-10)
+            finally:
+                prefix.ROW_SIZE = row_size
+        self.assertRaises(ValueError, ctrdm_cal, data, engine='fft')
+
+    def test_ctrdms_cal_time_pairs(self):
+
+        data = np.random.rand(6, 53)
+        CTRDMs = ctrdm_cal(data)
+        for time_pairs in [('band', 2), ('rectangle', [0, 5], slice(2, None)), ([3, 1], [0, 8])]:
+            pairs = ctrdm_cal(data, time_pairs=time_pairs)
+            self.assertEqual(pairs.shape, CTRDMs.shape)
+            np.testing.assert_allclose(pairs.values, CTRDMs[pairs.t1, pairs.t2], atol=1e-12)
+        self.assertRaises(ValueError, ctrdm_cal, data, symmetric=True, time_pairs=('band', 2))
+        self.assertRaises(ValueError, ctrdm_cal, data, engine='prefix', time_pairs=('band', 2))
@@ -9,6 +9,7 @@
 
 import numpy as np
 import unittest
+from scipy.stats import spearmanr
 from pyctrsa.similarity.spearmanrp import spearmanrp_cal
 
 class test_spearmanrp(unittest.TestCase):
@@ -18,4 +19,17 @@ class test_spearmanrp(unittest.TestCase):
         CTRDMs1 = np.random.rand(16, 16)
         CTRDMs2 = np.random.rand(16, 16)
         CTSimilarities = spearmanrp_cal(CTRDMs1, CTRDMs2)
-        self.assertEqual(len(CTSimilarities), 2)
\ No newline at end of file
+        self.assertEqual(len(CTSimilarities), 2)
+
+    def test_spearmanrp_cal_stack(self):
+
+        CTRDMs1 = np.random.rand(3, 4, 8, 8)
+        CTRDM2 = np.random.rand(8, 8)
+        CTSimilarities = spearmanrp_cal(CTRDMs1, CTRDM2)
+        self.assertEqual(CTSimilarities.shape, (3, 4, 2))
+
+        mask = ~np.eye(8, dtype=bool)
+        for i in range(3):
+            for j in range(4):
+                rp = spearmanr(CTRDMs1[i, j][mask], CTRDM2[mask])
+                np.testing.assert_allclose(CTSimilarities[i, j], rp, rtol=1e-8, atol=1e-12)
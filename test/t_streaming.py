@@ -0,0 +1,47 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_streaming.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from pyctrsa.ctrdm.streaming import StreamingCTRDMs
+from pyctrsa.ctrdm.single_cal import ctrdm_cal
+from pyctrsa.ctrdm.multi_cal import ctrdms_cal
+
+class test_streaming(unittest.TestCase):
+
+    def test_streaming_ctrdms(self):
+
+        data = np.random.rand(5, 120)
+        for time_win, time_step in [(10, 5), (10, 3), (4, 7)]:
+            CTRDMs = ctrdm_cal(data, time_win=time_win, time_step=time_step)
+            nts = len(CTRDMs)
+            for max_windows in [100, 6]:
+                stream = StreamingCTRDMs(time_win=time_win, time_step=time_step, max_windows=max_windows)
+                for start in range(0, 120, 11):
+                    rows = stream.update(data[:, start:start+11])
+                    if rows is not None:
+                        windows = stream.window_indices
+                        np.testing.assert_allclose(rows, CTRDMs[windows[-len(rows):]][:, windows], atol=1e-12)
+                n = min(nts, max_windows)
+                self.assertEqual(stream.n_windows, nts)
+                np.testing.assert_allclose(stream.ctrdms(), CTRDMs[nts-n:, nts-n:], atol=1e-12)
+
+        stream = StreamingCTRDMs(max_windows=3)
+        self.assertIsNone(stream.update(data[:, :9]))
+        self.assertEqual(np.shape(stream.update(data[:, 9:])), (3, 3, 5, 5))
+        np.testing.assert_allclose(stream.ctrdms(), ctrdm_cal(data)[-3:, -3:], atol=1e-12)
+
+    def test_streaming_ctrdms_channels(self):
+
+        data = np.random.rand(5, 1, 3, 60)
+        for chl_opt in [0, 1]:
+            stream = StreamingCTRDMs(chl_opt=chl_opt)
+            for start in range(0, 60, 7):
+                stream.update(data[:, 0, :, start:start+7])
+            np.testing.assert_allclose(stream.ctrdms(), ctrdms_cal(data, chl_opt=chl_opt)[0], atol=1e-12)
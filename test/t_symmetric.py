@@ -0,0 +1,48 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_symmetric.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from pyctrsa.ctrdm.symmetric import SymmetricCTRDMs
+from pyctrsa.ctrdm.single_cal import ctrdm_cal
+from pyctrsa.ctrdm.multi_cal import ctrdms_cal
+from pyctrsa.ctsimilarity.fitctrdm import ctsimilarities_cal
+
+class test_symmetric(unittest.TestCase):
+
+    def test_symmetric_ctrdms(self):
+
+        data = np.random.rand(6, 30)
+        CTRDMs = ctrdm_cal(data, time_win=10, time_step=4)
+        SCTRDMs = ctrdm_cal(data, time_win=10, time_step=4, symmetric=True)
+        self.assertIsInstance(SCTRDMs, SymmetricCTRDMs)
+        self.assertEqual(SCTRDMs.shape, CTRDMs.shape)
+        np.testing.assert_allclose(np.asarray(SCTRDMs), CTRDMs, atol=1e-12)
+        np.testing.assert_allclose(SCTRDMs[3, 1], CTRDMs[3, 1], atol=1e-12)
+        np.testing.assert_allclose(SCTRDMs[:, 2, 1], CTRDMs[:, 2, 1], atol=1e-12)
+        np.testing.assert_allclose(SCTRDMs[[4, 0], 1:3, 0], CTRDMs[[4, 0], 1:3, 0], atol=1e-12)
+
+        data = np.random.rand(5, 3, 2, 30)
+        CTRDMs = ctrdms_cal(data, chl_opt=1, time_win=10, time_step=4)
+        SCTRDMs = ctrdms_cal(data, chl_opt=1, time_win=10, time_step=4, symmetric=True)
+        np.testing.assert_allclose(SCTRDMs[1, :, 4], CTRDMs[1, :, 4], atol=1e-12)
+        SCTRDMs = ctrdms_cal(data, sub_opt=0, chl_opt=0, time_win=10, time_step=4, symmetric=True)
+        CTRDMs = ctrdms_cal(data, sub_opt=0, chl_opt=0, time_win=10, time_step=4)
+        np.testing.assert_allclose(np.asarray(SCTRDMs), CTRDMs, atol=1e-12)
+
+    def test_symmetric_ctsimilarities(self):
+
+        data = np.random.rand(6, 2, 30)
+        Model_RDM = np.random.rand(6, 6)
+        SCTRDMs = ctrdms_cal(data[:, :, np.newaxis], chl_opt=0, time_win=10, time_step=4, symmetric=True)
+        CTRDMs = np.asarray(SCTRDMs)
+        for method in ['spearman', 'similarity']:
+            for model in [Model_RDM, Model_RDM + Model_RDM.T]:
+                np.testing.assert_allclose(ctsimilarities_cal(SCTRDMs, model, method=method),
+                                           ctsimilarities_cal(CTRDMs, model, method=method), atol=1e-12)
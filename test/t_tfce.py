@@ -0,0 +1,73 @@
+# -*- coding: utf-8
+
+"""
+@File       :   t_tfce.py
+@Author     :   Zitong Lu
+@Contact    :   zitonglu1996@gmail.com
+@License    :   MIT License
+"""
+
+import numpy as np
+import unittest
+from scipy import ndimage
+from scipy.stats import ttest_1samp
+from pyctrsa.stats.permutation import signs_cal
+from pyctrsa.stats.tfce import tfce_cal, tfce_permutation_cal
+
+def tfce_brute(stats, dh, E=0.5, H=2.0):
+
+    # label the map at each threshold
+    scores = np.zeros(np.shape(stats))
+    for k in range(1, int(np.max(stats) / dh) + 1):
+        labels, n = ndimage.label(stats >= k * dh)
+        extents = np.bincount(labels.ravel())
+        extents[0] = 0
+        scores = scores + extents[labels] ** E * (k * dh) ** H * dh
+    return scores
+
+class test_tfce(unittest.TestCase):
+
+    def test_tfce_cal(self):
+
+        for grid in [(30,), (12, 12), (7, 8)]:
+            stats = ndimage.gaussian_filter(np.random.randn(4, *grid), sigma=[0] + [1] * len(grid)) * 10
+            stats[0, 0] = np.nan
+            for tail in [1, -1, 0]:
+                scores = tfce_cal(stats, dh=0.1, tail=tail)
+                expected = np.zeros(np.shape(stats))
+                clean = np.nan_to_num(stats)
+                for i in range(4):
+                    if tail != -1:
+                        expected[i] += tfce_brute(clean[i], 0.1)
+                    if tail != 1:
+                        expected[i] -= tfce_brute(-clean[i], 0.1)
+                np.testing.assert_allclose(scores, expected, rtol=1e-10, atol=1e-10)
+
+        self.assertRaises(ValueError, tfce_cal, stats, tail=2)
+
+    def test_tfce_permutation_cal(self):
+
+        x = np.random.default_rng(0).standard_normal((12, 10, 10))
+        x[:, 2:6, 2:6] += 1.2
+        n_perms = 100
+        signs = signs_cal(12, n_perms=n_perms, seed=2)
+
+        for tail in [1, 0]:
+            scores, ps = tfce_permutation_cal(x, n_perms=n_perms, dh=0.1, tail=tail, seed=2)
+            np.testing.assert_allclose(scores, tfce_cal(ttest_1samp(x, 0, axis=0)[0][np.newaxis], dh=0.1,
+                                                        tail=tail)[0], atol=1e-10)
+            null = np.array([np.max(np.abs(tfce_cal(ttest_1samp(s[:, None, None] * x, 0, axis=0)[0][np.newaxis],
+                                                    dh=0.1, tail=tail))) for s in signs])
+            expected = (np.sum(null >= np.abs(scores)[..., np.newaxis] - 1e-9, axis=-1) + 1) / (n_perms + 1)
+            np.testing.assert_allclose(ps, expected)
+
+        self.assertTrue(ps[3, 3] < 0.05)
+        scores2, ps2 = tfce_permutation_cal(x, n_perms=n_perms, dh=0.1, tail=0, n_jobs=2, seed=2)
+        np.testing.assert_array_equal(ps, ps2)
+
+        # the diagonal time course
+        scores, ps = tfce_permutation_cal(x[:, np.arange(10), np.arange(10)], n_perms=n_perms, seed=2)
+        self.assertEqual(ps.shape, (10,))
+
+if __name__ == '__main__':
+    unittest.main()